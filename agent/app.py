@@ -1,56 +1,102 @@
+import asyncio
+import hashlib
+import hmac
+import json
 import logging
 import os
-import sys
+import signal
+import threading
+import uuid
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Callable, Optional
 
 import redis.asyncio as redis
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi import Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse, JSONResponse, Response
+from pydantic import BaseModel, Field
 from starlette.middleware.cors import CORSMiddleware
 
+from agent.batch import BatchJob, parse_item
+from agent.clients.admission import AdmissionController, AdmissionRejected
 from agent.clients.dial_client import DialClient
-from agent.clients.http_mcp_client import HttpMCPClient
-from agent.clients.stdio_mcp_client import StdioMCPClient
-from agent.conversation_manager import ConversationManager
+from agent.clients.model_router import ModelRouter
+from agent.clients.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResiliencePolicy
+from agent.clients.single_flight import ToolCallCoalescer
+from agent.conversation_manager import ConversationManager, ServiceDraining, TokenBudgetExceeded
+from agent.logging_config import configure_logging, parse_levels
+from agent.metrics import StartupTimeline
 from agent.models.message import Message
-
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+from agent.profiling import LoopLagMonitor, MemoryProfiler, ProfilerBusy, SamplingProfiler
+from agent.storage.archive import ConversationArchive, ConversationArchiver
+from agent.storage.codec import ConversationCodec
+from agent.storage.conversation_cache import ConversationCache
+from agent.storage.search_index import ConversationSearchIndex
+from agent.storage.tenancy import DEFAULT_TENANT, Tenant, TenantShards
+from agent.storage.tool_result_store import ToolResultStore
+from agent.storage.usage_store import UsageStore
+
+# Configure logging, records are written by a background thread
+log_handler = configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    levels=parse_levels(os.getenv("LOG_LEVELS", "")),
+    json_output=os.getenv("LOG_FORMAT", "text").lower() == "json",
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", 0.1)),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", 10000))
 )
 
 logger = logging.getLogger(__name__)
 
+startup_timeline = StartupTimeline()
+startup_timeline.mark("imports")
+
 conversation_manager: Optional[ConversationManager] = None
+# Profiling endpoints are served only with PROFILING_ENABLED=true and an ADMIN_TOKEN
+admin_token = os.getenv("ADMIN_TOKEN", "")
+cpu_profiler: Optional[SamplingProfiler] = None
+memory_profiler: Optional[MemoryProfiler] = None
+loop_lag_monitor: Optional[LoopLagMonitor] = None
+# Batch jobs running in this worker, by tenant key of the job id
+batch_runs: dict[str, tuple[BatchJob, asyncio.Task]] = {}
+# Conversations are scoped to the tenant named in this header, requests without it use the default tenant
+tenant_header = os.getenv("TENANT_HEADER", "X-Tenant-ID")
+# SIGTERM and POST /admin/drain refuse new turns and fail /ready, running turns get this long to finish
+drain_timeout_seconds = float(os.getenv("DRAIN_TIMEOUT_SECONDS", 30))
+drain_task: Optional[asyncio.Task] = None
+# Shuts the server down after a drain, the SIGTERM handler of the server when it installed one
+stop_server: Optional[Callable[[], None]] = None
+
+SEARCH_BACKFILL_LOCK_KEY = "search:backfill"
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize MCP clients, Redis, and ConversationManager on startup"""
-    global conversation_manager
+    global conversation_manager, cpu_profiler, memory_profiler, loop_lag_monitor
 
     logger.info("Application startup initiated")
 
+    # mcp is only needed once the clients connect, importing it here keeps `import agent.app` light
+    from agent.clients.http_mcp_client import HttpMCPClient
+    from agent.clients.stdio_mcp_client import StdioMCPClient
+
     tools: list[dict] = []
     tool_name_client_map: dict[str, HttpMCPClient | StdioMCPClient] = {}
+    # Closed in reverse order on shutdown
+    mcp_clients: list[HttpMCPClient | StdioMCPClient] = []
 
     # Initialize UMS MCP client
     logger.info("Initializing UMS MCP client")
     ums_mcp_url = os.getenv("UMS_MCP_URL", "http://localhost:8005/mcp")
     logger.info("UMS MCP URL: %s", ums_mcp_url)
     ums_mcp_client = await HttpMCPClient.create(ums_mcp_url)
+    mcp_clients.append(ums_mcp_client)
 
     for tool in await ums_mcp_client.get_tools():
         tool_name = tool.get('function', {}).get('name')
         tools.append(tool)
         tool_name_client_map[tool_name] = ums_mcp_client
         logger.info("Registered UMS tool", extra={"tool_name": tool_name})
+    startup_timeline.mark("ums_mcp")
 
     # Initialize Fetch MCP client (remote)
     logger.info("Initializing Fetch MCP client")
@@ -58,6 +104,7 @@ async def lifespan(app: FastAPI):
     logger.info("Fetch MCP URL: %s", fetch_mcp_url)
     try:
         fetch_mcp_client = await HttpMCPClient.create(fetch_mcp_url)
+        mcp_clients.append(fetch_mcp_client)
         for tool in await fetch_mcp_client.get_tools():
             tool_name = tool.get('function', {}).get('name')
             tools.append(tool)
@@ -65,16 +112,47 @@ async def lifespan(app: FastAPI):
             logger.info("Registered Fetch tool", extra={"tool_name": tool_name})
     except Exception as e:
         logger.warning(f"Failed to initialize Fetch MCP client: {e}")
+    startup_timeline.mark("fetch_mcp")
 
     # Initialize DuckDuckGo MCP client
     logger.info("Initializing DuckDuckGo MCP client")
     duckduckgo_docker_image = os.getenv("DDG_DOCKER_IMAGE", "khshanovskyi/ddg-mcp-server:latest")
     duckduckgo_mcp_client = await StdioMCPClient.create(docker_image=duckduckgo_docker_image)
+    mcp_clients.append(duckduckgo_mcp_client)
     for tool in await duckduckgo_mcp_client.get_tools():
         tool_name = tool.get('function', {}).get('name')
         tools.append(tool)
         tool_name_client_map[tool_name] = duckduckgo_mcp_client
         logger.info("Registered DuckDuckGo tool", extra={"tool_name": tool_name})
+    startup_timeline.mark("duckduckgo_mcp")
+
+    # Initialize Redis client
+    redis_host = os.getenv("REDIS_HOST", "localhost")
+    redis_port = int(os.getenv("REDIS_PORT", 6379))
+
+    logger.info(
+        "Connecting to Redis",
+        extra={"host": redis_host, "port": redis_port}
+    )
+
+    # Conversation payloads may be binary, see CONVERSATION_CODEC
+    redis_client = redis.Redis(
+        host=redis_host,
+        port=redis_port,
+        decode_responses=False
+    )
+
+    # Further instances tenants are spread over, the default tenant stays on REDIS_HOST
+    shards = [redis_client]
+    for address in filter(None, (address.strip() for address in os.getenv("REDIS_SHARDS", "").split(","))):
+        shard_host, _, shard_port = address.rpartition(":")
+        shards.append(redis.Redis(host=shard_host, port=int(shard_port), decode_responses=False))
+    tenant_shards = TenantShards(shards)
+
+    for shard in shards:
+        await shard.ping()
+    logger.info("Redis connection established successfully", extra={"shards": len(shards)})
+    startup_timeline.mark("redis")
 
     # Initialize DIAL client
     dial_api_key = os.getenv("DIAL_API_KEY")
@@ -86,44 +164,253 @@ async def lifespan(app: FastAPI):
     endpoint = os.getenv("DIAL_URL", "https://ai-proxy.lab.epam.com")
     logger.info("Initializing DIAL client", extra={"url": endpoint, "model": model})
 
+    # Oversized tool results are kept out of the prompt, disabled with TOOL_RESULT_MAX_INLINE_CHARS=0
+    max_inline_tool_result_chars = int(os.getenv("TOOL_RESULT_MAX_INLINE_CHARS", 8000))
+    tool_result_store = None
+    if max_inline_tool_result_chars > 0:
+        tool_result_store = ToolResultStore(
+            redis_client,
+            ttl_seconds=int(os.getenv("TOOL_RESULT_TTL_SECONDS", 7 * 24 * 3600))
+        )
+
+    # Admission control for model calls, disabled with MODEL_MAX_CONCURRENCY=0
+    model_max_concurrency = int(os.getenv("MODEL_MAX_CONCURRENCY", 16))
+    admission = None
+    if model_max_concurrency > 0:
+        admission = AdmissionController(
+            max_concurrency=model_max_concurrency,
+            max_queue=int(os.getenv("MODEL_MAX_QUEUE", 64)),
+            queue_timeout=float(os.getenv("MODEL_QUEUE_TIMEOUT_SECONDS", 30))
+        )
+
+    resilience = ResiliencePolicy(
+        ttft_timeout=float(os.getenv("MODEL_TTFT_TIMEOUT_SECONDS", 30)),
+        stream_idle_timeout=float(os.getenv("MODEL_STREAM_IDLE_TIMEOUT_SECONDS", 60)),
+        request_timeout=float(os.getenv("MODEL_REQUEST_TIMEOUT_SECONDS", 120)),
+        max_retries=int(os.getenv("MODEL_MAX_RETRIES", 2)),
+        hedge=os.getenv("MODEL_HEDGING", "true").lower() == "true",
+        hedge_min_delay=float(os.getenv("MODEL_HEDGE_MIN_DELAY_SECONDS", 1)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv("MODEL_BREAKER_FAILURE_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("MODEL_BREAKER_RESET_SECONDS", 30))
+        )
+    )
+
+    # Route tool-dispatch rounds to a fast model, disabled while FAST_MODEL is not set
+    router = None
+    if fast_model := os.getenv("FAST_MODEL"):
+        escalate_on = {
+            rule.strip()
+            for rule in os.getenv("MODEL_ESCALATE_ON", "invalid_tool_args,unknown_tool,truncated,empty").split(",")
+            if rule.strip()
+        }
+        if os.getenv("MODEL_ROUTE_SIMPLE_TURNS", "true").lower() != "true":
+            escalate_on.add("simple_turn")
+        router = ModelRouter(fast_model=fast_model, strong_model=model, escalate_on=frozenset(escalate_on))
+
+    # Share in-flight calls of read-only tools: annotated by their server or listed in READ_ONLY_TOOLS
+    tool_coalescer = None
+    if os.getenv("TOOL_SINGLE_FLIGHT", "true").lower() == "true":
+        read_only_tools = {name.strip() for name in os.getenv("READ_ONLY_TOOLS", "").split(",") if name.strip()}
+        for mcp_client in set(tool_name_client_map.values()):
+            read_only_tools |= mcp_client.read_only_tools
+        tool_coalescer = ToolCallCoalescer(read_only_tools)
+        logger.info("Tool single-flight enabled", extra={"read_only_tools": sorted(read_only_tools)})
+
     dial_client = DialClient(
         api_key=dial_api_key,
         endpoint=endpoint,
         model=model,
         tools=tools,
-        tool_name_client_map=tool_name_client_map
+        tool_name_client_map=tool_name_client_map,
+        tool_result_store=tool_result_store,
+        max_inline_tool_result_chars=max_inline_tool_result_chars,
+        tool_result_preview_chars=int(os.getenv("TOOL_RESULT_PREVIEW_CHARS", 2000)),
+        admission=admission,
+        resilience=resilience,
+        router=router,
+        answer_reserve_seconds=float(os.getenv("TURN_ANSWER_RESERVE_SECONDS", 10)),
+        tool_coalescer=tool_coalescer
+    )
+    startup_timeline.mark("dial_client")
+
+    # Initialize in-process conversation cache, disabled with CONVERSATION_CACHE_MAX_ENTRIES=0
+    cache_max_entries = int(os.getenv("CONVERSATION_CACHE_MAX_ENTRIES", 1000))
+    cache_max_bytes = int(os.getenv("CONVERSATION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    conversation_cache = None
+    if cache_max_entries > 0:
+        conversation_cache = ConversationCache(
+            redis_client,
+            max_entries=cache_max_entries,
+            max_bytes=cache_max_bytes,
+            ttl_seconds=float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", 300))
+        )
+        await conversation_cache.start()
+
+    # Initialize payload codec, previously written formats are always readable
+    zstd_dictionary = None
+    if zstd_dictionary_path := os.getenv("CONVERSATION_ZSTD_DICT"):
+        with open(zstd_dictionary_path, "rb") as f:
+            zstd_dictionary = f.read()
+    conversation_codec = ConversationCodec(
+        os.getenv("CONVERSATION_CODEC", "auto"),
+        zstd_level=int(os.getenv("CONVERSATION_ZSTD_LEVEL", 3)),
+        zstd_dictionary=zstd_dictionary
     )
 
-    # Initialize Redis client
-    redis_host = os.getenv("REDIS_HOST", "localhost")
-    redis_port = int(os.getenv("REDIS_PORT", 6379))
+    # Initialize cold storage, disabled unless CONVERSATION_ARCHIVE_IDLE_SECONDS is set
+    archive_idle_seconds = float(os.getenv("CONVERSATION_ARCHIVE_IDLE_SECONDS", 0))
+    conversation_archive = None
+    if archive_idle_seconds > 0:
+        conversation_archive = ConversationArchive(
+            os.getenv("CONVERSATION_ARCHIVE_PATH", "conversation_archive.sqlite3")
+        )
+
+    # Initialize search index, kept up to date on every save
+    search_index = None
+    if os.getenv("SEARCH_INDEX", "true").lower() == "true":
+        search_index = ConversationSearchIndex(
+            redis_client,
+            max_prefix_expansions=int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", 50))
+        )
 
-    logger.info(
-        "Connecting to Redis",
-        extra={"host": redis_host, "port": redis_port}
+    # Initialize ConversationManager with both dependencies
+    conversation_manager = ConversationManager(
+        dial_client,
+        redis_client,
+        cache=conversation_cache,
+        codec=conversation_codec,
+        archive=conversation_archive,
+        turn_deadline_seconds=float(os.getenv("TURN_DEADLINE_SECONDS", 120)),
+        messages_ttl_seconds=int(os.getenv("CONVERSATION_MESSAGES_TTL_SECONDS", 24 * 3600)),
+        search_index=search_index,
+        usage_store=UsageStore(redis_client),
+        token_budget=int(os.getenv("CONVERSATION_TOKEN_BUDGET", 0)),
+        compact_prompt_tokens=int(os.getenv("CONVERSATION_COMPACT_PROMPT_TOKENS", 0)),
+        tenants=tenant_shards
     )
 
-    redis_client = redis.Redis(
-        host=redis_host,
-        port=redis_port,
-        decode_responses=True
-    )
+    # Event loop lag is sampled all the time, the sleeping task costs nothing measurable
+    lag_interval = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", 0.5))
+    if lag_interval > 0:
+        loop_lag_monitor = LoopLagMonitor(lag_interval)
+        await loop_lag_monitor.start()
+
+    if os.getenv("PROFILING_ENABLED", "false").lower() == "true":
+        if admin_token:
+            cpu_profiler = SamplingProfiler(max_seconds=float(os.getenv("PROFILE_CPU_MAX_SECONDS", 60)))
+            memory_profiler = MemoryProfiler(max_seconds=float(os.getenv("PROFILE_MEMORY_MAX_SECONDS", 600)))
+            logger.info("Profiling endpoints enabled")
+        else:
+            logger.warning("PROFILING_ENABLED is set without ADMIN_TOKEN, profiling endpoints stay disabled")
+
+    conversation_archiver = None
+    if conversation_archive:
+        conversation_archiver = ConversationArchiver(
+            conversation_manager,
+            idle_seconds=archive_idle_seconds,
+            interval_seconds=float(os.getenv("CONVERSATION_ARCHIVE_INTERVAL_SECONDS", 300))
+        )
+        await conversation_archiver.start()
+
+    # Conversations saved before the index existed are indexed in the background by one worker
+    search_backfill = None
+    if search_index:
+        search_backfill = asyncio.create_task(_backfill_search_index(redis_client))
+    logger.info("ConversationManager initialized successfully")
 
-    await redis_client.ping()
-    logger.info("Redis connection established successfully")
+    # SIGTERM drains first, the server handles it once running turns are done
+    previous_sigterm_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_sigterm_handler = _install_drain_on_sigterm()
 
-    # Initialize ConversationManager with both dependencies
-    conversation_manager = ConversationManager(dial_client, redis_client)
-    logger.info("ConversationManager initialized successfully")
-    logger.info("Application startup completed")
+    startup_timeline.mark("ready")
+    logger.info("Application startup completed", extra={"startup": startup_timeline.stats()})
 
     yield
 
     logger.info("Application shutdown initiated")
-    await redis_client.close()
+    if previous_sigterm_handler is not None:
+        signal.signal(signal.SIGTERM, previous_sigterm_handler)
+    # Shutdown without SIGTERM (Ctrl+C) still saves partial turns before anything is closed
+    await begin_drain()
+    # Interrupted jobs resume when submitted again
+    for _, task in batch_runs.values():
+        task.cancel()
+    if search_backfill:
+        search_backfill.cancel()
+    if conversation_archiver:
+        await conversation_archiver.stop()
+    if conversation_archive:
+        conversation_archive.close()
+    if conversation_cache:
+        await conversation_cache.stop()
+    if memory_profiler:
+        memory_profiler.stop()
+    if loop_lag_monitor:
+        await loop_lag_monitor.stop()
+    for mcp_client in reversed(mcp_clients):
+        await mcp_client.close()
+    await tenant_shards.close()
     logger.info("Application shutdown completed")
 
 
+def begin_drain() -> asyncio.Task:
+    """Start draining once, batch jobs stop starting prompts and chat turns get `drain_timeout_seconds`"""
+    global drain_task
+    if drain_task is None:
+        drain_task = asyncio.create_task(_drain())
+    return drain_task
+
+
+async def _drain() -> dict:
+    logger.info("Draining started", extra={"timeout_seconds": drain_timeout_seconds})
+    for job, _ in batch_runs.values():
+        job.stop()
+    stats = await conversation_manager.drain(drain_timeout_seconds)
+    if batch_tasks := [task for _, task in batch_runs.values()]:
+        await asyncio.wait(batch_tasks, timeout=drain_timeout_seconds)
+    logger.info("Draining finished", extra=stats)
+    return stats
+
+
+def _install_drain_on_sigterm():
+    """Route SIGTERM through a drain, returns the handler it replaced"""
+    global stop_server
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def forward():
+        if callable(previous):
+            previous(signal.SIGTERM, None)
+        else:
+            signal.signal(signal.SIGTERM, previous)
+            signal.raise_signal(signal.SIGTERM)
+
+    def on_sigterm(*_):
+        # A second SIGTERM stops the server without waiting for the drain
+        if drain_task is not None:
+            loop.call_soon_threadsafe(forward)
+        else:
+            loop.call_soon_threadsafe(lambda: begin_drain().add_done_callback(lambda _: forward()))
+
+    stop_server = forward
+    signal.signal(signal.SIGTERM, on_sigterm)
+    logger.info("SIGTERM drains before shutdown", extra={"drain_timeout_seconds": drain_timeout_seconds})
+    return previous
+
+
+async def _backfill_search_index(redis_client: redis.Redis):
+    if not await redis_client.set(SEARCH_BACKFILL_LOCK_KEY, os.getpid(), nx=True, ex=3600):
+        return
+    try:
+        await conversation_manager.index_conversations()
+    except Exception as e:
+        logger.error("Search index backfill failed", extra={"error": str(e)}, exc_info=True)
+    finally:
+        await redis_client.delete(SEARCH_BACKFILL_LOCK_KEY)
+
+
 app = FastAPI(
     lifespan=lifespan,
 )
@@ -136,10 +423,49 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(AdmissionRejected)
+@app.exception_handler(CircuitOpenError)
+async def overload_handler(_: Request, exc: AdmissionRejected | CircuitOpenError):
+    """Shed load quickly (429 when saturated, 503 while upstream is down) instead of letting requests pile up"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_handler(_: Request, exc: DeadlineExceeded):
+    """The turn ran out of time, what it produced so far is saved"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+@app.exception_handler(ServiceDraining)
+async def draining_handler(_: Request, exc: ServiceDraining):
+    """The instance is about to restart, the client retries and reaches another one"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
+@app.exception_handler(TokenBudgetExceeded)
+async def token_budget_handler(_: Request, exc: TokenBudgetExceeded):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+@app.exception_handler(ProfilerBusy)
+async def profiler_busy_handler(_: Request, exc: ProfilerBusy):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
 # Request/Response Models
 class ChatRequest(BaseModel):
     message: Message
     stream: bool = True
+    # Overrides TURN_DEADLINE_SECONDS for this request, 0 disables the deadline
+    deadline_seconds: Optional[float] = Field(default=None, ge=0)
 
 
 class ChatResponse(BaseModel):
@@ -159,6 +485,26 @@ class CreateConversationRequest(BaseModel):
     title: str = None
 
 
+class ForkConversationRequest(BaseModel):
+    # Messages of the conversation the fork starts with, all of them by default
+    message_count: Optional[int] = Field(default=None, ge=1)
+    title: Optional[str] = None
+
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    prompt: str = Field(min_length=1)
+    title: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    # Submitting an existing job again resumes it with its stored prompts, `items` may then be empty
+    job_id: Optional[str] = Field(default=None, pattern=r"^[\w.-]{1,100}$")
+    items: list[BatchItem] = []
+    concurrency: int = Field(default=4, ge=1, le=64)
+    deadline_seconds: Optional[float] = Field(default=None, ge=0)
+
+
 # Endpoints
 @app.get("/health")
 async def health():
@@ -166,61 +512,366 @@ async def health():
     logger.debug("Health check requested")
     return {
         "status": "healthy",
-        "conversation_manager_initialized": conversation_manager is not None
+        "conversation_manager_initialized": conversation_manager is not None,
+        "draining": drain_task is not None
     }
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe, fails while starting up and once draining so no new traffic is routed here"""
+    if not conversation_manager:
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    if conversation_manager.draining:
+        return JSONResponse(status_code=503, content={"status": "draining"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Runtime metrics of the agent"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    metrics = await conversation_manager.metrics()
+    metrics["startup"] = startup_timeline.stats()
+    metrics["logging"] = log_handler.stats()
+    if loop_lag_monitor:
+        metrics["event_loop"] = loop_lag_monitor.stats()
+    return metrics
+
+
+def require_admin_token(request: Request):
+    """Admin endpoints answer 404 without an ADMIN_TOKEN, and need `Authorization: Bearer <ADMIN_TOKEN>`"""
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+
+def require_admin(request: Request):
+    """Profiling endpoints answer 404 unless enabled"""
+    if not cpu_profiler:
+        raise HTTPException(status_code=404, detail="Not Found")
+    require_admin_token(request)
+
+
+def get_tenant(request: Request) -> Tenant:
+    """Tenant named in the tenant header, the default tenant without it"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    try:
+        return conversation_manager.tenants.tenant(request.headers.get(tenant_header) or DEFAULT_TENANT)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/admin/drain", status_code=202, dependencies=[Depends(require_admin_token)])
+async def drain(stop: bool = True):
+    """
+    Drain like SIGTERM does: refuse new turns, fail /ready and let running turns finish.
+    The server shuts down afterwards unless `stop=false`, a supervisor then starts it again.
+    """
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    active_turns = conversation_manager.active_turns
+    if drain_task is None and stop and stop_server:
+        begin_drain().add_done_callback(lambda _: stop_server())
+    else:
+        begin_drain()
+    return {"draining": True, "active_turns": active_turns, "timeout_seconds": drain_timeout_seconds}
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+async def profiling_status():
+    """State of the profilers and event loop lag"""
+    return {
+        "cpu_profiles": cpu_profiler.profiles,
+        "memory": memory_profiler.stats(),
+        "event_loop": loop_lag_monitor.stats() if loop_lag_monitor else None
+    }
+
+
+@app.get("/admin/profile/cpu", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+async def profile_cpu(
+        seconds: float = Query(default=10, gt=0),
+        interval_ms: float = Query(default=5, gt=0)
+):
+    """Sample the event loop thread for `seconds`, returns collapsed stacks for flame graph tools"""
+    return await cpu_profiler.profile(seconds, interval_ms / 1000)
+
+
+@app.post("/admin/profile/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_tracing(
+        frames: int = Query(default=10, ge=1),
+        seconds: Optional[float] = Query(default=None, gt=0)
+):
+    """Start tracemalloc, keeping `frames` frames per allocation, it stops by itself after `seconds`"""
+    memory_profiler.start(frames, seconds)
+    return memory_profiler.stats()
+
+
+@app.post("/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+async def memory_snapshot(
+        limit: int = Query(default=20, ge=1, le=200),
+        group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Record the baseline for diffs, returns the largest allocation sites"""
+    try:
+        return memory_profiler.snapshot(limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/admin/profile/memory/diff", dependencies=[Depends(require_admin)])
+async def memory_diff(
+        limit: int = Query(default=20, ge=1, le=200),
+        group_by: str = Query(default="lineno", pattern="^(lineno|filename|traceback)$")
+):
+    """Allocation sites that grew since the baseline, with the largest cached conversations"""
+    try:
+        diff = memory_profiler.diff(limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if conversation_manager and conversation_manager.cache:
+        diff["largest_cached_conversations"] = conversation_manager.cache.largest()
+    return diff
+
+
+@app.post("/admin/profile/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    memory_profiler.stop()
+    return memory_profiler.stats()
+
+
 @app.post("/conversations")
-async def create_conversation(request: CreateConversationRequest):
+async def create_conversation(request: CreateConversationRequest, tenant: Tenant = Depends(get_tenant)):
     """Create a new conversation"""
     if not conversation_manager:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     logger.info("Creating new conversation", extra={"title": request.title})
     title = request.title or "New Conversation"
-    conversation = await conversation_manager.create_conversation(title)
+    conversation = await conversation_manager.create_conversation(title, tenant)
     return conversation
 
 
 @app.get("/conversations", response_model=list[ConversationSummary])
-async def list_conversations():
-    """List all conversations"""
+async def list_conversations(tenant: Tenant = Depends(get_tenant)):
+    """List all conversations of the tenant"""
     if not conversation_manager:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     logger.debug("Listing conversations")
-    conversations = await conversation_manager.list_conversations()
+    conversations = await conversation_manager.list_conversations(tenant)
     return conversations
 
 
+@app.get("/conversations/search")
+async def search_conversations(
+        q: str = Query(min_length=1),
+        limit: int = Query(default=20, ge=1, le=100),
+        tenant: Tenant = Depends(get_tenant)
+):
+    """Full-text search over titles and messages of the tenant's conversations"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+    if not conversation_manager.search_index:
+        raise HTTPException(status_code=404, detail="Search is disabled")
+
+    return await conversation_manager.search_conversations(q, limit, tenant)
+
+
+@app.post("/batches", status_code=202)
+async def submit_batch(request: BatchRequest, tenant: Tenant = Depends(get_tenant)):
+    """Start a batch job, or resume an interrupted one, each prompt runs as its own conversation"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    job_id = request.job_id or uuid.uuid4().hex
+    run_key = tenant.key(job_id)
+    if run_key in batch_runs:
+        raise HTTPException(status_code=409, detail=f"Batch job {job_id} is already running")
+
+    try:
+        items = [parse_item(item.model_dump(), number) for number, item in enumerate(request.items, 1)]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len({item["id"] for item in items}) != len(items):
+        raise HTTPException(status_code=400, detail="Item ids must be unique")
+
+    job = BatchJob(
+        conversation_manager,
+        tenant.redis,
+        job_id,
+        concurrency=request.concurrency,
+        deadline_seconds=request.deadline_seconds,
+        tenant=tenant
+    )
+    if not items and not await job.exists():
+        raise HTTPException(status_code=400, detail="A new batch job needs items")
+    resumed = not await job.submit(items) if items else True
+
+    async def run():
+        try:
+            await job.run()
+        except Exception as e:
+            logger.error("Batch job failed", extra={"job_id": job_id, "error": str(e)}, exc_info=True)
+        finally:
+            batch_runs.pop(run_key, None)
+
+    batch_runs[run_key] = (job, asyncio.create_task(run()))
+    return {"job_id": job_id, "resumed": resumed}
+
+
+@app.get("/batches/{job_id}")
+async def get_batch(job_id: str, tenant: Tenant = Depends(get_tenant)):
+    """Progress of a batch job"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    run = batch_runs.get(tenant.key(job_id))
+    job = run[0] if run else BatchJob(conversation_manager, tenant.redis, job_id, tenant=tenant)
+    if not await job.exists():
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return await job.progress()
+
+
+@app.get("/batches/{job_id}/results")
+async def get_batch_results(job_id: str, tenant: Tenant = Depends(get_tenant)):
+    """Results of a batch job so far as JSON lines"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    job = BatchJob(conversation_manager, tenant.redis, job_id, tenant=tenant)
+    if not await job.exists():
+        raise HTTPException(status_code=404, detail="Batch job not found")
+
+    async def lines():
+        async for record in job.results():
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _etag(*parts) -> str:
+    return f'W/"{hashlib.sha1(repr(parts).encode()).hexdigest()[:20]}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match", "")
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(",") if tag.strip())
+
+
 @app.get("/conversations/{conversation_id}")
-async def get_conversation(conversation_id: str):
-    """Get a specific conversation"""
+async def get_conversation(
+        conversation_id: str,
+        request: Request,
+        before: Optional[int] = Query(default=None, ge=0),
+        limit: Optional[int] = Query(default=None, ge=1, le=500),
+        since_version: Optional[int] = Query(default=None, ge=0),
+        include_tool_messages: bool = True,
+        tenant: Tenant = Depends(get_tenant)
+):
+    """
+    Get a specific conversation.
+    Any of the query parameters switches to a page of messages, see ConversationManager.get_messages.
+    """
     if not conversation_manager:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     logger.info("Getting conversation", extra={"conversation_id": conversation_id})
-    conversation = await conversation_manager.get_conversation(conversation_id)
-    if not conversation:
+    paged = before is not None or limit is not None or since_version is not None or not include_tool_messages
+    if paged:
+        try:
+            content = await conversation_manager.get_messages(
+                conversation_id,
+                before=before,
+                limit=limit or 50,
+                since_version=since_version,
+                include_tool_messages=include_tool_messages,
+                tenant=tenant
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        content = await conversation_manager.get_conversation(conversation_id, tenant)
+    if not content:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+
+    if paged:
+        etag = _etag(conversation_id, content["version"], before, limit, since_version, include_tool_messages)
+    else:
+        etag = _etag(conversation_id, len(content["messages"]), content["updated_at"])
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=content, headers={"ETag": etag})
+
+
+@app.get("/conversations/{conversation_id}/usage")
+async def get_conversation_usage(
+        conversation_id: str,
+        turns: int = Query(default=20, ge=1, le=50),
+        tenant: Tenant = Depends(get_tenant)
+):
+    """Token usage of the conversation with per-round usage of its latest turns"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    usage = await conversation_manager.usage_store.get(conversation_id, turns, tenant)
+    if usage is None:
+        if not await conversation_manager.get_conversation(conversation_id, tenant):
+            raise HTTPException(status_code=404, detail="Conversation not found")
+        usage = {**await conversation_manager.usage_store.totals(conversation_id, tenant), "recent_turns": []}
+
+    budget = conversation_manager.token_budget
+    return {
+        "conversation_id": conversation_id,
+        **usage,
+        "token_budget": budget or None,
+        "remaining_tokens": max(budget - usage["total_tokens"], 0) if budget else None
+    }
 
 
 @app.delete("/conversations/{conversation_id}")
-async def delete_conversation(conversation_id: str):
+async def delete_conversation(conversation_id: str, tenant: Tenant = Depends(get_tenant)):
     """Delete a conversation"""
     if not conversation_manager:
         raise HTTPException(status_code=503, detail="Service not initialized")
 
     logger.info("Deleting conversation", extra={"conversation_id": conversation_id})
-    deleted = await conversation_manager.delete_conversation(conversation_id)
+    deleted = await conversation_manager.delete_conversation(conversation_id, tenant)
     if not deleted:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"message": "Conversation deleted successfully"}
 
 
+@app.post("/conversations/{conversation_id}/fork")
+async def fork_conversation(
+        conversation_id: str,
+        request: ForkConversationRequest,
+        tenant: Tenant = Depends(get_tenant)
+):
+    """Branch a conversation off after one of its messages, the fork shares the history up to there"""
+    if not conversation_manager:
+        raise HTTPException(status_code=503, detail="Service not initialized")
+
+    logger.info("Forking conversation", extra={"conversation_id": conversation_id})
+    try:
+        conversation = await conversation_manager.fork_conversation(
+            conversation_id, request.message_count, request.title, tenant
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
+
+
 @app.post("/conversations/{conversation_id}/chat")
-async def chat(conversation_id: str, request: ChatRequest):
+async def chat(conversation_id: str, request: ChatRequest, tenant: Tenant = Depends(get_tenant)):
     """Chat endpoint that processes messages and returns assistant response"""
     if not conversation_manager:
         raise HTTPException(status_code=503, detail="Service not initialized")
@@ -233,10 +884,16 @@ async def chat(conversation_id: str, request: ChatRequest):
         }
     )
 
+    admission = conversation_manager.dial_client.admission
+    if admission and not admission.has_capacity():
+        raise AdmissionRejected("Model call queue is full", admission.retry_after())
+
     result = await conversation_manager.chat(
         user_message=request.message,
         conversation_id=conversation_id,
-        stream=request.stream
+        stream=request.stream,
+        deadline_seconds=request.deadline_seconds,
+        tenant=tenant
     )
 
     if request.stream:
@@ -0,0 +1,340 @@
+"""
+Offline batch chat jobs: every prompt of a job runs as its own conversation through ConversationManager.
+
+    python -m agent.batch prompts.jsonl --output results.jsonl --concurrency 8
+
+Each input line is a JSON object with the prompt in `prompt` (or `content`, or `body`), an optional `id`
+(or `request_id`, the line number otherwise) and an optional conversation `title`. Progress is checkpointed
+to Redis, running the same command again resumes the job: finished prompts are skipped, failed and
+interrupted ones run again.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, UTC
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Optional
+
+import redis.asyncio as redis
+
+from agent.clients.admission import AdmissionRejected
+from agent.clients.resilience import CircuitOpenError
+from agent.metrics import LatencyRecorder
+from agent.models.message import Message, Role
+from agent.storage.tenancy import DEFAULT_TENANT, Tenant
+
+if TYPE_CHECKING:
+    from agent.conversation_manager import ConversationManager
+
+logger = logging.getLogger(__name__)
+
+BATCH_PREFIX = "batch:"
+# Overload errors are waited out instead of failing the prompt
+MAX_OVERLOAD_RETRIES = 5
+
+
+def parse_item(raw: dict[str, Any], line_number: int) -> dict[str, Any]:
+    """Normalize one input record to `id`, `prompt` and `title`"""
+    prompt = raw.get("prompt") or raw.get("content") or raw.get("body")
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise ValueError(f"Line {line_number}: no prompt in `prompt`, `content` or `body`")
+    return {
+        "id": str(raw.get("id") or raw.get("request_id") or line_number),
+        "prompt": prompt,
+        "title": raw.get("title")
+    }
+
+
+def read_items(path: str) -> list[dict[str, Any]]:
+    items, ids = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = parse_item(json.loads(line), line_number)
+            if item["id"] in ids:
+                raise ValueError(f"Line {line_number}: duplicate id {item['id']!r}")
+            ids.add(item["id"])
+            items.append(item)
+    return items
+
+
+class BatchJob:
+    """
+    Runs the prompts of a job with at most `concurrency` turns at a time.
+
+    Redis keys, all expiring after `ttl_seconds`:
+    - `batch:{job}:meta` hash: creation time, prompt count, last run status
+    - `batch:{job}:items` list of the prompts, stored once so a resumed job runs the same input
+    - `batch:{job}:results` hash: prompt id -> result record
+    - `batch:{job}:running` hash: prompt id -> conversation of a turn in progress, a turn interrupted
+      by a crash is found here on resume and its conversation is discarded
+
+    Keys and conversations belong to `tenant`, the default tenant unless given.
+    """
+
+    def __init__(
+            self,
+            conversation_manager: "ConversationManager",
+            redis_client: redis.Redis,
+            job_id: str,
+            concurrency: int = 4,
+            deadline_seconds: Optional[float] = None,
+            ttl_seconds: int = 7 * 24 * 3600,
+            tenant: Optional[Tenant] = None
+    ):
+        self.conversation_manager = conversation_manager
+        self.tenant = tenant or Tenant(DEFAULT_TENANT, redis_client)
+        self.redis = self.tenant.redis
+        self.job_id = job_id
+        self.concurrency = concurrency
+        self.deadline_seconds = deadline_seconds
+        self.ttl_seconds = ttl_seconds
+        self.key = self.tenant.key(f"{BATCH_PREFIX}{job_id}")
+
+        self.latency = LatencyRecorder()
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.response_chars = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stopping = False
+
+    async def exists(self) -> bool:
+        return bool(await self.redis.exists(f"{self.key}:meta"))
+
+    async def submit(self, items: list[dict[str, Any]]) -> bool:
+        """Store the prompts of a new job, returns False when the job exists and keeps its stored prompts"""
+        if not await self.redis.hsetnx(f"{self.key}:meta", "created_at", datetime.now(UTC).isoformat()):
+            return False
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(f"{self.key}:meta", mapping={"total": len(items), "status": "pending"})
+            for offset in range(0, len(items), 500):
+                pipe.rpush(f"{self.key}:items", *(json.dumps(item) for item in items[offset:offset + 500]))
+            self._expire(pipe)
+            await pipe.execute()
+        logger.info("Batch job submitted", extra={"job_id": self.job_id, "total": len(items)})
+        return True
+
+    async def run(self, on_result: Optional[Callable[[dict], None]] = None) -> dict:
+        """Run every prompt without a successful result, `on_result` gets each record as it completes"""
+        items = [json.loads(raw) for raw in await self.redis.lrange(f"{self.key}:items", 0, -1)]
+        results = await self.redis.hgetall(f"{self.key}:results")
+        previous = {item_id.decode(): json.loads(record) for item_id, record in results.items()}
+        await self._discard_interrupted()
+
+        pending = [item for item in items if previous.get(item["id"], {}).get("status") != "ok"]
+        self.skipped = len(items) - len(pending)
+        self.started_at = time.monotonic()
+        await self.redis.hset(f"{self.key}:meta", "status", "running")
+        logger.info(
+            "Batch job started",
+            extra={"job_id": self.job_id, "pending": len(pending), "skipped": self.skipped, "concurrency": self.concurrency}
+        )
+
+        queue: asyncio.Queue[dict] = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        async def worker():
+            while not queue.empty() and not self.stopping:
+                item = queue.get_nowait()
+                record = await self._run_item(item, previous.get(item["id"]))
+                if on_result:
+                    on_result(record)
+
+        status = "failed"
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)) or 1)))
+            if not queue.empty():
+                status = "interrupted"
+            else:
+                status = "completed" if not self.failed else "completed_with_errors"
+        except asyncio.CancelledError:
+            status = "interrupted"
+            raise
+        finally:
+            self.finished_at = time.monotonic()
+            await asyncio.shield(self.redis.hset(f"{self.key}:meta", "status", status))
+            logger.info("Batch job finished", extra={"job_id": self.job_id, "status": status, **self.stats()})
+        return self.stats()
+
+    def stop(self):
+        """Start no further prompts, the run ends as interrupted once the running ones are done"""
+        self.stopping = True
+        logger.info("Batch job stopping", extra={"job_id": self.job_id})
+
+    async def _run_item(self, item: dict[str, Any], previous: Optional[dict]) -> dict:
+        start = time.perf_counter()
+        # A failed attempt left its conversation behind, it stays in the record until deleted
+        record = {"id": item["id"], "conversation_id": previous.get("conversation_id") if previous else None}
+        try:
+            if record["conversation_id"]:
+                await self.conversation_manager.delete_conversation(record["conversation_id"], self.tenant)
+                record["conversation_id"] = None
+            conversation = await self.conversation_manager.create_conversation(
+                item.get("title") or f"Batch {self.job_id} #{item['id']}",
+                self.tenant
+            )
+            record["conversation_id"] = conversation["id"]
+            await self.redis.hset(f"{self.key}:running", item["id"], conversation["id"])
+            await self._chat(item, record)
+        except Exception as e:
+            logger.warning("Batch prompt failed", extra={"job_id": self.job_id, "item_id": item["id"], "error": str(e)})
+            record.update(status="error", error=str(e))
+
+        elapsed = time.perf_counter() - start
+        record["elapsed_ms"] = round(elapsed * 1000, 1)
+        self.latency.record(elapsed)
+        if record["status"] == "ok":
+            self.completed += 1
+            self.response_chars += len(record["content"])
+        else:
+            self.failed += 1
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(f"{self.key}:results", item["id"], json.dumps(record))
+            pipe.hdel(f"{self.key}:running", item["id"])
+            self._expire(pipe)
+            await pipe.execute()
+        return record
+
+    async def _chat(self, item: dict[str, Any], record: dict):
+        """Run the prompt in the conversation of `record`, overload errors are waited out"""
+        for attempt in range(MAX_OVERLOAD_RETRIES + 1):
+            try:
+                result = await self.conversation_manager.chat(
+                    Message(role=Role.USER, content=item["prompt"]),
+                    record["conversation_id"],
+                    stream=False,
+                    deadline_seconds=self.deadline_seconds,
+                    tenant=self.tenant
+                )
+                record.update(status="ok", content=result["content"])
+                return
+            except (AdmissionRejected, CircuitOpenError) as e:
+                if attempt == MAX_OVERLOAD_RETRIES:
+                    raise
+                await asyncio.sleep(e.retry_after)
+
+    async def _discard_interrupted(self):
+        running = await self.redis.hgetall(f"{self.key}:running")
+        for item_id, conversation_id in running.items():
+            await self.conversation_manager.delete_conversation(conversation_id.decode(), self.tenant)
+            await self.redis.hdel(f"{self.key}:running", item_id)
+        if running:
+            logger.info("Discarded interrupted batch turns", extra={"job_id": self.job_id, "count": len(running)})
+
+    def _expire(self, pipe: Any):
+        for suffix in ("meta", "items", "results", "running"):
+            pipe.expire(f"{self.key}:{suffix}", self.ttl_seconds)
+
+    async def results(self) -> AsyncIterator[dict]:
+        """Stored result records in no particular order"""
+        async for _, record in self.redis.hscan_iter(f"{self.key}:results"):
+            yield json.loads(record)
+
+    async def progress(self) -> dict:
+        """Job state as stored in Redis, with throughput of the run in this process if there is one"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(f"{self.key}:meta")
+            pipe.hvals(f"{self.key}:results")
+            pipe.hlen(f"{self.key}:running")
+            meta, results, running = await pipe.execute()
+
+        statuses = [json.loads(record)["status"] for record in results]
+        progress = {
+            "job_id": self.job_id,
+            "status": meta.get(b"status", b"").decode(),
+            "created_at": meta.get(b"created_at", b"").decode(),
+            "total": int(meta.get(b"total", 0)),
+            "succeeded": statuses.count("ok"),
+            "failed": statuses.count("error"),
+            "running": running
+        }
+        if self.started_at is not None:
+            progress["run"] = self.stats()
+        return progress
+
+    def stats(self) -> dict:
+        """Throughput of the run in this process"""
+        elapsed = ((self.finished_at or time.monotonic()) - self.started_at) if self.started_at else 0.0
+        finished = self.completed + self.failed
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "elapsed_seconds": round(elapsed, 3),
+            "prompts_per_minute": round(finished / elapsed * 60, 2) if elapsed else 0.0,
+            "response_chars": self.response_chars,
+            "latency": self.latency.stats()
+        }
+
+
+def default_job_id(path: str) -> str:
+    """Same input file, same job: rerunning the command resumes it"""
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{digest}"
+
+
+async def run_to_file(job: BatchJob, path: str, resumed: bool) -> dict:
+    """
+    Run the job writing one line per prompt as it finishes. A resumed job rewrites the file from its stored
+    results, so prompts that failed or were not checkpointed before are not listed twice.
+    """
+    with open(path, "w", encoding="utf-8") as output:
+        def write(record: dict):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+        if resumed:
+            async for record in job.results():
+                if record["status"] == "ok":
+                    write(record)
+        return await job.run(write)
+
+
+async def run_cli(args: argparse.Namespace):
+    # Starting the app wires the MCP clients, Redis and the conversation manager from the environment
+    import agent.app as app_module
+
+    items = read_items(args.input)
+    job_id = args.job_id or default_job_id(args.input)
+
+    async with app_module.lifespan(app_module.app):
+        manager = app_module.conversation_manager
+        tenant = manager.tenants.tenant(args.tenant)
+        job = BatchJob(
+            manager,
+            tenant.redis,
+            job_id,
+            concurrency=args.concurrency,
+            deadline_seconds=args.deadline_seconds,
+            tenant=tenant
+        )
+        resumed = not await job.submit(items)
+        stats = await run_to_file(job, args.output, resumed)
+
+    print(json.dumps({"job_id": job_id, "resumed": resumed, **stats}, indent=2), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL file of prompts")
+    parser.add_argument("--output", "-o", default="batch_results.jsonl", help="JSONL results, rewritten on resume")
+    parser.add_argument("--concurrency", "-c", type=int, default=4)
+    parser.add_argument("--job-id", help="defaults to the input file name and a hash of its content")
+    parser.add_argument("--deadline-seconds", type=float, help="turn deadline, TURN_DEADLINE_SECONDS by default")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="tenant the conversations are created for")
+    asyncio.run(run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
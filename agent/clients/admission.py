@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import math
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from agent.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a model call can not be admitted, `retry_after` is a hint in seconds"""
+
+    status_code = 429
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Global limit of concurrent model calls with a bounded wait queue.
+
+    Waiters are grouped by key (conversation id) and served round-robin across keys,
+    so one conversation running many tool rounds can not starve the others.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued = 0
+        self._waiters: OrderedDict[str, deque[asyncio.Future]] = OrderedDict()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_wait = LatencyRecorder()
+        self.hold_time = LatencyRecorder()
+
+        logger.info(
+            "AdmissionController initialized",
+            extra={"max_concurrency": max_concurrency, "max_queue": max_queue, "queue_timeout": queue_timeout}
+        )
+
+    def has_capacity(self) -> bool:
+        """Whether a new call would be admitted or queued rather than rejected"""
+        return (self._active < self.max_concurrency and not self._queued) or self._queued < self.max_queue
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until queued calls drain"""
+        per_call = self.hold_time.mean or 1.0
+        return max(1, math.ceil(per_call * (self._queued + 1) / self.max_concurrency))
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncIterator[None]:
+        """Hold one of the model call slots for the duration of the block"""
+        await self._acquire(key)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            yield
+        finally:
+            self.hold_time.record(loop.time() - start)
+            self._release()
+
+    async def _acquire(self, key: str):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        if self._active < self.max_concurrency and not self._queued:
+            self._active += 1
+            self.admitted += 1
+            self.queue_wait.record(0.0)
+            return
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("Model call queue is full", self.retry_after())
+
+        waiter = loop.create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was handed over right as we gave up, pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._discard_waiter(key, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected("Timed out waiting for a model call slot", self.retry_after())
+            raise
+
+        self.admitted += 1
+        self.queue_wait.record(loop.time() - start)
+
+    def _discard_waiter(self, key: str, waiter: asyncio.Future):
+        waiters = self._waiters.get(key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+            self._queued -= 1
+        except ValueError:
+            return
+        if not waiters:
+            del self._waiters[key]
+
+    def _release(self):
+        """Hand the slot to the next waiter in round-robin order, or free it"""
+        while self._waiters:
+            key, waiters = next(iter(self._waiters.items()))
+            waiter = waiters.popleft()
+            self._queued -= 1
+            if waiters:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self._active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": self._queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": self.queue_wait.stats(),
+        }
@@ -1,17 +1,58 @@
+import asyncio
 import json
 import logging
 import re
+import time
 from collections import defaultdict
-from typing import Any, AsyncGenerator
-
-from openai import AsyncAzureOpenAI
-
-from agent.clients.stdio_mcp_client import StdioMCPClient
-from agent.models.message import Message, Role
-from agent.clients.http_mcp_client import HttpMCPClient
+from contextlib import asynccontextmanager, aclosing
+from typing import TYPE_CHECKING, Any, AsyncGenerator, AsyncIterator, Optional
+
+from agent.clients.admission import AdmissionController, AdmissionRejected
+from agent.clients.model_router import ModelRouter, FAST_ROUTE, STRONG_ROUTE
+from agent.clients.resilience import CircuitOpenError, DeadlineExceeded, ResiliencePolicy, ResilientCompletions
+from agent.clients.single_flight import ToolCallCoalescer
+from agent.logging_config import Lazy
+from agent.metrics import LatencyRecorder
+from agent.models.message import WireMessage, Role
+from agent.models.turn import Turn
+from agent.storage.tool_result_store import ToolResultStore
+from agent.storage.usage_store import estimate_tokens
+
+if TYPE_CHECKING:
+    from agent.clients.http_mcp_client import HttpMCPClient
+    from agent.clients.stdio_mcp_client import StdioMCPClient
 
 logger = logging.getLogger(__name__)
 
+TOOL_DEADLINE_MESSAGE = "Tool call was not completed: the time budget of this request is nearly spent, answer with what is known"
+
+READ_TOOL_RESULT = "read_tool_result"
+READ_TOOL_RESULT_MAX_LIMIT = 16000
+READ_TOOL_RESULT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": READ_TOOL_RESULT,
+        "description": (
+            "Reads a part of a tool result that was too large to be returned in full. "
+            "Truncated results tell the handle and the offset to continue from."
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "handle": {"type": "string", "description": "Handle of the truncated tool result"},
+                "offset": {"type": "integer", "minimum": 0, "description": "Character offset to start from"},
+                "limit": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": READ_TOOL_RESULT_MAX_LIMIT,
+                    "description": "Number of characters to read"
+                }
+            },
+            "required": ["handle"]
+        }
+    }
+}
+
 
 class PIIFilter:
     """Filter for detecting and removing credit card numbers from text"""
@@ -54,64 +95,240 @@ class DialClient:
             endpoint: str,
             model: str,
             tools: list[dict[str, Any]],
-            tool_name_client_map: dict[str, HttpMCPClient | StdioMCPClient]
+            tool_name_client_map: dict[str, "HttpMCPClient | StdioMCPClient"],
+            tool_result_store: Optional[ToolResultStore] = None,
+            max_inline_tool_result_chars: int = 8000,
+            tool_result_preview_chars: int = 2000,
+            admission: Optional[AdmissionController] = None,
+            resilience: Optional[ResiliencePolicy] = None,
+            router: Optional[ModelRouter] = None,
+            answer_reserve_seconds: float = 10.0,
+            tool_coalescer: Optional[ToolCallCoalescer] = None
     ):
         self.tools = tools
         self.tool_name_client_map = tool_name_client_map
         self.model = model
+        self.tool_result_store = tool_result_store
+        self.max_inline_tool_result_chars = max_inline_tool_result_chars
+        self.tool_result_preview_chars = tool_result_preview_chars
+        if tool_result_store:
+            self.tools = [*tools, READ_TOOL_RESULT_TOOL]
+
+        self.admission = admission
+        self.router = router
+        # Part of the turn deadline kept for the final answer, no tool rounds are started within it
+        self.answer_reserve_seconds = answer_reserve_seconds
+        self.tool_coalescer = tool_coalescer
+        self._tool_parameters = {
+            tool["function"]["name"]: tool["function"].get("parameters") or {}
+            for tool in self.tools
+        }
+
+        self.offloaded_tool_results = 0
+        self.offloaded_chars = 0
+        self.tool_result_pages_read = 0
+        self.cancelled_model_calls = 0
+        self.cancelled_tool_calls = 0
+        self.deadline_wrap_ups = 0
+        self.tool_timeouts = 0
+        self.model_latency = LatencyRecorder()
+        self.usage_by_model: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"rounds": 0, "prompt_tokens": 0, "completion_tokens": 0, "estimated_rounds": 0}
+        )
+        # openai takes a large part of the app import time, it is loaded when the client is built
+        import httpx
+        from openai import AsyncAzureOpenAI
+
+        resilience = resilience or ResiliencePolicy()
+        # Retries and deadlines are handled by ResilientCompletions
         self.async_openai = AsyncAzureOpenAI(
             api_key=api_key,
             azure_endpoint=endpoint,
-            api_version=""
+            api_version="",
+            max_retries=0,
+            timeout=httpx.Timeout(resilience.request_timeout, connect=10.0)
         )
+        self.completions = ResilientCompletions(self.async_openai.chat.completions, resilience)
         logger.info(
             "DialClient initialized",
             extra={
                 "model": model,
                 "endpoint": endpoint,
-                "tool_count": len(tools)
+                "tool_count": len(self.tools)
             }
         )
 
-    async def response(self, messages: list[Message]) -> Message:
-        """Non-streaming completion with tool calling support"""
+    def metrics(self) -> dict:
+        """Collect runtime metrics of model and tool calls"""
+        metrics = {
+            "model_latency": self.model_latency.stats(),
+            "resilience": self.completions.stats(),
+            "tool_results": {
+                "offloaded": self.offloaded_tool_results,
+                "offloaded_chars": self.offloaded_chars,
+                "pages_read": self.tool_result_pages_read
+            },
+            "cancellations": {
+                "model_calls": self.cancelled_model_calls,
+                "tool_calls": self.cancelled_tool_calls
+            },
+            "deadlines": {
+                "wrap_ups": self.deadline_wrap_ups,
+                "tool_timeouts": self.tool_timeouts
+            },
+            "model_usage": {model: dict(usage) for model, usage in self.usage_by_model.items()}
+        }
+        if self.admission:
+            metrics["admission"] = self.admission.stats()
+        if self.router:
+            metrics["routing"] = self.router.stats()
+        if self.tool_coalescer:
+            metrics["tool_coalescing"] = self.tool_coalescer.stats()
+        return metrics
+
+    @asynccontextmanager
+    async def _model_call(self, turn: Optional[Turn], route: str = STRONG_ROUTE) -> AsyncIterator[None]:
+        """
+        Wraps a single model call: waits for admission, then measures model latency.
+        Queue wait is reported by the admission controller, not as model latency.
+        """
+        recorders = [self.model_latency]
+        if self.router:
+            recorders.append(self.router.routes[route].latency)
+
+        if self.admission:
+            async with self.admission.slot(turn.conversation_id if turn else ""):
+                start = time.perf_counter()
+                try:
+                    yield
+                finally:
+                    for recorder in recorders:
+                        recorder.record(time.perf_counter() - start)
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            for recorder in recorders:
+                recorder.record(time.perf_counter() - start)
+
+    def _start_round(self, turn: Optional[Turn]) -> bool:
+        """Account a model round of the turn, True when the round has to answer without calling tools"""
+        if not turn:
+            return False
+
+        turn.rounds += 1
+        turn.prompt_chars_saved += turn.offloaded_chars
+
+        remaining = turn.remaining()
+        if not turn.wrapped_up and remaining is not None and remaining <= self.answer_reserve_seconds:
+            turn.wrapped_up = True
+            self.deadline_wrap_ups += 1
+            logger.info(
+                "Turn deadline is close, answering without further tool calls",
+                extra={"conversation_id": turn.conversation_id, "remaining_seconds": round(remaining, 3)}
+            )
+        return turn.wrapped_up
+
+    @staticmethod
+    def _round_options(turn: Optional[Turn], wrap_up: bool) -> dict[str, Any]:
+        """Deadline and tool choice of a model round"""
+        options = {"deadline": turn.deadline if turn else None}
+        if wrap_up:
+            options["tool_choice"] = "none"
+        return options
+
+    async def response(self, messages: list[dict[str, Any]], turn: Optional[Turn] = None) -> WireMessage:
+        """
+        Non-streaming completion with tool calling support.
+        `messages` is wire-ready history, new assistant and tool messages are appended to it.
+        """
         logger.debug(
             "Creating non-streaming completion",
             extra={"message_count": len(messages), "model": self.model}
         )
+        wrap_up = self._start_round(turn)
 
-        response = await self.async_openai.chat.completions.create(
-            model=self.model,
-            messages=[msg.to_dict() for msg in messages],
-            tools=self.tools,
-            temperature=0.0,
-            stream=False
-        )
+        ai_message = None
+        if self.router and not wrap_up and self.router.is_dispatch_round(messages):
+            ai_message = await self._fast_round(messages, turn)
+        if ai_message is None:
+            ai_message, _, _ = await self._complete(self.model, messages, turn, STRONG_ROUTE, wrap_up)
+
+        if ai_message.tool_calls:
+            messages.append(ai_message.to_dict())
+            await self._call_tools(ai_message, messages, turn=turn)
+            return await self.response(messages, turn)
+
+        logger.debug("Non-streaming completion finished")
+        return ai_message
+
+    async def _complete(
+            self,
+            model: str,
+            messages: list[dict[str, Any]],
+            turn: Optional[Turn],
+            route: str,
+            wrap_up: bool = False
+    ) -> tuple[WireMessage, Optional[str], Any]:
+        """Single non-streaming model call, returns assistant message, finish reason and usage"""
+        async with self._model_call(turn, route):
+            response = await self.completions.create(
+                model=model,
+                messages=messages,
+                tools=self.tools,
+                temperature=0.0,
+                stream=False,
+                **self._round_options(turn, wrap_up)
+            )
+        if self.router:
+            self.router.routes[route].record_usage(response.usage)
+
+        message = response.choices[0].message
+        output_chars = len(message.content or "") + sum(len(call.function.arguments or "") for call in message.tool_calls or [])
+        self._record_usage(turn, model, response.usage, messages, output_chars)
 
         content = response.choices[0].message.content or ""
         # Filter credit card numbers for PII protection
         filtered_content = PIIFilter.filter_credit_cards(content)
-        
-        ai_message = Message(
+
+        ai_message = WireMessage(
             role=Role.ASSISTANT,
             content=filtered_content,
         )
         if tool_calls := response.choices[0].message.tool_calls:
-            ai_message.tool_calls = tool_calls
+            ai_message.tool_calls = [tool_call.model_dump() for tool_call in tool_calls]
             logger.info(
                 "AI response includes tool calls",
-                extra={"tool_call_count": len(tool_calls)}
+                extra={"tool_call_count": len(tool_calls), "model": model}
             )
 
-        if ai_message.tool_calls:
-            messages.append(ai_message)
-            await self._call_tools(ai_message, messages)
-            return await self.response(messages)
+        return ai_message, response.choices[0].finish_reason, response.usage
 
-        logger.debug("Non-streaming completion finished")
+    async def _fast_round(self, messages: list[dict[str, Any]], turn: Optional[Turn]) -> Optional[WireMessage]:
+        """Try the round on the fast model, None means it has to be redone on the strong model"""
+        try:
+            ai_message, finish_reason, usage = await self._complete(
+                self.router.fast_model, messages, turn, FAST_ROUTE
+            )
+        except (AdmissionRejected, CircuitOpenError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.warning(f"Fast model round failed, escalating: {e}")
+            self.router.record_escalation("error", None)
+            return None
+
+        if reason := self.router.escalation_reason(ai_message, finish_reason, self._tool_parameters):
+            self.router.record_escalation(reason, usage)
+            return None
         return ai_message
 
-    async def stream_response(self, messages: list[Message]) -> AsyncGenerator[str, None]:
+    async def stream_response(
+            self,
+            messages: list[dict[str, Any]],
+            turn: Optional[Turn] = None
+    ) -> AsyncGenerator[str, None]:
         """
         Streaming completion with tool calling support.
         Yields SSE-formatted chunks.
@@ -120,66 +337,156 @@ class DialClient:
             "Creating streaming completion",
             extra={"message_count": len(messages), "model": self.model}
         )
-
-        stream = await self.async_openai.chat.completions.create(
-            model=self.model,
-            messages=[msg.to_dict() for msg in messages],
-            tools=self.tools,
-            temperature=0.0,
-            stream=True
-        )
+        wrap_up = self._start_round(turn)
+
+        # Fast rounds are not streamed, they are mostly tool dispatch and have to be checked before use
+        if self.router and not wrap_up and self.router.is_dispatch_round(messages):
+            if ai_message := await self._fast_round(messages, turn):
+                if ai_message.content:
+                    yield self._content_chunk(ai_message.content)
+                if ai_message.tool_calls:
+                    async with aclosing(self._stream_after_tools(ai_message, messages, turn)) as chunks:
+                        async for chunk in chunks:
+                            yield chunk
+                    return
+
+                messages.append(ai_message.to_dict())
+                for chunk in self._stop_chunks():
+                    yield chunk
+                return
 
         content_buffer = ""
         tool_deltas = []
+        usage = None
+
+        # The slot is held until the stream is consumed, tool calls run outside of it
+        try:
+            async with self._model_call(turn):
+                stream = self.completions.stream(
+                    model=self.model,
+                    messages=messages,
+                    tools=self.tools,
+                    temperature=0.0,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **self._round_options(turn, wrap_up)
+                )
 
-        async for chunk in stream:
-            delta = chunk.choices[0].delta
-
-            if delta and delta.content:
-                # Filter credit card numbers in real-time
-                filtered_content = PIIFilter.filter_credit_cards(delta.content)
-                
-                chunk_data = {
-                    "choices": [
-                        {"delta": {"content": filtered_content}, "index": 0, "finish_reason": None}
-                    ]
-                }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-                content_buffer += filtered_content
-
-            if delta.tool_calls:
-                tool_deltas.extend(delta.tool_calls)
+                async with aclosing(stream):
+                    async for chunk in stream:
+                        if chunk.usage:
+                            usage = chunk.usage
+                            if self.router:
+                                self.router.routes[STRONG_ROUTE].record_usage(chunk.usage)
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+
+                        if delta and delta.content:
+                            # Filter credit card numbers in real-time
+                            filtered_content = PIIFilter.filter_credit_cards(delta.content)
+                            yield self._content_chunk(filtered_content)
+                            content_buffer += filtered_content
+
+                        if delta.tool_calls:
+                            tool_deltas.extend(delta.tool_calls)
+            self._record_usage(turn, self.model, usage, messages, len(content_buffer) + self._tool_delta_chars(tool_deltas))
+        except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded) as e:
+            # Upstream stream and admission slot are released by the context managers above,
+            # keep what the user has already seen, unfinished tool call deltas are dropped
+            if not isinstance(e, DeadlineExceeded):
+                self.cancelled_model_calls += 1
+            # Tokens generated before the stream was dropped are billed all the same
+            self._record_usage(turn, self.model, usage, messages, len(content_buffer) + self._tool_delta_chars(tool_deltas))
+            if content_buffer:
+                messages.append(WireMessage(role=Role.ASSISTANT, content=content_buffer).to_dict())
+            raise
 
         if tool_deltas:
-            tool_calls = self._collect_tool_calls(tool_deltas)
-            ai_message = Message(
+            ai_message = WireMessage(
                 role=Role.ASSISTANT,
                 content=content_buffer,
-                tool_calls=tool_calls
+                tool_calls=self._collect_tool_calls(tool_deltas)
             )
-            messages.append(ai_message)
-            await self._call_tools(ai_message, messages)
+            async with aclosing(self._stream_after_tools(ai_message, messages, turn)) as chunks:
+                async for chunk in chunks:
+                    yield chunk
+            return
 
-            logger.info(
-                "Recursively streaming after tool calls",
-                extra={"tool_call_count": len(tool_calls)}
+        messages.append(WireMessage(role=Role.ASSISTANT, content=content_buffer).to_dict())
+
+        for chunk in self._stop_chunks():
+            yield chunk
+
+        logger.debug("Streaming completed")
+
+    def _record_usage(
+            self,
+            turn: Optional[Turn],
+            model: str,
+            usage: Any,
+            messages: list[dict[str, Any]],
+            output_chars: int
+    ):
+        """Account tokens of a model round, estimated from the prompt and output size when upstream sent no usage"""
+        estimated = usage is None
+        if estimated:
+            prompt_chars = sum(
+                len(message.get("content") or "") + len(json.dumps(message["tool_calls"]) if message.get("tool_calls") else "")
+                for message in messages
             )
+            prompt_tokens, completion_tokens = estimate_tokens(prompt_chars), estimate_tokens(output_chars)
+        else:
+            prompt_tokens, completion_tokens = usage.prompt_tokens or 0, usage.completion_tokens or 0
+
+        totals = self.usage_by_model[model]
+        totals["rounds"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["estimated_rounds"] += estimated
+        if turn:
+            turn.record_usage(model, prompt_tokens, completion_tokens, estimated)
+
+    @staticmethod
+    def _tool_delta_chars(tool_deltas: list) -> int:
+        return sum(len(delta.function.arguments or "") for delta in tool_deltas if delta.function)
+
+    async def _stream_after_tools(
+            self,
+            ai_message: WireMessage,
+            messages: list[dict[str, Any]],
+            turn: Optional[Turn]
+    ) -> AsyncGenerator[str, None]:
+        """Execute tool calls of the assistant message and stream the next round"""
+        messages.append(ai_message.to_dict())
+        await self._call_tools(ai_message, messages, turn=turn)
+
+        logger.info(
+            "Recursively streaming after tool calls",
+            extra={"tool_call_count": len(ai_message.tool_calls)}
+        )
 
-            async for chunk in self.stream_response(messages):
+        async with aclosing(self.stream_response(messages, turn)) as chunks:
+            async for chunk in chunks:
                 yield chunk
-            return
 
-        messages.append(Message(role=Role.ASSISTANT, content=content_buffer))
+    @staticmethod
+    def _content_chunk(content: str) -> str:
+        chunk_data = {
+            "choices": [
+                {"delta": {"content": content}, "index": 0, "finish_reason": None}
+            ]
+        }
+        return f"data: {json.dumps(chunk_data)}\n\n"
 
+    @staticmethod
+    def _stop_chunks() -> list[str]:
         final_chunk = {
             "choices": [
                 {"delta": {}, "index": 0, "finish_reason": "stop"}
             ]
         }
-        yield f"data: {json.dumps(final_chunk)}\n\n"
-        yield "data: [DONE]\n\n"
-
-        logger.debug("Streaming completed")
+        return [f"data: {json.dumps(final_chunk)}\n\n", "data: [DONE]\n\n"]
 
     def _collect_tool_calls(self, tool_deltas):
         """Convert streaming tool call deltas to complete tool calls"""
@@ -209,13 +516,21 @@ class DialClient:
 
         return list(tool_dict.values())
 
-    async def _call_tools(self, ai_message: Message, messages: list[Message], silent: bool = False):
+    async def _call_tools(
+            self,
+            ai_message: WireMessage,
+            messages: list[dict[str, Any]],
+            silent: bool = False,
+            turn: Optional[Turn] = None
+    ):
         """Execute tool calls using MCP client"""
         logger.info(
             "Executing tool calls",
             extra={"tool_call_count": len(ai_message.tool_calls)}
         )
 
+        # Results of read-only calls, a call repeated within the response is answered from here
+        read_only_results: dict[str, Any] = {}
         for tool_call in ai_message.tool_calls:
             tool_name = tool_call["function"]["name"]
             tool_args = json.loads(tool_call["function"]["arguments"])
@@ -225,27 +540,72 @@ class DialClient:
                 extra={"tool_name": tool_name, "tool_args": tool_args}
             )
 
+            if tool_name == READ_TOOL_RESULT and self.tool_result_store:
+                page = await self._read_tool_result(tool_args)
+                if turn:
+                    turn.record_tool_result(tool_name, page)
+                messages.append(WireMessage(
+                    role=Role.TOOL,
+                    content=page,
+                    tool_call_id=tool_call["id"]
+                ).to_dict())
+                continue
+
             mcp_client = self.tool_name_client_map.get(tool_name)
             if not mcp_client:
                 error_msg = f"Tool '{tool_name}' not found in available tools"
                 logger.warning(error_msg, extra={"tool_name": tool_name})
-                tool_message = Message(
+                tool_message = WireMessage(
                     role=Role.TOOL,
                     content=error_msg,
                     tool_call_id=tool_call["id"]
                 )
-                messages.append(tool_message)
+                messages.append(tool_message.to_dict())
                 continue
 
+            repeat_key = None
+            if self.tool_coalescer and self.tool_coalescer.is_read_only(tool_name):
+                repeat_key = self.tool_coalescer.key(tool_name, tool_args)
+                if repeat_key in read_only_results:
+                    self.tool_coalescer.record_repeat(tool_name)
+                    if turn:
+                        turn.record_tool_result(tool_name, read_only_results[repeat_key])
+                    messages.append(WireMessage(
+                        role=Role.TOOL,
+                        content=read_only_results[repeat_key],
+                        tool_call_id=tool_call["id"]
+                    ).to_dict())
+                    continue
+
+            # Tool calls must leave time for the final answer
+            budget = turn.remaining() if turn else None
+            if budget is not None:
+                budget -= self.answer_reserve_seconds
+                if budget <= 0:
+                    messages.append(WireMessage(
+                        role=Role.TOOL,
+                        content=TOOL_DEADLINE_MESSAGE,
+                        tool_call_id=tool_call["id"]
+                    ).to_dict())
+                    continue
+
             try:
-                tool_result = await mcp_client.call_tool(tool_name, tool_args)
+                tool_result = await asyncio.wait_for(self._execute_tool(mcp_client, tool_name, tool_args), budget)
                 logger.info(
                     "Tool executed successfully",
                     extra={
                         "tool_name": tool_name,
-                        "result_length": len(str(tool_result))
+                        "result_length": Lazy(lambda result=tool_result: len(str(result)))
                     }
                 )
+            except asyncio.TimeoutError:
+                self.tool_timeouts += 1
+                logger.warning("Tool call timed out, turn deadline is close", extra={"tool_name": tool_name})
+                tool_result = TOOL_DEADLINE_MESSAGE
+            except asyncio.CancelledError:
+                self.cancelled_tool_calls += 1
+                logger.info("Tool call cancelled", extra={"tool_name": tool_name})
+                raise
             except Exception as e:
                 error_msg = f"Tool execution failed: {str(e)}"
                 logger.error(
@@ -254,11 +614,67 @@ class DialClient:
                 )
                 tool_result = error_msg
 
-            tool_message = Message(
+            tool_message = WireMessage(
                 role=Role.TOOL,
-                content=str(tool_result),
+                content=await self._inline_tool_result(str(tool_result), turn),
                 tool_call_id=tool_call["id"]
             )
-            messages.append(tool_message)
+            messages.append(tool_message.to_dict())
+            if turn:
+                turn.record_tool_result(tool_name, tool_message.content)
+            if repeat_key and tool_result is not TOOL_DEADLINE_MESSAGE:
+                read_only_results[repeat_key] = tool_message.content
 
         logger.debug("All tool calls processed")
+
+    async def _execute_tool(self, mcp_client: "HttpMCPClient | StdioMCPClient", tool_name: str, tool_args: dict[str, Any]) -> Any:
+        if not self.tool_coalescer:
+            return await mcp_client.call_tool(tool_name, tool_args)
+        return await self.tool_coalescer.call(tool_name, tool_args, lambda: mcp_client.call_tool(tool_name, tool_args))
+
+    async def _inline_tool_result(self, content: str, turn: Optional[Turn] = None) -> str:
+        """Replace oversized tool output with a preview and a handle to page through the rest"""
+        if not self.tool_result_store or len(content) <= self.max_inline_tool_result_chars:
+            return content
+
+        handle = await self.tool_result_store.save(content)
+        preview = content[:self.tool_result_preview_chars]
+        offloaded_chars = len(content) - len(preview)
+
+        self.offloaded_tool_results += 1
+        self.offloaded_chars += offloaded_chars
+        if turn:
+            turn.offloaded_tool_results += 1
+            turn.offloaded_chars += offloaded_chars
+
+        logger.info(
+            "Tool result offloaded",
+            extra={"handle": handle, "result_length": len(content), "preview_length": len(preview)}
+        )
+
+        return (
+            f"{preview}\n\n[Tool result truncated: showing {len(preview)} of {len(content)} characters. "
+            f"Call {READ_TOOL_RESULT} with handle=\"{handle}\" and offset={len(preview)} to read more.]"
+        )
+
+    async def _read_tool_result(self, tool_args: dict[str, Any]) -> str:
+        """Serve the built-in read_tool_result tool"""
+        handle = tool_args.get("handle", "")
+        try:
+            offset = max(int(tool_args.get("offset", 0)), 0)
+            limit = int(tool_args.get("limit", self.max_inline_tool_result_chars))
+        except (TypeError, ValueError):
+            return f"Tool result '{handle}' not read: offset and limit must be whole numbers"
+        limit = min(max(limit, 1), READ_TOOL_RESULT_MAX_LIMIT)
+
+        page = await self.tool_result_store.read(handle, offset, limit)
+        if page is None:
+            return f"Tool result '{handle}' not found or expired"
+
+        self.tool_result_pages_read += 1
+        content, total = page
+        end = offset + len(content)
+        if end < total:
+            return f"{content}\n\n[Characters {offset}-{end} of {total}. Continue with offset={end}.]"
+        return f"{content}\n\n[Characters {offset}-{end} of {total}. End of result.]"
+
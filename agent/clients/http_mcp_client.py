@@ -5,6 +5,8 @@ from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 from mcp.types import CallToolResult, TextContent
 
+from agent.logging_config import Lazy
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,6 +18,8 @@ class HttpMCPClient:
         self.session: Optional[ClientSession] = None
         self._streams_context = None
         self._session_context = None
+        # Tools annotated with readOnlyHint by the server
+        self.read_only_tools: set[str] = set()
         logger.debug("HttpMCPClient instance created", extra={"server_url": mcp_server_url})
 
     @classmethod
@@ -41,10 +45,22 @@ class HttpMCPClient:
             "MCP session initialized",
             extra={
                 "server_url": self.server_url,
-                "init_result": init_result.model_dump()
+                "init_result": Lazy(init_result.model_dump)
             }
         )
 
+    async def close(self):
+        """Close the session, then the transport"""
+        for context in (self._session_context, self._streams_context):
+            if context is None:
+                continue
+            try:
+                await context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning("Failed to close MCP client", extra={"server_url": self.server_url, "error": str(e)})
+        self.session = self._session_context = self._streams_context = None
+        logger.info("MCP client closed", extra={"server_url": self.server_url})
+
     async def get_tools(self) -> list[dict[str, Any]]:
         """Get available tools from MCP server"""
         if not self.session:
@@ -65,13 +81,14 @@ class HttpMCPClient:
             }
             for tool in tools.tools
         ]
+        self.read_only_tools = {tool.name for tool in tools.tools if tool.annotations and tool.annotations.readOnlyHint}
 
         logger.info(
             "Retrieved tools from MCP server",
             extra={
                 "server_url": self.server_url,
                 "tool_count": len(tool_list),
-                "tool_names": [tool["function"]["name"] for tool in tool_list]
+                "tool_names": Lazy(lambda: [tool["function"]["name"] for tool in tool_list])
             }
         )
 
@@ -100,7 +117,7 @@ class HttpMCPClient:
             extra={
                 "server_url": self.server_url,
                 "tool_name": tool_name,
-                "content_length": len(str(content))
+                "content_length": Lazy(lambda: len(str(content)))
             }
         )
 
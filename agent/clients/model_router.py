@@ -0,0 +1,117 @@
+import json
+import logging
+from typing import Any, Optional
+
+from agent.metrics import LatencyRecorder
+from agent.models.message import WireMessage
+
+logger = logging.getLogger(__name__)
+
+FAST_ROUTE = "fast"
+STRONG_ROUTE = "strong"
+
+ESCALATION_RULES = frozenset({"invalid_tool_args", "unknown_tool", "truncated", "empty", "simple_turn"})
+
+
+class RouteStats:
+    def __init__(self, model: str):
+        self.model = model
+        self.latency = LatencyRecorder()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_usage(self, usage: Any):
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "latency": self.latency.stats(),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+        }
+
+
+class ModelRouter:
+    """
+    Sends tool-dispatch rounds (the first round of a turn, right after the user message) to a fast model
+    and keeps the strong model for rounds that synthesize an answer from tool results.
+
+    A fast round is redone on the strong model when it trips one of the `escalate_on` rules:
+    - invalid_tool_args: tool arguments are not a JSON object or miss required parameters
+    - unknown_tool: the model called a tool that does not exist
+    - truncated: the response hit the token limit
+    - empty: neither content nor tool calls
+    - simple_turn: the fast model answered directly, set it to keep all user-facing answers on the strong model
+    """
+
+    def __init__(self, fast_model: str, strong_model: str, escalate_on: frozenset[str]):
+        unknown_rules = escalate_on - ESCALATION_RULES
+        if unknown_rules:
+            raise ValueError(f"Unknown escalation rules: {', '.join(sorted(unknown_rules))}")
+
+        self.fast_model = fast_model
+        self.strong_model = strong_model
+        self.escalate_on = escalate_on
+        self.routes = {FAST_ROUTE: RouteStats(fast_model), STRONG_ROUTE: RouteStats(strong_model)}
+        self.escalations: dict[str, int] = {rule: 0 for rule in sorted(escalate_on)}
+        self.escalated_tokens = 0
+
+        logger.info(
+            "ModelRouter initialized",
+            extra={"fast_model": fast_model, "strong_model": strong_model, "escalate_on": sorted(escalate_on)}
+        )
+
+    @staticmethod
+    def is_dispatch_round(messages: list[dict[str, Any]]) -> bool:
+        return bool(messages) and messages[-1]["role"] == "user"
+
+    def escalation_reason(
+            self,
+            message: WireMessage,
+            finish_reason: Optional[str],
+            tool_parameters: dict[str, dict[str, Any]]
+    ) -> Optional[str]:
+        """Name of the first escalation rule the fast round violates"""
+        reasons = []
+        if finish_reason == "length":
+            reasons.append("truncated")
+        if message.tool_calls:
+            for tool_call in message.tool_calls:
+                name = tool_call["function"]["name"]
+                if name not in tool_parameters:
+                    reasons.append("unknown_tool")
+                    continue
+                try:
+                    args = json.loads(tool_call["function"]["arguments"] or "{}")
+                except json.JSONDecodeError:
+                    args = None
+                required = tool_parameters[name].get("required", [])
+                if not isinstance(args, dict) or any(param not in args for param in required):
+                    reasons.append("invalid_tool_args")
+        elif not message.content:
+            reasons.append("empty")
+        else:
+            reasons.append("simple_turn")
+
+        return next((reason for reason in reasons if reason in self.escalate_on), None)
+
+    def record_escalation(self, reason: str, usage: Any):
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+        if usage is not None:
+            self.escalated_tokens += (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+        logger.info("Fast model round escalated", extra={"reason": reason})
+
+    def stats(self) -> dict:
+        fast, strong = self.routes[FAST_ROUTE], self.routes[STRONG_ROUTE]
+        fast_tokens = fast.prompt_tokens + fast.completion_tokens
+        return {
+            "routes": {route: stats.stats() for route, stats in self.routes.items()},
+            "escalations": self.escalations,
+            # Tokens served by the fast model minus the ones wasted on escalated rounds
+            "tokens_moved_to_fast_model": fast_tokens - self.escalated_tokens,
+            "fast_latency_saving_ms": round((strong.latency.mean - fast.latency.mean) * 1000, 3)
+            if fast.latency.count and strong.latency.count else None,
+        }
@@ -0,0 +1,351 @@
+import asyncio
+import logging
+import time
+from functools import cache
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from agent.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+    status_code = 503
+
+    def __init__(self, retry_after: int):
+        super().__init__("Model service is unavailable, circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class FirstTokenTimeout(Exception):
+    """Upstream did not produce the first token (or the response) within the deadline"""
+
+
+class StreamStalled(Exception):
+    """Upstream stream stopped producing chunks"""
+
+
+class DeadlineExceeded(Exception):
+    """The turn ran out of its time budget"""
+
+    status_code = 504
+
+    def __init__(self, message: str = "Chat turn deadline exceeded"):
+        super().__init__(message)
+
+
+@cache
+def retryable_errors() -> tuple[type[Exception], ...]:
+    """Errors worth another attempt, openai is imported on first use to keep it out of module import"""
+    from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+    return APIConnectionError, APITimeoutError, RateLimitError, InternalServerError, FirstTokenTimeout
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures and rejects calls for `reset_timeout` seconds,
+    then lets a single probe through (half-open) and closes again once it succeeds.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        # Token of the half-open probe in flight, only the call holding it can release it
+        self._probe: Optional[object] = None
+
+    def check(self) -> Optional[object]:
+        """
+        Raise CircuitOpenError if a call must not be made now. Returns a token when the call is the
+        half-open probe, hand it to release_probe once the call ends.
+        """
+        if self.state == "closed":
+            return None
+
+        remaining = self._opened_at + self.reset_timeout - time.monotonic()
+        if self.state == "open" and remaining <= 0:
+            self.state = "half_open"
+        if self.state == "half_open" and self._probe is None:
+            self._probe = object()
+            return self._probe
+        raise CircuitOpenError(max(1, int(remaining + 1)))
+
+    def record_success(self):
+        self._failures = 0
+        self._probe = None
+        if self.state != "closed":
+            logger.info("Circuit breaker closed")
+        self.state = "closed"
+
+    def release_probe(self, probe: Optional[object]):
+        """
+        A probe that ended without a verdict (cancelled, out of time, client error) lets the next call
+        probe instead. No-op for calls that were not the probe and for probes already recorded.
+        """
+        if probe is not None and probe is self._probe:
+            self._probe = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self._probe = None
+            if self.state != "open":
+                self.opened += 1
+                logger.warning("Circuit breaker opened", extra={"consecutive_failures": self._failures})
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self._failures, "opened": self.opened}
+
+
+class ResiliencePolicy:
+    """Timeouts, retry, hedging and circuit breaker settings for model calls"""
+
+    def __init__(
+            self,
+            ttft_timeout: float = 30.0,
+            stream_idle_timeout: float = 60.0,
+            request_timeout: float = 120.0,
+            max_retries: int = 2,
+            retry_backoff: float = 0.5,
+            hedge: bool = True,
+            hedge_min_delay: float = 1.0,
+            hedge_min_samples: int = 20,
+            breaker: Optional[CircuitBreaker] = None
+    ):
+        self.ttft_timeout = ttft_timeout
+        self.stream_idle_timeout = stream_idle_timeout
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+
+
+class ResilientCompletions:
+    """
+    Wraps `chat.completions` of the OpenAI client.
+
+    - streaming calls must produce the first chunk within `ttft_timeout`, later chunks within `stream_idle_timeout`
+    - when the first chunk (or the full response) is slower than the observed p95, a second identical
+      request is sent and whichever answers first wins, the other one is cancelled and its connection closed
+    - connection errors, timeouts, 429 and 5xx are retried with exponential backoff, streams only before
+      their first chunk was delivered
+    - sustained failures open the circuit breaker
+    - with a `deadline` (a `time.monotonic()` timestamp) every timeout is capped by the remaining budget,
+      and DeadlineExceeded is raised once it is spent instead of retrying
+    """
+
+    def __init__(self, completions: Any, policy: ResiliencePolicy):
+        self.completions = completions
+        self.policy = policy
+        self.breaker = policy.breaker
+        self.first_chunk_latency = LatencyRecorder()
+        self.response_latency = LatencyRecorder()
+
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.failures = 0
+
+    async def create(self, deadline: Optional[float] = None, **kwargs) -> Any:
+        """Non-streaming completion"""
+        return await self._with_retries(
+            lambda: self._hedged(
+                lambda: self.completions.create(**kwargs),
+                self.response_latency,
+                _budget(self.policy.request_timeout, deadline)
+            ),
+            deadline
+        )
+
+    async def stream(self, deadline: Optional[float] = None, **kwargs) -> AsyncIterator[Any]:
+        """Streaming completion, yields chunks"""
+        first_chunk, stream = await self._with_retries(
+            lambda: self._hedged(
+                lambda: self._open_stream(kwargs),
+                self.first_chunk_latency,
+                _budget(self.policy.ttft_timeout, deadline),
+                discard=lambda opened: _close_quietly(opened[1])
+            ),
+            deadline
+        )
+
+        try:
+            if first_chunk is None:
+                return
+            yield first_chunk
+
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(
+                        stream.__anext__(),
+                        _budget(self.policy.stream_idle_timeout, deadline)
+                    )
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    if _expired(deadline):
+                        raise DeadlineExceeded()
+                    self.timeouts += 1
+                    self.breaker.record_failure()
+                    raise StreamStalled(f"No stream chunk within {self.policy.stream_idle_timeout}s")
+                except retryable_errors():
+                    self.breaker.record_failure()
+                    raise
+                yield chunk
+        finally:
+            await _close_quietly(stream)
+
+    async def _open_stream(self, kwargs: dict) -> tuple[Any, Any]:
+        """Start a stream and wait for its first chunk, the stream is closed if this gets cancelled"""
+        stream = None
+        try:
+            stream = await self.completions.create(**kwargs)
+            try:
+                first_chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                first_chunk = None
+            return first_chunk, stream
+        except BaseException:
+            if stream is not None:
+                await _close_quietly(stream)
+            raise
+
+    def _hedge_delay(self, recorder: LatencyRecorder) -> Optional[float]:
+        if not self.policy.hedge or recorder.count < self.policy.hedge_min_samples:
+            return None
+        return max(recorder.percentile(0.95), self.policy.hedge_min_delay)
+
+    async def _hedged(
+            self,
+            factory: Callable[[], Awaitable[Any]],
+            recorder: LatencyRecorder,
+            timeout: float,
+            discard: Optional[Callable[[Any], Awaitable[None]]] = None
+    ) -> Any:
+        """Run `factory`, start a second attempt if the first one is slower than p95, return the first success"""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+
+        self.attempts += 1
+        primary = asyncio.create_task(factory())
+        tasks = {primary}
+        hedge = None
+        try:
+            delay = self._hedge_delay(recorder)
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.attempts += 1
+                    self.hedges += 1
+                    hedge = asyncio.create_task(factory())
+                    tasks.add(hedge)
+                    logger.debug("Hedged model request sent", extra={"hedge_delay": delay})
+
+            last_error: Optional[BaseException] = None
+            while tasks:
+                remaining = deadline - loop.time()
+                done, _ = await asyncio.wait(tasks, timeout=max(remaining, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.timeouts += 1
+                    raise FirstTokenTimeout(f"No response within {timeout}s")
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        recorder.record(loop.time() - start)
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        if discard:
+                            # Both may have finished in the same iteration, close the loser
+                            for other in done - {task}:
+                                tasks.discard(other)
+                                if other.exception() is None:
+                                    await discard(other.result())
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _with_retries(self, attempt: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        for retry in range(self.policy.max_retries + 1):
+            # Checked first, an expired turn must not take the half-open probe
+            if _expired(deadline):
+                raise DeadlineExceeded()
+            probe = self.breaker.check()
+            try:
+                result = await attempt()
+            except retryable_errors() as e:
+                if isinstance(e, FirstTokenTimeout) and _expired(deadline):
+                    # Out of budget, not a sign of upstream trouble
+                    raise DeadlineExceeded() from e
+                self.failures += 1
+                self.breaker.record_failure()
+                if retry == self.policy.max_retries:
+                    raise
+                self.retries += 1
+                backoff = self.policy.retry_backoff * 2 ** retry
+                if _expired(deadline, margin=backoff):
+                    raise DeadlineExceeded() from e
+                logger.warning(
+                    f"Model call failed, retrying in {backoff:.1f}s: {e}",
+                    extra={"retry": retry + 1, "error_type": type(e).__name__}
+                )
+                await asyncio.sleep(backoff)
+                continue
+            except Exception:
+                # Client errors (4xx) say nothing about upstream health, the breaker state is left as it is
+                self.failures += 1
+                raise
+            finally:
+                # No-op once the attempt was recorded, frees the probe of a cancelled, expired or rejected one
+                self.breaker.release_probe(probe)
+            self.breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "first_chunk_latency": self.first_chunk_latency.stats(),
+            "response_latency": self.response_latency.stats(),
+            "circuit_breaker": self.breaker.stats(),
+        }
+
+
+def _budget(timeout: float, deadline: Optional[float]) -> float:
+    """Timeout capped by the time left until `deadline`"""
+    if deadline is None:
+        return timeout
+    return max(min(timeout, deadline - time.monotonic()), 0)
+
+
+def _expired(deadline: Optional[float], margin: float = 0) -> bool:
+    return deadline is not None and time.monotonic() + margin >= deadline
+
+
+async def _close_quietly(stream: Any):
+    try:
+        await stream.close()
+    except Exception:
+        pass
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ToolCallCoalescer:
+    """
+    Single-flight for read-only tools: concurrent calls of the same tool with the same arguments share
+    one MCP call and its result (or error). Nothing is cached, a call arriving after the shared one
+    finished runs again.
+
+    A caller that is cancelled stops waiting without affecting the others, the shared call is cancelled
+    only when its last caller is gone.
+    """
+
+    def __init__(self, read_only_tools: set[str]):
+        self.read_only_tools = frozenset(read_only_tools)
+        self._flights: dict[str, _Flight] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.repeated = 0
+        self.coalesced_by_tool: dict[str, int] = {}
+
+    @staticmethod
+    def key(tool_name: str, tool_args: dict[str, Any]) -> str:
+        """Arguments in canonical form, key order and whitespace do not matter"""
+        return f"{tool_name}:{json.dumps(tool_args, sort_keys=True, separators=(',', ':'), ensure_ascii=False)}"
+
+    def is_read_only(self, tool_name: str) -> bool:
+        return tool_name in self.read_only_tools
+
+    async def call(self, tool_name: str, tool_args: dict[str, Any], execute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.is_read_only(tool_name):
+            return await execute()
+
+        self.calls += 1
+        key = self.key(tool_name, tool_args)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(execute()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, flight=flight: self._land(key, flight))
+            self.executions += 1
+        else:
+            self._count(tool_name)
+            logger.debug("Tool call joined in-flight call", extra={"tool_name": tool_name})
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self._land(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def record_repeat(self, tool_name: str):
+        """A call repeated within one model response, answered with the result of the first one"""
+        self.repeated += 1
+        self._count(tool_name)
+
+    def _count(self, tool_name: str):
+        self.coalesced += 1
+        self.coalesced_by_tool[tool_name] = self.coalesced_by_tool.get(tool_name, 0) + 1
+
+    def _land(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        requested = self.calls + self.repeated
+        return {
+            "read_only_tools": sorted(self.read_only_tools),
+            "calls": requested,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "repeated_in_response": self.repeated,
+            "coalescing_rate": round(self.coalesced / requested, 4) if requested else 0.0,
+            "in_flight": len(self._flights),
+            "coalesced_by_tool": dict(self.coalesced_by_tool)
+        }
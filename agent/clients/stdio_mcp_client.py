@@ -5,6 +5,8 @@ from mcp import ClientSession
 from mcp.client.stdio import StdioServerParameters, stdio_client
 from mcp.types import CallToolResult, TextContent
 
+from agent.logging_config import Lazy
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,6 +19,8 @@ class StdioMCPClient:
         self._stdio_context = None
         self._session_context = None
         self._process = None
+        # Tools annotated with readOnlyHint by the server
+        self.read_only_tools: set[str] = set()
         logger.debug("StdioMCPClient instance created", extra={"docker_image": docker_image})
 
     @classmethod
@@ -49,10 +53,22 @@ class StdioMCPClient:
             "MCP session initialized via stdio",
             extra={
                 "docker_image": self.docker_image,
-                "capabilities": init_result.model_dump()
+                "capabilities": Lazy(init_result.model_dump)
             }
         )
 
+    async def close(self):
+        """Close the session, then the Docker process, which stops the container"""
+        for context in (self._session_context, self._stdio_context):
+            if context is None:
+                continue
+            try:
+                await context.__aexit__(None, None, None)
+            except Exception as e:
+                logger.warning("Failed to close MCP client", extra={"docker_image": self.docker_image, "error": str(e)})
+        self.session = self._session_context = self._stdio_context = None
+        logger.info("MCP client closed", extra={"docker_image": self.docker_image})
+
     async def get_tools(self) -> list[dict[str, Any]]:
         """Get available tools from MCP server"""
         if not self.session:
@@ -73,13 +89,15 @@ class StdioMCPClient:
                 }
             }
             dial_tools.append(dial_tool)
+            if tool.annotations and tool.annotations.readOnlyHint:
+                self.read_only_tools.add(tool.name)
 
         logger.info(
             "Retrieved tools from MCP server",
             extra={
                 "docker_image": self.docker_image,
                 "tool_count": len(dial_tools),
-                "tool_names": [tool["function"]["name"] for tool in dial_tools]
+                "tool_names": Lazy(lambda: [tool["function"]["name"] for tool in dial_tools])
             }
         )
 
@@ -111,7 +129,7 @@ class StdioMCPClient:
             extra={
                 "docker_image": self.docker_image,
                 "tool_name": tool_name,
-                "content_length": len(str(content))
+                "content_length": Lazy(lambda: len(str(content)))
             }
         )
 
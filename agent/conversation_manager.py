@@ -1,32 +1,242 @@
+import asyncio
 import json
 import logging
 import os
+import time
 import uuid
+from contextlib import aclosing, contextmanager
 from datetime import datetime, UTC
-from typing import Optional, AsyncGenerator
+from typing import Optional, AsyncGenerator, Any, Iterator
 
 import redis.asyncio as redis
 
-from agent.clients.dial_client import DialClient
-from agent.models.message import Message, Role
+from agent.clients.admission import AdmissionRejected
+from agent.clients.dial_client import READ_TOOL_RESULT, DialClient
+from agent.clients.resilience import CircuitOpenError, DeadlineExceeded
+from agent.models.message import Message, Role, WireMessage
+from agent.models.turn import Turn
 from agent.prompts import SYSTEM_PROMPT
+from agent.storage.archive import ConversationArchive
+from agent.storage.codec import ConversationCodec
+from agent.storage.conversation_cache import ConversationCache
+from agent.storage.search_index import DOC_PREFIX, TITLES_KEY, ConversationSearchIndex
+from agent.storage.tenancy import Tenant, TenantShards, query_tenants
+from agent.storage.usage_store import CHARS_PER_TOKEN, UsageStore
 
 logger = logging.getLogger(__name__)
 
 CONVERSATION_PREFIX = "conversation:"
+# Per-message copy of the history, lets clients read ranges without decoding the whole conversation
+MESSAGES_KEY_SUFFIX = ":messages"
 CONVERSATION_LIST_KEY = "conversations:list"
+ARCHIVED_CONVERSATIONS_KEY = "conversations:archived"
+
+CANCELLED_TOOL_CALL_MESSAGE = "Tool call cancelled: the client disconnected before it finished"
+COMPACTED_PREFIX = "[Compacted tool result"
+# Shorter tool results are kept when the history is compacted
+COMPACT_MIN_CHARS = 500
+
+# Forks reference the history of their parent instead of copying it. The hashes count the forks reading
+# each conversation and map each fork to its parent, a deleted parent is kept under the retained key
+# until its last fork is gone.
+CONVERSATION_FORKS_KEY = "conversations:forks"
+CONVERSATION_PARENTS_KEY = "conversations:parents"
+RETAINED_KEY_SUFFIX = ":retained"
+# Forks of forks deeper than this copy the history, reads resolve at most this many parents
+MAX_FORK_DEPTH = 8
+# Forking retries while the parent changes under it
+FORK_ATTEMPTS = 5
+# Time turns get past the drain deadline to save what they have before they are cancelled
+DRAIN_GRACE_SECONDS = 5
+
+# Removes a conversation with everything keyed by its id in one atomic step. The list entry is removed even
+# when the payload is already gone, so orphan ids are cleaned up too. A payload forks still read is retained
+# instead, otherwise the conversation releases its parent, and retained parents nobody reads any more go
+# along up the chain. The chain of parents is read beforehand so that every key is declared, when it no
+# longer matches nothing is changed and -1 is returned. Otherwise returns how many of payload and archive
+# stub existed, and the search text and title, whose posting lists are dropped afterwards.
+# KEYS: payload, conversations list, archive stubs, search titles, fork counts, parents, retained payload,
+# search text, other keys of the conversation, retained payloads of the parents.
+# ARGV: id, number of parents, parent ids nearest first
+DELETE_CONVERSATION_SCRIPT = """
+local parents = tonumber(ARGV[2])
+local child = ARGV[1]
+for level = 1, parents + 1 do
+  if redis.call("HGET", KEYS[6], child) ~= (ARGV[2 + level] or false) then
+    return {-1}
+  end
+  child = ARGV[2 + level]
+end
+
+local removed
+if tonumber(redis.call("HGET", KEYS[5], ARGV[1]) or "0") > 0 then
+  removed = redis.call("EXISTS", KEYS[1])
+  if removed == 1 then
+    redis.call("RENAME", KEYS[1], KEYS[7])
+  end
+else
+  removed = redis.call("DEL", KEYS[1])
+  child = ARGV[1]
+  for level = 1, parents do
+    local parent = ARGV[2 + level]
+    redis.call("HDEL", KEYS[6], child)
+    if redis.call("HINCRBY", KEYS[5], parent, -1) > 0 then
+      break
+    end
+    redis.call("HDEL", KEYS[5], parent)
+    if redis.call("DEL", KEYS[#KEYS - parents + level]) == 0 then
+      break
+    end
+    child = parent
+  end
+end
+removed = removed + redis.call("HDEL", KEYS[3], ARGV[1])
+redis.call("ZREM", KEYS[2], ARGV[1])
+local title = redis.call("HGET", KEYS[4], ARGV[1])
+local doc = redis.call("GET", KEYS[8])
+redis.call("HDEL", KEYS[4], ARGV[1])
+redis.call("DEL", unpack(KEYS, 8, #KEYS - parents))
+return {removed, title, doc}
+"""
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised before a turn of a conversation that has used up its token budget"""
+
+    status_code = 403
+
+
+class ServiceDraining(Exception):
+    """Raised for turns started while the service drains before a restart, another instance takes them"""
+
+    status_code = 503
+    retry_after = 1
 
 
 class ConversationManager:
     """Manages conversation lifecycle including AI interactions and persistence"""
 
-    def __init__(self, dial_client: DialClient, redis_client: redis.Redis):
+    def __init__(
+            self,
+            dial_client: DialClient,
+            redis_client: redis.Redis,
+            cache: Optional[ConversationCache] = None,
+            codec: Optional[ConversationCodec] = None,
+            archive: Optional[ConversationArchive] = None,
+            turn_deadline_seconds: float = 0,
+            messages_ttl_seconds: int = 24 * 3600,
+            search_index: Optional[ConversationSearchIndex] = None,
+            usage_store: Optional[UsageStore] = None,
+            token_budget: int = 0,
+            compact_prompt_tokens: int = 0,
+            tenants: Optional[TenantShards] = None
+    ):
         self.dial_client = dial_client
         self.redis = redis_client
-        logger.info("ConversationManager initialized")
+        # Every conversation belongs to a tenant, whose shard and key prefix it is stored under
+        self.tenants = tenants or TenantShards([redis_client])
+        self.default_tenant = self.tenants.tenant()
+        self.cache = cache
+        self.codec = codec or ConversationCodec("json")
+        self.archive = archive
+        self.turn_deadline_seconds = turn_deadline_seconds
+        # Message lists of conversations nobody reads expire, they are rebuilt from the conversation on demand
+        self.messages_ttl_seconds = messages_ttl_seconds
+        self.search_index = search_index
+        self.usage_store = usage_store
+        # Tokens a conversation may use over its lifetime, further turns are refused, 0 means no limit
+        self.token_budget = token_budget
+        # Prompt size that makes the next turn compact old tool results out of the history, 0 disables it
+        self.compact_prompt_tokens = compact_prompt_tokens
+        self.budget_refusals = 0
+        self.compactions = 0
+        self.compacted_chars = 0
+        self.archived = 0
+        self.rehydrated = 0
+        self.cancelled_turns = 0
+        self.deadline_exceeded_turns = 0
+        self.partial_chars_saved = 0
+        self.forks = 0
+        # Saves of cancelled turns run detached from the cancelled request
+        self._pending_saves: set[asyncio.Task] = set()
+        # Tasks running a turn, a drain shortens their deadline and cancels those that overrun it
+        self._active_turns: dict[asyncio.Task, Turn] = {}
+        self._turns_idle = asyncio.Event()
+        self._turns_idle.set()
+        self.draining = False
+        # Sent by SHA, loaded into the script cache of a shard again when it lost it
+        self._delete_script = self.redis.register_script(DELETE_CONVERSATION_SCRIPT)
+        logger.info(
+            "ConversationManager initialized",
+            extra={
+                "cache_enabled": cache is not None,
+                "codec": self.codec.name,
+                "archive_enabled": archive is not None,
+                "search_enabled": search_index is not None,
+                "redis_shards": len(self.tenants.shards)
+            }
+        )
+
+    @property
+    def active_turns(self) -> int:
+        return len(self._active_turns)
 
-    async def create_conversation(self, title: str) -> dict:
+    async def metrics(self) -> dict:
+        """Collect runtime metrics of the conversation layer"""
+        metrics = self.dial_client.metrics()
+        tenants = await self.tenants.all()
+        metrics["tenants"] = {**self.tenants.stats(), "tenants": len(tenants)}
+        if self.cache:
+            metrics["conversation_cache"] = self.cache.stats()
+        if self.archive:
+            archived = await query_tenants(tenants, lambda pipe, tenant: pipe.hlen(tenant.key(ARCHIVED_CONVERSATIONS_KEY)))
+            metrics["conversation_archive"] = {
+                "archived_conversations": sum(archived),
+                "archived": self.archived,
+                "rehydrated": self.rehydrated
+            }
+        metrics["cancelled_turns"] = {
+            "count": self.cancelled_turns,
+            "partial_chars_saved": self.partial_chars_saved,
+            "estimated_tokens_saved": self.partial_chars_saved // CHARS_PER_TOKEN
+        }
+        metrics["deadline_exceeded_turns"] = self.deadline_exceeded_turns
+        metrics["turns"] = {"active": self.active_turns, "draining": self.draining}
+        forked = await query_tenants(tenants, lambda pipe, tenant: pipe.hlen(tenant.key(CONVERSATION_PARENTS_KEY)))
+        metrics["forks"] = {"created": self.forks, "stored": sum(forked)}
+        if self.search_index:
+            metrics["search"] = await self.search_index.stats(tenants)
+        if self.usage_store:
+            metrics["usage"] = await self.usage_store.stats(tenants)
+            metrics["token_budget"] = {
+                "budget": self.token_budget,
+                "refusals": self.budget_refusals,
+                "compactions": self.compactions,
+                "compacted_chars": self.compacted_chars
+            }
+        return metrics
+
+    @staticmethod
+    def _summarize(conversation: dict) -> dict:
+        """Conversation fields shown in the conversations list, from the stored payload"""
+        return {
+            "id": conversation["id"],
+            "title": conversation["title"],
+            "created_at": conversation["created_at"],
+            "updated_at": conversation["updated_at"],
+            "message_count": conversation.get("parent_message_count", 0) + len(conversation["messages"])
+        }
+
+    @staticmethod
+    def _stored(conversation: dict) -> dict:
+        """What is stored of a conversation: a fork keeps only the messages after its parent's"""
+        if not (inherited := conversation.get("parent_message_count")):
+            return conversation
+        return {**conversation, "messages": conversation["messages"][inherited:]}
+
+    async def create_conversation(self, title: str, tenant: Optional[Tenant] = None) -> dict:
         """Create a new conversation"""
+        tenant = tenant or self.default_tenant
         conversation_id = str(uuid.uuid4())
         now = datetime.now(UTC).isoformat()
 
@@ -38,61 +248,131 @@ class ConversationManager:
             "updated_at": now
         }
 
-        await self.redis.set(
-            f"{CONVERSATION_PREFIX}{conversation_id}",
-            json.dumps(conversation)
-        )
+        payload = self.codec.encode(conversation)
+        await self.tenants.register(tenant)
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            pipe.set(tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}"), payload)
+            pipe.zadd(tenant.key(CONVERSATION_LIST_KEY), {conversation_id: datetime.now(UTC).timestamp()})
+            if self.search_index:
+                self.search_index.stage(pipe, conversation_id, [], title=title, tenant=tenant)
+            await pipe.execute()
 
-        await self.redis.zadd(
-            CONVERSATION_LIST_KEY,
-            {conversation_id: datetime.now(UTC).timestamp()}
-        )
+        if self.cache:
+            self.cache.put(tenant.key(conversation_id), conversation, len(payload))
 
         logger.info(
             "Conversation created",
             extra={
                 "conversation_id": conversation_id,
-                "title": conversation["title"]
+                "title": conversation["title"],
+                "tenant": tenant.id
             }
         )
 
         return conversation
 
-    async def list_conversations(self) -> list[dict]:
-        """List all conversations sorted by last update time"""
-        logger.debug("Listing all conversations")
-        conversation_ids = await self.redis.zrevrange(CONVERSATION_LIST_KEY, 0, -1)
+    async def list_conversations(self, tenant: Optional[Tenant] = None) -> list[dict]:
+        """List all conversations of the tenant sorted by last update time"""
+        tenant = tenant or self.default_tenant
+        logger.debug("Listing all conversations", extra={"tenant": tenant.id})
+        conversation_ids = await tenant.redis.zrevrange(tenant.key(CONVERSATION_LIST_KEY), 0, -1)
 
         conversations = []
         for conv_id in conversation_ids:
-            conv_data = await self.redis.get(f"{CONVERSATION_PREFIX}{conv_id}")
+            conv_data = await tenant.redis.get(tenant.key(f"{CONVERSATION_PREFIX}{conv_id.decode()}"))
             if conv_data:
-                conv = json.loads(conv_data)
-                conversations.append({
-                    "id": conv["id"],
-                    "title": conv["title"],
-                    "created_at": conv["created_at"],
-                    "updated_at": conv["updated_at"],
-                    "message_count": len(conv["messages"])
-                })
+                conversations.append(self._summarize(self.codec.decode(conv_data)))
+            elif stub := await tenant.redis.hget(tenant.key(ARCHIVED_CONVERSATIONS_KEY), conv_id):
+                conversations.append(json.loads(stub))
 
         logger.info(
             "Conversations listed",
-            extra={"conversation_count": len(conversations)}
+            extra={"conversation_count": len(conversations), "tenant": tenant.id}
         )
 
         return conversations
 
-    async def get_conversation(self, conversation_id: str) -> Optional[dict]:
-        """Get a specific conversation"""
+    async def search_conversations(self, query: str, limit: int = 20, tenant: Optional[Tenant] = None) -> list[dict]:
+        """Conversations of the tenant matching the query, with the best matching message"""
+        if not self.search_index:
+            return []
+        hits = await self.search_index.search(query, limit, tenant or self.default_tenant)
+        logger.debug("Conversations searched", extra={"query": query, "hit_count": len(hits)})
+        return hits
+
+    async def index_conversations(self, batch_size: int = 200) -> int:
+        """Index conversations stored before the search index was enabled, archived ones included, of every tenant"""
+        if not self.search_index:
+            return 0
+
+        indexed = 0
+        for tenant in await self.tenants.all():
+            offset = 0
+            list_key = tenant.key(CONVERSATION_LIST_KEY)
+            while conversation_ids := await tenant.redis.zrange(list_key, offset, offset + batch_size - 1):
+                offset += batch_size
+                for conv_id in conversation_ids:
+                    if await self._index_conversation(conv_id.decode(), tenant):
+                        indexed += 1
+
+        logger.info("Conversations indexed for search", extra={"indexed_count": indexed})
+        return indexed
+
+    async def _index_conversation(self, conversation_id: str, tenant: Tenant) -> bool:
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            # A save in between indexes the conversation itself
+            await pipe.watch(key)
+            if await self.search_index.is_indexed(conversation_id, tenant):
+                return False
+            conv_data = await pipe.get(key)
+            if (
+                    conv_data is None
+                    and self.archive
+                    and await tenant.redis.hexists(tenant.key(ARCHIVED_CONVERSATIONS_KEY), conversation_id)
+            ):
+                conv_data = await self.archive.get(tenant.key(conversation_id))
+            if conv_data is None:
+                return False
+
+            conversation = self.codec.decode(conv_data)
+            pipe.multi()
+            self.search_index.stage(
+                pipe,
+                conversation_id,
+                conversation["messages"],
+                start_index=conversation.get("parent_message_count", 0),
+                title=conversation["title"],
+                tenant=tenant
+            )
+            try:
+                await pipe.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+    async def get_conversation(self, conversation_id: str, tenant: Optional[Tenant] = None) -> Optional[dict]:
+        """Get a specific conversation of the tenant"""
+        tenant = tenant or self.default_tenant
         logger.debug("Retrieving conversation", extra={"conversation_id": conversation_id})
 
-        conv_data = await self.redis.get(f"{CONVERSATION_PREFIX}{conversation_id}")
+        if self.cache and (cached := self.cache.get(tenant.key(conversation_id))) is not None:
+            logger.debug("Conversation served from cache", extra={"conversation_id": conversation_id})
+            return cached
+
+        # A save or invalidation while we read makes the copy we read too old to cache
+        generation = self.cache.generation() if self.cache else None
+        conv_data = await tenant.redis.get(tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}"))
+        if not conv_data and self.archive:
+            conv_data = await self._rehydrate_conversation(conversation_id, tenant)
         if not conv_data:
-            logger.warning("Conversation not found", extra={"conversation_id": conversation_id})
+            logger.warning("Conversation not found", extra={"conversation_id": conversation_id, "tenant": tenant.id})
             return None
 
-        conversation = json.loads(conv_data)
+        conversation = await self._resolve_history(self.codec.decode(conv_data), tenant)
+        if self.cache:
+            self.cache.put(tenant.key(conversation_id), conversation, len(conv_data), generation)
+
         logger.debug(
             "Conversation retrieved",
             extra={
@@ -103,30 +383,382 @@ class ConversationManager:
 
         return conversation
 
-    async def delete_conversation(self, conversation_id: str) -> bool:
+    async def _resolve_history(self, conversation: dict, tenant: Tenant) -> dict:
+        """Full history of a stored conversation, a fork gets the messages it shares with its parents prepended"""
+        if not (inherited := conversation.get("parent_message_count")):
+            return conversation
+        history = await self._history(conversation["parent_id"], inherited, tenant)
+        return {**conversation, "messages": history + conversation["messages"]}
+
+    async def _history(self, conversation_id: str, count: int, tenant: Tenant) -> list[dict]:
+        """First `count` messages of a conversation, which may be deleted and retained for its forks"""
+        if self.cache and (cached := self.cache.get(tenant.key(conversation_id))) is not None:
+            return cached["messages"][:count]
+
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+        conv_data = next(filter(None, await tenant.redis.mget(key, f"{key}{RETAINED_KEY_SUFFIX}")), None)
+        if conv_data is None:
+            logger.error("History of a fork is missing", extra={"conversation_id": conversation_id, "tenant": tenant.id})
+            raise RuntimeError(f"History of conversation {conversation_id} is missing")
+
+        conversation = self.codec.decode(conv_data)
+        inherited = conversation.get("parent_message_count", 0)
+        if count <= inherited:
+            return await self._history(conversation["parent_id"], count, tenant)
+        history = await self._history(conversation["parent_id"], inherited, tenant) if inherited else []
+        return history + conversation["messages"][:count - inherited]
+
+    async def fork_conversation(
+            self,
+            conversation_id: str,
+            message_count: Optional[int] = None,
+            title: Optional[str] = None,
+            tenant: Optional[Tenant] = None
+    ) -> Optional[dict]:
+        """
+        Start a conversation from the first `message_count` messages of another one, all of them by default.
+        The fork references that history instead of copying it and stores only the messages added to it.
+        """
+        tenant = tenant or self.default_tenant
+        for _ in range(FORK_ATTEMPTS):
+            parent = await self.get_conversation(conversation_id, tenant)
+            if not parent:
+                return None
+            try:
+                return await self._fork(parent, message_count, title, tenant)
+            except redis.WatchError:
+                logger.debug("Conversation changed while forking", extra={"conversation_id": conversation_id})
+        raise ValueError(f"Conversation {conversation_id} kept changing while forking, try again")
+
+    async def _fork(
+            self,
+            parent: dict,
+            message_count: Optional[int],
+            title: Optional[str],
+            tenant: Tenant
+    ) -> Optional[dict]:
+        messages = parent["messages"]
+        count = len(messages) if message_count is None else message_count
+        if not 0 < count <= len(messages):
+            raise ValueError(f"Can not fork at message {count}, the conversation has {len(messages)} messages")
+        if messages[count - 1].get("tool_calls") or (count < len(messages) and messages[count]["role"] == Role.TOOL):
+            raise ValueError(f"Message {count} is part of a tool call, fork before or after it")
+
+        # A fork within the history the parent shares with its own parent references that one directly
+        parent_id, depth = parent["id"], parent.get("fork_depth", 0) + 1
+        if count <= parent.get("parent_message_count", 0):
+            parent_id, depth = parent["parent_id"], depth - 1
+
+        conversation_id = str(uuid.uuid4())
+        now = datetime.now(UTC).isoformat()
+        conversation = {
+            "id": conversation_id,
+            "title": title or parent["title"],
+            "messages": messages[:count],
+            "created_at": now,
+            "updated_at": now
+        }
+        # Deep chains would slow down every read, past the limit the history is copied
+        if depth <= MAX_FORK_DEPTH:
+            conversation.update(parent_id=parent_id, parent_message_count=count, fork_depth=depth)
+
+        payload = self.codec.encode(self._stored(conversation))
+        parent_key = tenant.key(f"{CONVERSATION_PREFIX}{parent_id}")
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            # The parent may be deleted meanwhile, either key existing at commit keeps its history readable
+            await pipe.watch(parent_key, f"{parent_key}{RETAINED_KEY_SUFFIX}")
+            if "parent_id" in conversation and not await pipe.exists(parent_key, f"{parent_key}{RETAINED_KEY_SUFFIX}"):
+                return None
+            pipe.multi()
+            pipe.set(tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}"), payload)
+            pipe.zadd(tenant.key(CONVERSATION_LIST_KEY), {conversation_id: datetime.now(UTC).timestamp()})
+            if "parent_id" in conversation:
+                pipe.hincrby(tenant.key(CONVERSATION_FORKS_KEY), parent_id, 1)
+                pipe.hset(tenant.key(CONVERSATION_PARENTS_KEY), conversation_id, parent_id)
+            if self.search_index:
+                # Shared messages are found through the parent, a fork indexes only the messages it adds
+                self.search_index.stage(
+                    pipe,
+                    conversation_id,
+                    self._stored(conversation)["messages"],
+                    start_index=conversation.get("parent_message_count", 0),
+                    title=conversation["title"],
+                    tenant=tenant
+                )
+            await pipe.execute()
+
+        if self.cache:
+            self.cache.put(tenant.key(conversation_id), conversation, len(payload))
+
+        self.forks += 1
+        logger.info(
+            "Conversation forked",
+            extra={
+                "conversation_id": conversation_id,
+                "parent_id": parent["id"],
+                "message_count": count,
+                "fork_depth": conversation.get("fork_depth", 0),
+                "tenant": tenant.id
+            }
+        )
+        return conversation
+
+    async def get_messages(
+            self,
+            conversation_id: str,
+            before: Optional[int] = None,
+            limit: int = 50,
+            since_version: Optional[int] = None,
+            include_tool_messages: bool = True,
+            tenant: Optional[Tenant] = None
+    ) -> Optional[dict]:
+        """
+        Page of conversation messages with their indexes, the version is the message count.
+        Without `since_version` the page ends before message `before` (or at the end of the history),
+        with it the page starts at that version. `include_tool_messages=False` keeps only
+        user and assistant messages with content.
+        """
+        tenant = tenant or self.default_tenant
+        messages_key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}{MESSAGES_KEY_SUFFIX}")
+
+        if self.cache and (cached := self.cache.get(tenant.key(conversation_id))) is not None:
+            messages = cached["messages"]
+        elif version := await tenant.redis.llen(messages_key):
+            messages = None
+        else:
+            messages = await self._rebuild_messages(conversation_id, tenant)
+            if messages is None:
+                conversation = await self.get_conversation(conversation_id, tenant)
+                if not conversation:
+                    return None
+                messages = conversation["messages"]
+
+        if messages is not None:
+            version = len(messages)
+
+            async def fetch(start: int, stop: int) -> list[dict]:
+                return messages[start:stop]
+        else:
+            async def fetch(start: int, stop: int) -> list[dict]:
+                return [self.codec.decode(item) for item in await tenant.redis.lrange(messages_key, start, stop - 1)]
+
+            await tenant.redis.expire(messages_key, self.messages_ttl_seconds)
+
+        if since_version is not None and since_version > version:
+            raise ValueError(f"Version {since_version} is ahead of the conversation version {version}")
+
+        def visible(message: dict) -> bool:
+            return include_tool_messages or (
+                message["role"] in (Role.USER, Role.ASSISTANT) and bool(message.get("content"))
+            )
+
+        page: list[tuple[int, dict]] = []
+        if since_version is not None:
+            position = since_version
+            while position < version and len(page) < limit:
+                stop = min(position + limit, version)
+                page.extend((i, m) for i, m in enumerate(await fetch(position, stop), position) if visible(m))
+                position = stop
+            page = page[:limit]
+            has_more = len(page) == limit and page[-1][0] < version - 1
+        else:
+            position = version if before is None else min(before, version)
+            while position > 0 and len(page) < limit:
+                start = max(position - limit, 0)
+                page[:0] = [(i, m) for i, m in enumerate(await fetch(start, position), start) if visible(m)]
+                position = start
+            page = page[-limit:]
+            has_more = len(page) == limit and page[0][0] > 0
+
+        return {
+            "id": conversation_id,
+            "version": version,
+            "messages": [{"index": index, **message} for index, message in page],
+            "has_more": has_more
+        }
+
+    async def _rebuild_messages(self, conversation_id: str, tenant: Tenant) -> Optional[list[dict]]:
+        """Fill the message list from the stored conversation, None if it is not in Redis"""
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+        messages_key = f"{key}{MESSAGES_KEY_SUFFIX}"
+
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            conv_data = await pipe.get(key)
+            if not conv_data:
+                return None
+            messages = (await self._resolve_history(self.codec.decode(conv_data), tenant))["messages"]
+
+            pipe.multi()
+            pipe.delete(messages_key)
+            if messages:
+                pipe.rpush(messages_key, *(self.codec.encode(message) for message in messages))
+                pipe.expire(messages_key, self.messages_ttl_seconds)
+            try:
+                await pipe.execute()
+            except redis.WatchError:
+                # A turn was saved meanwhile, the list is rebuilt by a later read
+                logger.debug("Conversation changed while indexing messages", extra={"conversation_id": conversation_id})
+        return messages
+
+    async def delete_conversation(self, conversation_id: str, tenant: Optional[Tenant] = None) -> bool:
         """Delete a conversation"""
-        logger.info("Deleting conversation", extra={"conversation_id": conversation_id})
+        tenant = tenant or self.default_tenant
+        logger.info("Deleting conversation", extra={"conversation_id": conversation_id, "tenant": tenant.id})
 
-        deleted = await self.redis.delete(f"{CONVERSATION_PREFIX}{conversation_id}")
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+        for _ in range(FORK_ATTEMPTS):
+            parents = await self._parents(conversation_id, tenant)
+            result = await self._delete_script(
+                keys=[
+                    key,
+                    tenant.key(CONVERSATION_LIST_KEY),
+                    tenant.key(ARCHIVED_CONVERSATIONS_KEY),
+                    tenant.key(TITLES_KEY),
+                    tenant.key(CONVERSATION_FORKS_KEY),
+                    tenant.key(CONVERSATION_PARENTS_KEY),
+                    f"{key}{RETAINED_KEY_SUFFIX}",
+                    tenant.key(f"{DOC_PREFIX}{conversation_id}"),
+                    f"{key}{MESSAGES_KEY_SUFFIX}",
+                    *UsageStore.keys(conversation_id, tenant),
+                    *(tenant.key(f"{CONVERSATION_PREFIX}{parent}{RETAINED_KEY_SUFFIX}") for parent in parents)
+                ],
+                args=[conversation_id, len(parents), *parents],
+                client=tenant.redis
+            )
+            if result[0] != -1:
+                break
+            logger.debug("Parents changed while deleting", extra={"conversation_id": conversation_id})
+        else:
+            raise ValueError(f"Conversation {conversation_id} kept changing while deleting, try again")
+        deleted, title, doc = result
+        if self.search_index and (title is not None or doc is not None):
+            await self.search_index.drop_postings(conversation_id, doc, title, tenant)
+        if self.archive:
+            await self.archive.delete(tenant.key(conversation_id))
+        if self.cache:
+            await self.cache.invalidate(tenant.key(conversation_id))
         if deleted == 0:
             logger.warning("Conversation not found for deletion", extra={"conversation_id": conversation_id})
             return False
 
-        await self.redis.zrem(CONVERSATION_LIST_KEY, conversation_id)
-
         logger.info("Conversation deleted successfully", extra={"conversation_id": conversation_id})
         return True
 
+    async def _parents(self, conversation_id: str, tenant: Tenant) -> list[str]:
+        """Ids of the conversations a fork references, nearest first, empty for other conversations"""
+        parents, child = [], conversation_id
+        while parent := await tenant.redis.hget(tenant.key(CONVERSATION_PARENTS_KEY), child):
+            child = parent.decode()
+            parents.append(child)
+        return parents
+
+    async def archive_idle_conversations(self, idle_seconds: float, limit: int = 100) -> int:
+        """Move up to `limit` conversations per tenant not updated nor read for `idle_seconds` to the archive"""
+        if not self.archive:
+            return 0
+
+        archived = 0
+        for tenant in await self.tenants.all():
+            candidate_ids = await tenant.redis.zrangebyscore(
+                tenant.key(CONVERSATION_LIST_KEY),
+                "-inf",
+                time.time() - idle_seconds,
+                start=0,
+                num=limit
+            )
+            for conv_id in candidate_ids:
+                if await self.archive_conversation(conv_id.decode(), idle_seconds, tenant):
+                    archived += 1
+        return archived
+
+    async def archive_conversation(
+            self,
+            conversation_id: str,
+            min_idle_seconds: float = 0,
+            tenant: Optional[Tenant] = None
+    ) -> bool:
+        """
+        Move conversation payload to the archive, leaving a summary stub in Redis.
+        Skipped if the key was accessed within `min_idle_seconds` or changed while archiving.
+        """
+        tenant = tenant or self.default_tenant
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            # Forks read the history of their parent from Redis, a conversation with forks stays there
+            await pipe.watch(key, tenant.key(CONVERSATION_FORKS_KEY))
+            if await pipe.hexists(tenant.key(CONVERSATION_FORKS_KEY), conversation_id):
+                return False
+            conv_data = await pipe.get(key)
+            if not conv_data:
+                return False
+
+            if min_idle_seconds:
+                try:
+                    if await pipe.object("IDLETIME", key) < min_idle_seconds:
+                        return False
+                except redis.ResponseError:
+                    # IDLETIME is not tracked under LFU eviction policies, rely on the update time
+                    pass
+
+            stub = json.dumps(self._summarize(self.codec.decode(conv_data)))
+            await self.archive.put(tenant.key(conversation_id), conv_data)
+
+            pipe.multi()
+            pipe.hset(tenant.key(ARCHIVED_CONVERSATIONS_KEY), conversation_id, stub)
+            pipe.delete(key, f"{key}{MESSAGES_KEY_SUFFIX}")
+            try:
+                await pipe.execute()
+            except redis.WatchError:
+                logger.debug("Conversation changed while archiving", extra={"conversation_id": conversation_id})
+                return False
+
+        # Cached copies would let a later save bypass rehydration and leave the stub behind
+        if self.cache:
+            await self.cache.invalidate(tenant.key(conversation_id))
+
+        self.archived += 1
+        logger.debug("Conversation archived", extra={"conversation_id": conversation_id})
+        return True
+
+    async def _rehydrate_conversation(self, conversation_id: str, tenant: Tenant) -> Optional[bytes]:
+        """Restore archived conversation payload into Redis"""
+        if not await tenant.redis.hexists(tenant.key(ARCHIVED_CONVERSATIONS_KEY), conversation_id):
+            return None
+
+        conv_data = await self.archive.get(tenant.key(conversation_id))
+        if conv_data is None:
+            logger.error("Archived conversation missing from archive", extra={"conversation_id": conversation_id})
+            return None
+
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            pipe.set(tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}"), conv_data, nx=True)
+            pipe.hdel(tenant.key(ARCHIVED_CONVERSATIONS_KEY), conversation_id)
+            await pipe.execute()
+
+        # The archived copy is kept until the conversation is deleted or archived again,
+        # so a crash between the two steps above never loses data
+        self.rehydrated += 1
+        logger.info("Conversation rehydrated from archive", extra={"conversation_id": conversation_id})
+        return conv_data
+
     async def chat(
             self,
             user_message: Message,
             conversation_id: str,
-            stream: bool = False
+            stream: bool = False,
+            deadline_seconds: Optional[float] = None,
+            tenant: Optional[Tenant] = None
     ):
         """
         Process chat messages and return AI response.
         Automatically saves conversation state.
+        `deadline_seconds` overrides the configured turn deadline, 0 means no deadline.
         """
+        tenant = tenant or self.default_tenant
+        if self.draining:
+            raise ServiceDraining("The service is restarting, retry the turn")
         logger.info(
             "Processing chat request",
             extra={
@@ -136,57 +768,193 @@ class ConversationManager:
             }
         )
 
-        conversation = await self.get_conversation(conversation_id)
+        conversation = await self.get_conversation(conversation_id, tenant)
         if not conversation:
             raise ValueError(f"Conversation {conversation_id} not found")
 
-        messages = [Message(**msg_data) for msg_data in conversation["messages"]]
+        usage = await self.usage_store.totals(conversation_id, tenant) if self.usage_store else None
+        if usage and self.token_budget and usage["total_tokens"] >= self.token_budget:
+            self.budget_refusals += 1
+            logger.warning(
+                "Conversation token budget used up",
+                extra={"conversation_id": conversation_id, "total_tokens": usage["total_tokens"]}
+            )
+            raise TokenBudgetExceeded(
+                f"Conversation used {usage['total_tokens']} of its {self.token_budget} token budget"
+            )
+
+        # Stored messages are already in wire format, only the new ones get serialized
+        messages = list(conversation["messages"])
 
         if not messages:
             logger.debug("First message in conversation, adding system prompt")
-            messages.append(Message(role=Role.SYSTEM, content=SYSTEM_PROMPT))
+            messages.append(WireMessage(role=Role.SYSTEM, content=SYSTEM_PROMPT).to_dict())
 
-        messages.append(user_message)
+        messages.append(user_message.to_dict())
 
+        if deadline_seconds is None:
+            deadline_seconds = self.turn_deadline_seconds
+        turn = Turn(conversation_id, deadline_seconds)
+        if usage and self.compact_prompt_tokens and usage["last_prompt_tokens"] > self.compact_prompt_tokens:
+            await self._compact_history(messages, turn, conversation.get("parent_message_count", 0))
         if stream:
-            return self._stream_chat(conversation_id, messages)
+            return self._stream_chat(conversation, messages, turn, tenant)
         else:
-            return await self._non_stream_chat(conversation_id, messages)
+            return await self._non_stream_chat(conversation, messages, turn, tenant)
+
+    @contextmanager
+    def _track_turn(self, turn: Turn) -> Iterator[None]:
+        task = asyncio.current_task()
+        self._active_turns[task] = turn
+        self._turns_idle.clear()
+        try:
+            yield
+        finally:
+            self._active_turns.pop(task, None)
+            if not self._active_turns:
+                self._turns_idle.set()
+
+    async def drain(self, timeout_seconds: float) -> dict:
+        """
+        Refuse new turns and give running ones `timeout_seconds` to finish: their deadline is brought forward,
+        so they wrap up and answer in time. Turns still running shortly after are cancelled. Returns once
+        the partial turns of all of them are saved.
+        """
+        self.draining = True
+        deadline = time.monotonic() + timeout_seconds
+        running = len(self._active_turns)
+        for turn in self._active_turns.values():
+            turn.deadline = min(turn.deadline or deadline, deadline)
+        logger.info("Draining chat turns", extra={"running_turns": running, "timeout_seconds": timeout_seconds})
+
+        cancelled = 0
+        try:
+            await asyncio.wait_for(self._turns_idle.wait(), timeout_seconds + DRAIN_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            cancelled = len(self._active_turns)
+            for task in self._active_turns:
+                task.cancel()
+            try:
+                await asyncio.wait_for(self._turns_idle.wait(), DRAIN_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Turns ignored cancellation", extra={"running_turns": len(self._active_turns)})
+        if self._pending_saves:
+            await asyncio.gather(*self._pending_saves, return_exceptions=True)
+
+        stats = {"running_turns": running, "cancelled_turns": cancelled}
+        logger.info("Chat turns drained", extra=stats)
+        return stats
 
     async def _stream_chat(
             self,
-            conversation_id: str,
-            messages: list[Message],
+            conversation: dict,
+            messages: list[dict[str, Any]],
+            turn: Turn,
+            tenant: Tenant
     ) -> AsyncGenerator[str, None]:
         """Handle streaming chat with automatic saving"""
+        conversation_id = conversation["id"]
         logger.debug("Starting streaming chat", extra={"conversation_id": conversation_id})
 
         yield f"data: {json.dumps({'conversation_id': conversation_id})}\n\n"
 
-        async for chunk in self.dial_client.stream_response(messages):
-            yield chunk
+        turn_start = len(messages)
+        try:
+            # Closing this generator has to close the model stream as well
+            with self._track_turn(turn):
+                async with aclosing(self.dial_client.stream_response(messages, turn)) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client disconnected, the model call and tool calls are cancelled by now
+            self._save_partial_turn(conversation, messages, turn, turn_start, tenant)
+            raise
+        except DeadlineExceeded as e:
+            await self._save_overdue_turn(conversation, messages, turn, tenant)
+            logger.warning(f"Streaming chat stopped: {e}", extra={"conversation_id": conversation_id})
+            error = {"message": str(e), "code": e.status_code}
+            yield f"data: {json.dumps({'error': error})}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+        except (AdmissionRejected, CircuitOpenError) as e:
+            # Headers are already sent, report overload in-band
+            logger.warning(f"Streaming chat rejected: {e}", extra={"conversation_id": conversation_id})
+            error = {"message": str(e), "code": e.status_code, "retry_after": e.retry_after}
+            yield f"data: {json.dumps({'error': error})}\n\n"
+            yield "data: [DONE]\n\n"
+            return
+
+        await self._save_conversation_messages(conversation, messages, turn, tenant)
+
+        logger.info("Streaming chat completed", extra={"conversation_id": conversation_id, "turn": turn.summary()})
 
-        await self._save_conversation_messages(conversation_id, messages)
+    def _save_partial_turn(
+            self,
+            conversation: dict,
+            messages: list[dict[str, Any]],
+            turn: Turn,
+            turn_start: int,
+            tenant: Tenant
+    ):
+        """Persist what a cancelled turn produced so far, so it is not paid for again"""
+        conversation_id = conversation["id"]
+        turn.cancelled = True
+        self.cancelled_turns += 1
 
-        logger.info("Streaming chat completed", extra={"conversation_id": conversation_id})
+        partial_chars = sum(len(message.get("content") or "") for message in messages[turn_start:])
+        self.partial_chars_saved += partial_chars
+        _close_pending_tool_calls(messages)
+
+        # Awaiting here would be interrupted by the ongoing cancellation
+        task = asyncio.create_task(self._save_conversation_messages(conversation, messages, turn, tenant))
+        self._pending_saves.add(task)
+        task.add_done_callback(self._pending_saves.discard)
+
+        logger.info(
+            "Chat turn cancelled, saving partial turn",
+            extra={
+                "conversation_id": conversation_id,
+                "partial_chars": partial_chars,
+                "turn": turn.summary()
+            }
+        )
+
+    async def _save_overdue_turn(self, conversation: dict, messages: list[dict[str, Any]], turn: Turn, tenant: Tenant):
+        """Persist a turn that ran out of time, with the tool results it got"""
+        self.deadline_exceeded_turns += 1
+        _close_pending_tool_calls(messages)
+        await self._save_conversation_messages(conversation, messages, turn, tenant)
 
     async def _non_stream_chat(
             self,
-            conversation_id: str,
-            messages: list[Message],
+            conversation: dict,
+            messages: list[dict[str, Any]],
+            turn: Turn,
+            tenant: Tenant
     ) -> dict:
         """Handle non-streaming chat"""
+        conversation_id = conversation["id"]
         logger.debug("Starting non-streaming chat", extra={"conversation_id": conversation_id})
 
-        ai_message = await self.dial_client.response(messages)
+        turn_start = len(messages)
+        try:
+            with self._track_turn(turn):
+                ai_message = await self.dial_client.response(messages, turn)
+        except DeadlineExceeded:
+            await self._save_overdue_turn(conversation, messages, turn, tenant)
+            raise
+        except asyncio.CancelledError:
+            self._save_partial_turn(conversation, messages, turn, turn_start, tenant)
+            raise
 
-        await self._save_conversation_messages(conversation_id, messages)
+        await self._save_conversation_messages(conversation, messages, turn, tenant)
 
         logger.info(
             "Non-streaming chat completed",
             extra={
                 "conversation_id": conversation_id,
-                "response_length": len(ai_message.content or "")
+                "response_length": len(ai_message.content or ""),
+                "turn": turn.summary()
             }
         )
 
@@ -195,39 +963,154 @@ class ConversationManager:
             "conversation_id": conversation_id
         }
 
+    async def _compact_history(self, messages: list[dict[str, Any]], turn: Turn, start: int = 0):
+        """
+        Replace long tool results of earlier turns from message `start` on with a short note, the prompt of
+        the last turn outgrew the limit. With a tool result store the full output stays readable through its
+        handle. A fork leaves the history it shares with its parent as it is.
+        """
+        store = self.dial_client.tool_result_store
+        compacted_chars = 0
+        for index, message in enumerate(messages[start:], start):
+            content = message.get("content")
+            if (
+                    message["role"] != Role.TOOL
+                    or not isinstance(content, str)
+                    or len(content) < COMPACT_MIN_CHARS
+                    or content.startswith(COMPACTED_PREFIX)
+            ):
+                continue
+
+            if store:
+                handle = await store.save(content)
+                note = (
+                    f"{COMPACTED_PREFIX}: {len(content)} characters. "
+                    f"Call {READ_TOOL_RESULT} with handle=\"{handle}\" and offset=0 to read it.]"
+                )
+            else:
+                note = f"{COMPACTED_PREFIX}: {len(content)} characters removed to save tokens.]"
+            messages[index] = {**message, "content": note}
+            turn.compacted_tool_results += 1
+            compacted_chars += len(content) - len(note)
+
+        if turn.compacted_tool_results:
+            self.compactions += 1
+            self.compacted_chars += compacted_chars
+            logger.info(
+                "Conversation history compacted",
+                extra={
+                    "conversation_id": turn.conversation_id,
+                    "compacted_tool_results": turn.compacted_tool_results,
+                    "compacted_chars": compacted_chars
+                }
+            )
+
     async def _save_conversation_messages(
             self,
-            conversation_id: str,
-            messages: list[Message]
+            conversation: dict,
+            messages: list[dict[str, Any]],
+            turn: Optional[Turn] = None,
+            tenant: Optional[Tenant] = None
     ):
-        """Save or update conversation messages"""
+        """Save or update conversation messages without re-reading the stored conversation"""
+        conversation_id = conversation["id"]
+        conversation_messages = conversation["messages"]
         logger.debug(
             "Saving conversation messages",
             extra={"conversation_id": conversation_id, "message_count": len(messages)}
         )
 
-        conv_data = await self.redis.get(f"{CONVERSATION_PREFIX}{conversation_id}")
-        conversation = json.loads(conv_data)
-
-        conversation["messages"] = [msg.to_dict() for msg in messages]
-        conversation["updated_at"] = datetime.now(UTC).isoformat()
+        # Build a new dict, the loaded one may be shared with the cache and concurrent readers
+        conversation = {
+            **conversation,
+            "messages": messages,
+            "updated_at": datetime.now(UTC).isoformat()
+        }
 
-        await self._save_conversation(conversation)
+        # Compaction rewrote earlier messages, they can not be appended
+        appended_from = None if turn and turn.compacted_tool_results else len(conversation_messages)
+        await self._save_conversation(conversation, appended_from=appended_from, turn=turn, tenant=tenant)
 
         logger.debug("Conversation messages saved", extra={"conversation_id": conversation_id})
 
-    async def _save_conversation(self, conversation: dict):
-        """Internal method to persist conversation to Redis"""
+    async def _save_conversation(
+            self,
+            conversation: dict,
+            appended_from: Optional[int] = None,
+            turn: Optional[Turn] = None,
+            tenant: Optional[Tenant] = None
+    ):
+        """
+        Internal method to persist conversation to Redis.
+        Messages from index `appended_from` on are new and get appended to the message list.
+        The payload, list entry, message list, search index and usage of `turn` change in one transaction.
+        """
+        tenant = tenant or self.default_tenant
         conversation_id = conversation["id"]
+        key = tenant.key(f"{CONVERSATION_PREFIX}{conversation_id}")
+        messages_key = f"{key}{MESSAGES_KEY_SUFFIX}"
 
-        await self.redis.set(
-            f"{CONVERSATION_PREFIX}{conversation_id}",
-            json.dumps(conversation)
-        )
+        payload = self.codec.encode(self._stored(conversation))
+        new_messages = []
+        if appended_from is not None:
+            new_messages = [self.codec.encode(message) for message in conversation["messages"][appended_from:]]
 
-        await self.redis.zadd(
-            CONVERSATION_LIST_KEY,
-            {conversation_id: datetime.now(UTC).timestamp()}
-        )
+        # Appended messages extend the index, a conversation indexed before or rewritten is indexed whole
+        index_from, index_title = None, False
+        if self.search_index:
+            indexed = await self.search_index.is_indexed(conversation_id, tenant)
+            if indexed and appended_from is None:
+                await self.search_index.remove(conversation_id, tenant)
+                indexed = False
+            index_from = appended_from if indexed else conversation.get("parent_message_count", 0)
+            index_title = not indexed
+
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            pipe.set(key, payload)
+            pipe.zadd(tenant.key(CONVERSATION_LIST_KEY), {conversation_id: datetime.now(UTC).timestamp()})
+            if appended_from is None:
+                pipe.delete(messages_key)
+            elif new_messages and appended_from == 0:
+                pipe.delete(messages_key)
+                pipe.rpush(messages_key, *new_messages)
+                pipe.expire(messages_key, self.messages_ttl_seconds)
+            elif new_messages:
+                # Appended only to a complete list, a missing one is rebuilt on the next read
+                pipe.execute_command("RPUSHX", messages_key, *new_messages)
+                pipe.expire(messages_key, self.messages_ttl_seconds)
+            if index_from is not None:
+                self.search_index.stage(
+                    pipe,
+                    conversation_id,
+                    conversation["messages"][index_from:],
+                    start_index=index_from,
+                    title=conversation["title"] if index_title else None,
+                    tenant=tenant
+                )
+            if turn and self.usage_store:
+                self.usage_store.stage_turn(pipe, conversation_id, turn, tenant)
+            await pipe.execute()
+
+        if self.cache:
+            self.cache.put(tenant.key(conversation_id), conversation, len(payload))
+            await self.cache.invalidate_remote(tenant.key(conversation_id))
 
         logger.debug("Conversation persisted to Redis", extra={"conversation_id": conversation_id})
+
+
+def _close_pending_tool_calls(messages: list[dict[str, Any]]):
+    """Answer tool calls of the last assistant message that got no result, the history must stay valid"""
+    for index in range(len(messages) - 1, -1, -1):
+        message = messages[index]
+        if message["role"] == Role.ASSISTANT and message.get("tool_calls"):
+            answered = {m.get("tool_call_id") for m in messages[index + 1:]}
+            for tool_call in message["tool_calls"]:
+                if tool_call["id"] not in answered:
+                    messages.append(WireMessage(
+                        role=Role.TOOL,
+                        content=CANCELLED_TOOL_CALL_MESSAGE,
+                        tool_call_id=tool_call["id"]
+                    ).to_dict())
+            return
+        if message["role"] != Role.TOOL:
+            return
@@ -0,0 +1,181 @@
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from collections import defaultdict
+from typing import Any, Callable, Optional, TextIO
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Debug events fired for every model round, tool call or conversation read, sampled by the message template
+HIGH_FREQUENCY_EVENTS = (
+    "Creating streaming completion",
+    "Creating non-streaming completion",
+    "Processing tool call",
+    "MCP tool result received",
+    "Retrieving conversation",
+    "Conversation served from cache",
+    "Conversation retrieved",
+    "Saving conversation messages",
+    "Conversation messages saved",
+    "Conversation persisted to Redis",
+)
+
+_EXCEPTION_FORMATTER = logging.Formatter()
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class Lazy:
+    """`extra` value computed only when the record is formatted, in the logging thread"""
+
+    __slots__ = ("factory",)
+
+    def __init__(self, factory: Callable[[], Any]):
+        self.factory = factory
+
+    def resolve(self) -> Any:
+        try:
+            return self.factory()
+        except Exception as e:
+            return f"<unavailable: {e}>"
+
+    def __repr__(self) -> str:
+        return repr(self.resolve())
+
+
+class StructuredFormatter(logging.Formatter):
+    """Text lines with the `extra` fields appended as JSON, or one JSON object per record"""
+
+    def __init__(self, json_output: bool = False):
+        super().__init__(TEXT_FORMAT)
+        self.json_output = json_output
+
+    def format(self, record: logging.LogRecord) -> str:
+        extra = {
+            key: value.resolve() if isinstance(value, Lazy) else value
+            for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRIBUTES
+        }
+        if not self.json_output:
+            line = super().format(record)
+            return f"{line} {json.dumps(extra, default=str)}" if extra else line
+
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **extra
+        }
+        if record.exc_info or record.exc_text:
+            payload["exc_info"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Lets through one in `1 / rate` records of the given events"""
+
+    def __init__(self, events: tuple[str, ...], rate: float):
+        super().__init__()
+        self.every = max(round(1 / rate), 1) if rate > 0 else 0
+        self.events = frozenset(events)
+        self.seen: dict[str, int] = defaultdict(int)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.msg not in self.events or self.every == 1:
+            return True
+        seen = self.seen[record.msg]
+        self.seen[record.msg] = seen + 1
+        if not self.every or seen % self.every:
+            self.sampled_out += 1
+            return False
+        record.sampled = f"1/{self.every}"
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a bounded queue for the listener thread, formatting and I/O never run on the event loop.
+    As in the stdlib handler the message is merged with its arguments and an exception is rendered before
+    the record is queued, they may change or go away by the time the listener gets to it. Lazy `extra`
+    values are resolved in the listener thread. When the queue is full records are dropped instead of
+    blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Copy with the final message and exception text, the layout is left to the listener's formatter"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Stop the listener after it wrote out queued records, called by logging.shutdown on exit"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        super().close()
+
+    def stats(self) -> dict:
+        stats = {"queued": self.queue.qsize(), "dropped": self.dropped}
+        for log_filter in self.filters:
+            if isinstance(log_filter, SamplingFilter):
+                stats["sampled_out"] = log_filter.sampled_out
+        return stats
+
+
+def configure_logging(
+        level: str = "INFO",
+        levels: Optional[dict[str, str]] = None,
+        json_output: bool = False,
+        sample_rate: float = 1.0,
+        queue_size: int = 10000,
+        stream: TextIO = sys.stdout
+) -> NonBlockingQueueHandler:
+    """Route all logging through a queue to a writer thread, replaces handlers of the root logger"""
+    output = logging.StreamHandler(stream)
+    output.setFormatter(StructuredFormatter(json_output))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    if sample_rate < 1:
+        handler.addFilter(SamplingFilter(HIGH_FREQUENCY_EVENTS, sample_rate))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level.upper())
+
+    handler.listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    handler.listener.start()
+    return handler
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """Per-logger levels from `name=LEVEL,name=LEVEL`"""
+    levels = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, level = item.partition("=")
+            levels[name.strip()] = level.strip()
+    return levels
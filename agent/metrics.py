@@ -0,0 +1,86 @@
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyRecorder:
+    """Keeps totals and a window of recent samples for percentile estimates"""
+
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, p: float) -> float:
+        if not self._recent:
+            return 0.0
+        samples = sorted(self._recent)
+        return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean * 1000, 3),
+            "p50_ms": round(self.percentile(0.5) * 1000, 3),
+            "p95_ms": round(self.percentile(0.95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+def process_uptime() -> Optional[float]:
+    """Seconds since the process was started, None where /proc is not available"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the command name, starttime is the 22nd field of the line
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(system_uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+
+
+class StartupTimeline:
+    """Startup phases with their finish time counted from process start (or from creation without /proc)"""
+
+    def __init__(self):
+        self.origin = time.monotonic() - (process_uptime() or 0.0)
+        self.phases: list[tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        elapsed = time.monotonic() - self.origin
+        self.phases.append((phase, elapsed))
+        logger.info("Startup phase finished", extra={"phase": phase, "elapsed_ms": round(elapsed * 1000, 1)})
+
+    def stats(self) -> dict:
+        """Finish time of every phase and time spent in it"""
+        stats = {}
+        previous = 0.0
+        for phase, elapsed in self.phases:
+            stats[phase] = {"at_ms": round(elapsed * 1000, 1), "took_ms": round((elapsed - previous) * 1000, 1)}
+            previous = elapsed
+        return stats
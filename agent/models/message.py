@@ -10,6 +10,18 @@ class Role(StrEnum):
     TOOL = "tool"
 
 
+# Fields sent only when set, in the order both message types serialize them
+_OPTIONAL_FIELDS = ("content", "name", "tool_call_id", "tool_calls")
+
+
+def _to_dict(message: "Message | WireMessage") -> dict[str, Any]:
+    result = {"role": str(message.role.value)}
+    for field in _OPTIONAL_FIELDS:
+        if value := getattr(message, field):
+            result[field] = value
+    return result
+
+
 class Message(BaseModel):
     role: Role
     content: str | None = None
@@ -18,13 +30,30 @@ class Message(BaseModel):
     tool_calls: list[dict[str, Any]] | None = None
 
     def to_dict(self) -> dict[str, Any]:
-        result = {"role": str(self.role.value)}
-        if self.content:
-            result["content"] = self.content
-        if self.name:
-            result["name"] = self.name
-        if self.tool_call_id:
-            result["tool_call_id"] = self.tool_call_id
-        if self.tool_calls:
-            result["tool_calls"] = self.tool_calls
-        return result
+        return _to_dict(self)
+
+
+class WireMessage:
+    """
+    Lightweight message for the chat hot path.
+    Pydantic `Message` validates input at the API boundary, history is kept as `to_dict()` output.
+    """
+
+    __slots__ = ("role", *_OPTIONAL_FIELDS)
+
+    def __init__(
+            self,
+            role: Role,
+            content: str | None = None,
+            tool_call_id: str | None = None,
+            name: str | None = None,
+            tool_calls: list[dict[str, Any]] | None = None
+    ):
+        self.role = role
+        self.content = content
+        self.tool_call_id = tool_call_id
+        self.name = name
+        self.tool_calls = tool_calls
+
+    def to_dict(self) -> dict[str, Any]:
+        return _to_dict(self)
@@ -0,0 +1,68 @@
+import time
+from typing import Any, Optional
+
+
+class Turn:
+    """Runtime state of a single chat turn, shared by all model rounds and tool calls of that turn"""
+
+    __slots__ = (
+        "conversation_id",
+        "deadline",
+        "rounds",
+        "offloaded_tool_results",
+        "offloaded_chars",
+        "prompt_chars_saved",
+        "cancelled",
+        "wrapped_up",
+        "prompt_tokens",
+        "completion_tokens",
+        "usage_rounds",
+        "tool_calls",
+        "tool_result_chars",
+        "compacted_tool_results",
+    )
+
+    def __init__(self, conversation_id: str, deadline_seconds: Optional[float] = None):
+        self.conversation_id = conversation_id
+        # time.monotonic() timestamp the whole turn has to finish by, None means unbounded
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.rounds = 0
+        self.offloaded_tool_results = 0
+        self.offloaded_chars = 0
+        self.prompt_chars_saved = 0
+        self.cancelled = False
+        self.wrapped_up = False
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Token usage of every model round, estimated when upstream reported none
+        self.usage_rounds: list[dict[str, Any]] = []
+        # Calls and characters of output added to the history per tool
+        self.tool_calls: dict[str, int] = {}
+        self.tool_result_chars: dict[str, int] = {}
+        self.compacted_tool_results = 0
+
+    def record_usage(self, model: str, prompt_tokens: int, completion_tokens: int, estimated: bool):
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.usage_rounds.append({
+            "round": self.rounds,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "estimated": estimated
+        })
+
+    def record_tool_result(self, tool_name: str, content: str):
+        self.tool_calls[tool_name] = self.tool_calls.get(tool_name, 0) + 1
+        self.tool_result_chars[tool_name] = self.tool_result_chars.get(tool_name, 0) + len(content)
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline"""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def summary(self) -> dict:
+        summary = {name: getattr(self, name) for name in self.__slots__ if name != "deadline"}
+        summary["remaining_seconds"] = None if self.deadline is None else round(self.remaining(), 3)
+        return summary
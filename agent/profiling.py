@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import lru_cache
+from types import FrameType
+from typing import Optional
+
+from agent.metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one of the same kind runs"""
+
+    status_code = 409
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """Path relative to the repository or to the longest matching import path"""
+    for prefix in sorted((_ROOT, *filter(None, sys.path)), key=len, reverse=True):
+        if filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the event loop thread from a helper thread and counts identical stacks.
+    Output is in collapsed-stack format (`outer;inner;leaf count` per line), which flamegraph.pl,
+    speedscope and inferno read. Time the loop spends waiting for I/O shows up under `select`.
+    """
+
+    def __init__(self, max_seconds: float = 60, min_interval: float = 0.001):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._lock = asyncio.Lock()
+        self.profiles = 0
+
+    async def profile(self, seconds: float, interval: float = 0.005) -> str:
+        if self._lock.locked():
+            raise ProfilerBusy("A CPU profile is already running")
+        async with self._lock:
+            seconds = min(max(seconds, 0.1), self.max_seconds)
+            interval = max(interval, self.min_interval)
+            thread_id = threading.get_ident()
+            logger.info("CPU profile started", extra={"seconds": seconds, "interval": interval})
+
+            stacks = await asyncio.to_thread(self._sample, thread_id, seconds, interval)
+            self.profiles += 1
+            logger.info("CPU profile finished", extra={"samples": sum(stacks.values()), "stacks": len(stacks)})
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def _sample(thread_id: int, seconds: float, interval: float) -> Counter[str]:
+        stacks: Counter[str] = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            del frame
+            if labels:
+                stacks[";".join(reversed(labels))] += 1
+            time.sleep(interval)
+        return stacks
+
+
+class MemoryProfiler:
+    """
+    tracemalloc on demand: `start` begins tracing, `snapshot` records a baseline and `diff` shows where
+    memory grew since. Tracing slows allocations down, it stops by itself after `max_seconds`.
+    """
+
+    def __init__(self, max_seconds: float = 600, max_frames: int = 25):
+        self.max_seconds = max_seconds
+        self.max_frames = max_frames
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_taken_at: Optional[float] = None
+        self._auto_stop: Optional[asyncio.TimerHandle] = None
+        self.started_at: Optional[float] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10, seconds: Optional[float] = None):
+        if self.tracing:
+            raise ProfilerBusy("Memory tracing is already running")
+        seconds = min(seconds or self.max_seconds, self.max_seconds)
+        tracemalloc.start(min(max(frames, 1), self.max_frames))
+        self.started_at = time.monotonic()
+        self._auto_stop = asyncio.get_running_loop().call_later(seconds, self.stop)
+        logger.info("Memory tracing started", extra={"frames": frames, "seconds": seconds})
+
+    def stop(self):
+        if self._auto_stop:
+            self._auto_stop.cancel()
+            self._auto_stop = None
+        if self.tracing:
+            tracemalloc.stop()
+            logger.info("Memory tracing stopped")
+        self._baseline = None
+        self._baseline_taken_at = None
+        self.started_at = None
+
+    def snapshot(self, limit: int = 20, group_by: str = "lineno") -> dict:
+        """Record a baseline for `diff` and return the largest allocation sites"""
+        self._baseline = self._take()
+        self._baseline_taken_at = time.monotonic()
+        stats = self._baseline.statistics(group_by)
+        return {
+            "traced_bytes": sum(stat.size for stat in stats),
+            "top": [
+                {"site": self._site(stat.traceback), "size": stat.size, "count": stat.count}
+                for stat in stats[:limit]
+            ]
+        }
+
+    def diff(self, limit: int = 20, group_by: str = "lineno") -> dict:
+        """Allocation sites that grew the most since the baseline"""
+        if self._baseline is None:
+            raise ValueError("Take a snapshot first")
+        current = self._take()
+        stats = current.compare_to(self._baseline, group_by)
+        return {
+            "seconds_since_baseline": round(time.monotonic() - self._baseline_taken_at, 3),
+            "size_diff": sum(stat.size_diff for stat in stats),
+            "top": [
+                {
+                    "site": self._site(stat.traceback),
+                    "size": stat.size,
+                    "size_diff": stat.size_diff,
+                    "count_diff": stat.count_diff
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    def _take(self) -> tracemalloc.Snapshot:
+        if not self.tracing:
+            raise ValueError("Memory tracing is not running")
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    @staticmethod
+    def _site(traceback: tracemalloc.Traceback) -> list[str]:
+        """Innermost frame first"""
+        return [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in reversed(traceback)]
+
+    def stats(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        return {
+            "tracing": self.tracing,
+            "tracing_seconds": round(time.monotonic() - self.started_at, 3) if self.started_at else 0.0,
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "baseline": self._baseline is not None
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a task sleeping for `interval`"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = LatencyRecorder(window=600)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag.record(max(time.perf_counter() - start - self.interval, 0.0))
+
+    def stats(self) -> dict:
+        return {"interval_ms": self.interval * 1000, "lag": self.lag.stats()}
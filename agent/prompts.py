@@ -12,6 +12,7 @@ SYSTEM_PROMPT = """You are a User Management Agent that helps users perform CRUD
 4. **Deletions require confirmation**: Always verify deletion requests - warn that this action is permanent
 5. **Format responses clearly**: Present user data in structured, readable format
 6. **Handle errors gracefully**: Explain what went wrong and suggest alternatives
+7. **Batch operations**: When several users are involved, use the batch tools (`get_users_by_ids`, `add_users`, `update_users`, `delete_users`) instead of calling a single-user tool per user
 
 ## Workflow Examples
 - **Finding users**: Search UMS → No results? → Suggest web search
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from agent.conversation_manager import ConversationManager
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationArchive:
+    """On-disk store for cold conversations, payloads are kept in the same encoding as in Redis"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, payload BLOB NOT NULL, archived_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+        logger.info("ConversationArchive opened", extra={"path": path})
+
+    async def put(self, conversation_id: str, payload: bytes):
+        await asyncio.to_thread(self._put, conversation_id, payload)
+
+    async def get(self, conversation_id: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, conversation_id)
+
+    async def delete(self, conversation_id: str):
+        await asyncio.to_thread(self._delete, conversation_id)
+
+    async def count(self) -> int:
+        return await asyncio.to_thread(self._count)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _put(self, conversation_id: str, payload: bytes):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO conversations (id, payload, archived_at) VALUES (?, ?, ?)",
+                (conversation_id, payload, time.time())
+            )
+            self._connection.commit()
+
+    def _get(self, conversation_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _delete(self, conversation_id: str):
+        with self._lock:
+            self._connection.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            self._connection.commit()
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+class ConversationArchiver:
+    """Background task that periodically moves idle conversations from Redis to the archive"""
+
+    def __init__(
+            self,
+            conversation_manager: 'ConversationManager',
+            idle_seconds: float,
+            interval_seconds: float = 300,
+            batch_size: int = 100
+    ):
+        self.conversation_manager = conversation_manager
+        self.idle_seconds = idle_seconds
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                "ConversationArchiver started",
+                extra={"idle_seconds": self.idle_seconds, "interval_seconds": self.interval_seconds}
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                archived = await self.conversation_manager.archive_idle_conversations(
+                    self.idle_seconds,
+                    self.batch_size
+                )
+                if archived:
+                    logger.info("Archived idle conversations", extra={"archived": archived})
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Conversation archiving pass failed: {e}")
+
+            await asyncio.sleep(self.interval_seconds)
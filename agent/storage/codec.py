@@ -0,0 +1,137 @@
+import json
+import logging
+import zlib
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Every binary payload starts with a zero byte followed by a format tag, plain JSON never does
+JSON_ZLIB_MAGIC = b"\x00JZ1"
+MSGPACK_ZSTD_MAGIC = b"\x00MZ1"
+
+
+class JsonCodec:
+    """Plain UTF-8 JSON, the format conversations were originally stored in"""
+
+    name = "json"
+    magic = b""
+
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class JsonZlibCodec:
+    """JSON compressed with zlib, needs only the standard library"""
+
+    name = "json-zlib"
+    magic = JSON_ZLIB_MAGIC
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def encode(self, value: Any) -> bytes:
+        return self.magic + zlib.compress(json.dumps(value, separators=(",", ":")).encode(), self.level)
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(zlib.decompress(data[len(self.magic):]))
+
+
+class MsgpackZstdCodec:
+    """MessagePack compressed with zstd, optionally with a shared pre-trained dictionary"""
+
+    name = "msgpack-zstd"
+    magic = MSGPACK_ZSTD_MAGIC
+
+    def __init__(self, level: int = 3, dictionary: Optional[bytes] = None):
+        if msgpack is None or zstandard is None:
+            raise RuntimeError("msgpack-zstd codec requires the 'msgpack' and 'zstandard' packages")
+
+        self.level = level
+        self.dictionary = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        self.dictionary_id = self.dictionary.dict_id() if self.dictionary else 0
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=self.dictionary)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=self.dictionary)
+        self._plain_decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, value: Any) -> bytes:
+        return self.magic + self._compressor.compress(msgpack.packb(value, use_bin_type=True))
+
+    def decode(self, data: bytes) -> Any:
+        frame = data[len(self.magic):]
+        frame_dictionary_id = zstandard.get_frame_parameters(frame).dict_id
+        if frame_dictionary_id == 0:
+            raw = self._plain_decompressor.decompress(frame)
+        elif frame_dictionary_id == self.dictionary_id:
+            raw = self._decompressor.decompress(frame)
+        else:
+            raise ValueError(f"Payload was compressed with unknown zstd dictionary {frame_dictionary_id}")
+        return msgpack.unpackb(raw, raw=False)
+
+
+class ConversationCodec:
+    """
+    Encodes conversation payloads with the configured codec and decodes any known format.
+
+    The format is detected from the payload prefix, so data written before a codec change
+    (including legacy plain JSON) stays readable.
+    """
+
+    def __init__(self, codec: str = "auto", zstd_level: int = 3, zstd_dictionary: Optional[bytes] = None):
+        if codec == "auto":
+            codec = "msgpack-zstd" if msgpack is not None and zstandard is not None else "json-zlib"
+
+        self._json = JsonCodec()
+        self._readers: dict[bytes, JsonZlibCodec | MsgpackZstdCodec] = {
+            JSON_ZLIB_MAGIC: JsonZlibCodec()
+        }
+        if msgpack is not None and zstandard is not None:
+            self._readers[MSGPACK_ZSTD_MAGIC] = MsgpackZstdCodec(level=zstd_level, dictionary=zstd_dictionary)
+
+        if codec == JsonCodec.name:
+            self.writer = self._json
+        elif codec == JsonZlibCodec.name:
+            self.writer = self._readers[JSON_ZLIB_MAGIC]
+        elif codec == MsgpackZstdCodec.name:
+            if MSGPACK_ZSTD_MAGIC not in self._readers:
+                raise RuntimeError("msgpack-zstd codec requires the 'msgpack' and 'zstandard' packages")
+            self.writer = self._readers[MSGPACK_ZSTD_MAGIC]
+        else:
+            raise ValueError(f"Unknown conversation codec '{codec}'")
+
+        logger.info(
+            "ConversationCodec initialized",
+            extra={"codec": self.writer.name, "zstd_dictionary": zstd_dictionary is not None}
+        )
+
+    @property
+    def name(self) -> str:
+        return self.writer.name
+
+    def encode(self, value: Any) -> bytes:
+        """Encode value with the configured codec"""
+        return self.writer.encode(value)
+
+    def decode(self, data: bytes | str) -> Any:
+        """Decode value written by any known codec"""
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data.startswith(b"\x00"):
+            return self._json.decode(data)
+
+        reader = self._readers.get(data[:4])
+        if reader is None:
+            raise ValueError(f"Unsupported conversation payload format {data[:4]!r}")
+        return reader.decode(data)
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Any
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "conversations:invalidations"
+
+
+class ConversationCache:
+    """
+    Bounded in-process LRU of decoded conversations.
+
+    Every worker keeps its own cache and announces its writes on a Redis pub/sub channel,
+    other workers drop the announced conversation on receipt. While the subscription is not
+    established the cache is bypassed, so a worker never serves entries it could have missed
+    an invalidation for.
+
+    A reader takes `generation()` before it loads a conversation from Redis and passes it to `put`.
+    Writes and invalidations in between move the conversation past that generation, and the loaded
+    copy, possibly older than theirs, is not cached. Entries expire after `ttl_seconds` in any case.
+    """
+
+    def __init__(
+            self,
+            redis_client: redis.Redis,
+            max_entries: int = 1000,
+            max_bytes: int = 64 * 1024 * 1024,
+            channel: str = INVALIDATION_CHANNEL,
+            ttl_seconds: float = 300
+    ):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.channel = channel
+        self.ttl_seconds = ttl_seconds
+        self.worker_id = uuid.uuid4().hex
+
+        # Conversation, encoded size and time.monotonic() it expires at
+        self._entries: OrderedDict[str, tuple[dict[str, Any], int, float]] = OrderedDict()
+        self._bytes = 0
+        # Generation of the latest write or invalidation per conversation, the oldest are forgotten and
+        # `_floor` stands in for them
+        self._generation = 0
+        self._changed_at: OrderedDict[str, int] = OrderedDict()
+        self._floor = 0
+        self._coherent = False
+        self._listener_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        logger.info(
+            "ConversationCache initialized",
+            extra={"max_entries": max_entries, "max_bytes": max_bytes, "worker_id": self.worker_id}
+        )
+
+    def get(self, conversation_id: str) -> Optional[dict[str, Any]]:
+        """Return cached conversation and mark it as recently used"""
+        if not self._coherent:
+            self.misses += 1
+            return None
+
+        entry = self._entries.get(conversation_id)
+        if entry is not None and entry[2] <= time.monotonic():
+            self.discard(conversation_id)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(conversation_id)
+        self.hits += 1
+        return entry[0]
+
+    def generation(self) -> int:
+        """Taken before reading a conversation from Redis, see `put`"""
+        return self._generation
+
+    def put(self, conversation_id: str, conversation: dict[str, Any], size: int, generation: Optional[int] = None):
+        """
+        Store decoded conversation, `size` is the length of its encoded payload. A version read from Redis
+        passes the `generation()` taken before the read and is skipped if the conversation changed since.
+        Without it the conversation is a version just written by this worker.
+        """
+        if generation is None:
+            self._changed(conversation_id)
+        elif self._changed_at.get(conversation_id, self._floor) > generation:
+            return
+
+        if not self._coherent or size > self.max_bytes:
+            self.discard(conversation_id)
+            return
+
+        self.discard(conversation_id)
+        self._entries[conversation_id] = (conversation, size, time.monotonic() + self.ttl_seconds)
+        self._bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _changed(self, conversation_id: str):
+        """Move the conversation past every generation handed out so far"""
+        self._generation += 1
+        self._changed_at[conversation_id] = self._generation
+        self._changed_at.move_to_end(conversation_id)
+        while len(self._changed_at) > self.max_entries * 4:
+            _, generation = self._changed_at.popitem(last=False)
+            self._floor = max(self._floor, generation)
+
+    def discard(self, conversation_id: str):
+        """Drop conversation from the local cache only"""
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def clear(self):
+        """Drop all local entries"""
+        self._entries.clear()
+        self._bytes = 0
+
+    async def invalidate(self, conversation_id: str):
+        """Drop conversation locally and tell other workers to drop it as well"""
+        self._changed(conversation_id)
+        self.discard(conversation_id)
+        await self.invalidate_remote(conversation_id)
+
+    async def invalidate_remote(self, conversation_id: str):
+        """Tell other workers to drop their copy, e.g. after this worker wrote a new version"""
+        await self.redis.publish(self.channel, f"{self.worker_id}:{conversation_id}")
+
+    async def start(self):
+        """Start listening for invalidations from other workers"""
+        if self._listener_task is None:
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """Stop listening and disable the cache"""
+        self._coherent = False
+        self.clear()
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    async def _listen(self):
+        """Apply invalidations published by other workers, reconnecting on failure"""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self._coherent = True
+                logger.info("Conversation cache subscribed to invalidations", extra={"channel": self.channel})
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    worker_id, _, conversation_id = data.partition(":")
+                    if worker_id != self.worker_id:
+                        self._changed(conversation_id)
+                        self.discard(conversation_id)
+                        self.invalidations += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Conversation cache invalidation listener failed: {e}")
+            finally:
+                # Anything may have changed while we were not listening, reads in flight are not cached
+                self._coherent = False
+                self.clear()
+                self._generation += 1
+                self._floor = self._generation
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+            await asyncio.sleep(1)
+
+    def largest(self, limit: int = 10) -> list[dict[str, Any]]:
+        """Cached conversations with the largest encoded size"""
+        entries = sorted(self._entries.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {"conversation_id": conversation_id, "bytes": size, "message_count": len(conversation["messages"])}
+            for conversation_id, (conversation, size, _) in entries
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        """Cache statistics for the metrics endpoint"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self._coherent,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,322 @@
+import logging
+import math
+import re
+import uuid
+from collections import Counter
+from typing import Any, Optional
+
+import redis.asyncio as redis
+
+from agent.storage.tenancy import DEFAULT_TENANT, Tenant, query_tenants
+
+logger = logging.getLogger(__name__)
+
+TERM_PREFIX = "search:term:"
+TERMS_KEY = "search:terms"
+TITLES_KEY = "search:titles"
+DOC_PREFIX = "search:doc:"
+TMP_PREFIX = "search:tmp:"
+
+TITLE_WEIGHT = 5
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+SNIPPET_RADIUS = 60
+
+_WORD = re.compile(r"\w+")
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text: str) -> list[str]:
+    return [term for term in _WORD.findall(text.lower()) if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+class ConversationSearchIndex:
+    """
+    Inverted index over conversation titles and user/assistant message content, kept in Redis so all
+    workers share it. Tool output is not indexed.
+
+    - `search:term:{term}` sorted set: conversation id -> weighted term frequency
+    - `search:terms` sorted set of all terms with equal scores, prefix queries expand over it with ZRANGEBYLEX
+    - `search:doc:{id}` indexed text, one `index<TAB>content` line per message, used for phrase checks,
+      snippets and to find the terms to remove on delete
+    - `search:titles` hash: conversation id -> title, also marks the conversation as indexed
+
+    Every tenant has its own index under its key prefix, searches never see other tenants' conversations.
+    Methods work on the default tenant unless given one.
+    Writes are queued on the caller's transaction so the index changes together with the conversation.
+    """
+
+    def __init__(
+            self,
+            redis_client: redis.Redis,
+            max_prefix_expansions: int = 50,
+            max_candidates: int = 200,
+            max_intersection: int = 10000
+    ):
+        self.redis = redis_client
+        self.default_tenant = Tenant(DEFAULT_TENANT, redis_client)
+        self.max_prefix_expansions = max_prefix_expansions
+        self.max_candidates = max_candidates
+        # Posting lists all longer than this are not intersected in full, see _top_candidates
+        self.max_intersection = max_intersection
+        self.queries = 0
+        self.approximate_queries = 0
+
+    async def is_indexed(self, conversation_id: str, tenant: Optional[Tenant] = None) -> bool:
+        tenant = tenant or self.default_tenant
+        return bool(await tenant.redis.hexists(tenant.key(TITLES_KEY), conversation_id))
+
+    def stage(
+            self,
+            pipe: Any,
+            conversation_id: str,
+            messages: list[dict[str, Any]],
+            start_index: int = 0,
+            title: Optional[str] = None,
+            tenant: Optional[Tenant] = None
+    ):
+        """Queue indexing of `messages` (numbered from `start_index`) and of the title on a pipeline"""
+        tenant = tenant or self.default_tenant
+        counts: Counter[str] = Counter()
+        lines = []
+        if title is not None:
+            counts.update({term: TITLE_WEIGHT for term in tokenize(title)})
+            pipe.hset(tenant.key(TITLES_KEY), conversation_id, title)
+        for index, message in enumerate(messages, start_index):
+            content = message.get("content")
+            if message["role"] not in ("user", "assistant") or not isinstance(content, str) or not content:
+                continue
+            counts.update(tokenize(content))
+            lines.append(f"{index}\t{' '.join(content.split())}\n")
+
+        for term, count in counts.items():
+            pipe.zincrby(tenant.key(f"{TERM_PREFIX}{term}"), count, conversation_id)
+        if counts:
+            pipe.zadd(tenant.key(TERMS_KEY), {term: 0 for term in counts}, nx=True)
+        if lines:
+            pipe.append(tenant.key(f"{DOC_PREFIX}{conversation_id}"), "".join(lines))
+
+    async def remove(self, conversation_id: str, tenant: Optional[Tenant] = None):
+        """Drop the conversation from every posting list it is in"""
+        tenant = tenant or self.default_tenant
+        doc = await tenant.redis.get(tenant.key(f"{DOC_PREFIX}{conversation_id}"))
+        title = await tenant.redis.hget(tenant.key(TITLES_KEY), conversation_id)
+        await self.drop_postings(conversation_id, doc, title, tenant)
+
+    async def drop_postings(
+            self,
+            conversation_id: str,
+            doc: Optional[bytes],
+            title: Optional[bytes],
+            tenant: Optional[Tenant] = None
+    ):
+        """
+        Remove the conversation from the posting lists of the terms in its indexed text and title, and
+        drop the text and title. Postings left behind (a crash in between) are skipped by searches.
+        """
+        tenant = tenant or self.default_tenant
+        terms = set(tokenize(doc.decode() if doc else "")) | set(tokenize(title.decode() if title else ""))
+
+        async with tenant.redis.pipeline(transaction=False) as pipe:
+            for term in terms:
+                pipe.zrem(tenant.key(f"{TERM_PREFIX}{term}"), conversation_id)
+            pipe.delete(tenant.key(f"{DOC_PREFIX}{conversation_id}"))
+            pipe.hdel(tenant.key(TITLES_KEY), conversation_id)
+            await pipe.execute()
+        # Terms left without postings stay in the dictionary and are skipped by prefix expansion
+
+    async def search(self, query: str, limit: int = 20, tenant: Optional[Tenant] = None) -> list[dict]:
+        """
+        Conversations matching all words of the query, best first.
+        `word*` matches any term starting with `word`, `"some words"` must appear in this order in one message.
+        """
+        tenant = tenant or self.default_tenant
+        self.queries += 1
+        terms, prefixes, phrases = self._parse(query)
+        if not terms and not prefixes:
+            return []
+
+        async with tenant.redis.pipeline(transaction=False) as pipe:
+            pipe.hlen(tenant.key(TITLES_KEY))
+            for term in terms:
+                pipe.zcard(tenant.key(f"{TERM_PREFIX}{term}"))
+            for prefix in prefixes:
+                bound = prefix.encode()
+                pipe.zrangebylex(
+                    tenant.key(TERMS_KEY), b"[" + bound, b"[" + bound + b"\xff", start=0, num=self.max_prefix_expansions
+                )
+            results = await pipe.execute()
+        total = max(results[0], 1)
+        frequencies = results[1:1 + len(terms)]
+        expansions = [[term.decode() for term in found] for found in results[1 + len(terms):]]
+        if not all(frequencies) or not all(expansions):
+            return []
+
+        # Rare terms weigh more, a single prefix group behaves like one term
+        weights = [math.log(1 + total / frequency) for frequency in frequencies]
+        if len(terms) > 1 and not prefixes and min(frequencies) > self.max_intersection:
+            candidates = await self._top_candidates(terms, frequencies, weights, tenant)
+            return await self._resolve(candidates, terms, prefixes, phrases, limit, tenant)
+
+        keys, temporary = [tenant.key(f"{TERM_PREFIX}{term}") for term in terms], []
+        async with tenant.redis.pipeline(transaction=True) as pipe:
+            for expanded in expansions:
+                union_key = tenant.key(f"{TMP_PREFIX}{uuid.uuid4().hex}")
+                pipe.zunionstore(union_key, [tenant.key(f"{TERM_PREFIX}{term}") for term in expanded], aggregate="MAX")
+                temporary.append(union_key)
+                keys.append(union_key)
+                weights.append(1.0)
+
+            if len(keys) == 1 and not temporary:
+                result_key = keys[0]
+                weights = [1.0]
+            else:
+                result_key = tenant.key(f"{TMP_PREFIX}{uuid.uuid4().hex}")
+                pipe.zinterstore(result_key, dict(zip(keys, weights)), aggregate="SUM")
+                temporary.append(result_key)
+            pipe.zrevrange(result_key, 0, self.max_candidates - 1, withscores=True)
+            if temporary:
+                pipe.delete(*temporary)
+            results = await pipe.execute()
+        candidates = results[-2] if temporary else results[-1]
+
+        return await self._resolve(
+            [(member.decode(), score) for member, score in candidates], terms, prefixes, phrases, limit, tenant
+        )
+
+    async def _top_candidates(
+            self,
+            terms: list[str],
+            frequencies: list[int],
+            weights: list[float],
+            tenant: Tenant
+    ) -> list[tuple[str, float]]:
+        """
+        Candidates for queries made only of common terms: ZINTERSTORE would walk the whole shortest list,
+        instead its best entries are looked up in the other lists. Conversations where the rarest term is
+        mentioned only in passing may be missed.
+        """
+        self.approximate_queries += 1
+        rarest = min(range(len(terms)), key=frequencies.__getitem__)
+        others = [i for i in range(len(terms)) if i != rarest]
+        top = await tenant.redis.zrevrange(
+            tenant.key(f"{TERM_PREFIX}{terms[rarest]}"), 0, self.max_candidates * 5 - 1, withscores=True
+        )
+        members = [member for member, _ in top]
+        async with tenant.redis.pipeline(transaction=False) as pipe:
+            for i in others:
+                pipe.zmscore(tenant.key(f"{TERM_PREFIX}{terms[i]}"), members)
+            scores = await pipe.execute()
+
+        candidates = []
+        for position, (member, score) in enumerate(top):
+            other_scores = [found[position] for found in scores]
+            if all(other_scores):
+                total = weights[rarest] * score + sum(weights[i] * other for i, other in zip(others, other_scores))
+                candidates.append((member.decode(), total))
+        candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+        return candidates[:self.max_candidates]
+
+    async def _resolve(
+            self,
+            candidates: list[tuple[str, float]],
+            terms: list[str],
+            prefixes: list[str],
+            phrases: list[str],
+            limit: int,
+            tenant: Tenant
+    ) -> list[dict]:
+        """Check phrases and build snippets, reading indexed text of candidates in batches"""
+        hits = []
+        batch_size = max(limit, 20)
+        for offset in range(0, len(candidates), batch_size):
+            batch = candidates[offset:offset + batch_size]
+            ids = [conversation_id for conversation_id, _ in batch]
+            async with tenant.redis.pipeline(transaction=False) as pipe:
+                pipe.mget([tenant.key(f"{DOC_PREFIX}{conversation_id}") for conversation_id in ids])
+                pipe.hmget(tenant.key(TITLES_KEY), ids)
+                docs, titles = await pipe.execute()
+
+            for (conversation_id, score), doc, title in zip(batch, docs, titles):
+                if title is None:
+                    # Deleted, its postings are being dropped
+                    continue
+                doc = doc.decode() if doc else ""
+                title = title.decode() if title else ""
+                match = _find_match(doc, terms, prefixes, phrases)
+                if phrases and match is None and not _has_phrases(title, phrases):
+                    continue
+                index, snippet = match if match else (None, title)
+                hits.append({
+                    "conversation_id": conversation_id,
+                    "title": title,
+                    "score": round(score, 4),
+                    "message_index": index,
+                    "snippet": snippet
+                })
+                if len(hits) == limit:
+                    return hits
+        return hits
+
+    @staticmethod
+    def _parse(query: str) -> tuple[list[str], list[str], list[str]]:
+        terms, prefixes, phrases = [], [], []
+        for phrase, word in _QUERY_PART.findall(query):
+            if phrase:
+                terms.extend(tokenize(phrase))
+                # Matched against normalized content, which keeps the short words tokenize drops
+                if len(normalized := _normalize(phrase).split()) > 1:
+                    phrases.append(" ".join(normalized))
+            elif word.endswith("*") and len(word.rstrip("*").lower()) >= MIN_TERM_LENGTH:
+                prefixes.extend(tokenize(word.rstrip("*"))[-1:])
+            else:
+                terms.extend(tokenize(word))
+        return list(dict.fromkeys(terms)), list(dict.fromkeys(prefixes)), phrases
+
+    async def stats(self, tenants: Optional[list[Tenant]] = None) -> dict:
+        """Indexed conversations summed over `tenants`, the default tenant by default"""
+        counts = await query_tenants(tenants or [self.default_tenant], lambda pipe, tenant: pipe.hlen(tenant.key(TITLES_KEY)))
+        return {
+            "indexed_conversations": sum(counts),
+            "queries": self.queries,
+            "approximate_queries": self.approximate_queries
+        }
+
+
+def _has_phrases(text: str, phrases: list[str]) -> bool:
+    """Every phrase occurs in the text as whole words"""
+    normalized = f" {_normalize(text)} "
+    return all(f" {phrase} " in normalized for phrase in phrases)
+
+
+def _find_match(doc: str, terms: list[str], prefixes: list[str], phrases: list[str]) -> Optional[tuple[int, str]]:
+    """Latest message containing all phrases (or else the most query words) with a snippet around the match"""
+    best = None
+    best_hits = 0
+    for line in reversed(doc.splitlines()):
+        index, _, content = line.partition("\t")
+        if not _has_phrases(content, phrases):
+            continue
+        words = set(_normalize(content).split())
+        hits = sum(term in words for term in terms) + sum(
+            any(word.startswith(prefix) for word in words) for prefix in prefixes
+        )
+        if hits > best_hits:
+            best, best_hits = (int(index), content), hits
+            if hits == len(terms) + len(prefixes):
+                break
+    if best is None:
+        return None
+
+    index, content = best
+    lowered = content.lower()
+    anchor = (phrases or terms or prefixes)[0].split()[0]
+    position = max(lowered.find(anchor), 0)
+    start = max(position - SNIPPET_RADIUS, 0)
+    end = min(position + len(anchor) + SNIPPET_RADIUS, len(content))
+    snippet = content[start:end]
+    return index, f"{'…' if start else ''}{snippet}{'…' if end < len(content) else ''}"
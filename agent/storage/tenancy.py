@@ -0,0 +1,107 @@
+import logging
+import re
+from typing import Any, Callable
+
+import redis.asyncio as redis
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = "default"
+# No braces, they would break the hash tag
+TENANT_ID_PATTERN = re.compile(r"^[\w.-]{1,64}$")
+# Per shard set of the tenants stored on it, background jobs walk it
+TENANTS_KEY = "tenants"
+
+
+class Tenant:
+    """
+    Where the data of one tenant lives: its Redis shard and the prefix of its keys.
+
+    Keys of a tenant carry its id as hash tag (`tenant:{acme}:conversation:...`), so they all map to one
+    Redis Cluster slot and every transaction of the tenant stays on one slot. The default tenant, used for
+    requests without a tenant, keeps the unprefixed keys written before tenants existed.
+    """
+
+    __slots__ = ("id", "redis", "prefix")
+
+    def __init__(self, tenant_id: str, redis_client: redis.Redis):
+        self.id = tenant_id
+        self.redis = redis_client
+        self.prefix = "" if tenant_id == DEFAULT_TENANT else f"tenant:{{{tenant_id}}}:"
+
+    def key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.id!r})"
+
+
+class TenantShards:
+    """
+    Places tenants on Redis instances the way Redis Cluster places keys: by the slot of the hash tag,
+    slots split evenly over the shards. A tenant with all its keys on one instance keeps MULTI, WATCH
+    and Lua working as on a single Redis.
+
+    The default tenant stays on the first shard, where its data was before sharding. Changing the shard
+    list moves other tenants, their data has to be moved along.
+    """
+
+    def __init__(self, shards: list[redis.Redis]):
+        if not shards:
+            raise ValueError("At least one Redis shard is required")
+        self.shards = shards
+        self._registered: set[str] = set()
+
+    @property
+    def primary(self) -> redis.Redis:
+        return self.shards[0]
+
+    def shard_index(self, tenant_id: str) -> int:
+        if tenant_id == DEFAULT_TENANT:
+            return 0
+        return key_slot(tenant_id.encode()) * len(self.shards) // REDIS_CLUSTER_HASH_SLOTS
+
+    def tenant(self, tenant_id: str = DEFAULT_TENANT) -> Tenant:
+        if not TENANT_ID_PATTERN.match(tenant_id):
+            raise ValueError(f"Invalid tenant id {tenant_id!r}")
+        return Tenant(tenant_id, self.shards[self.shard_index(tenant_id)])
+
+    async def register(self, tenant: Tenant):
+        """Record that the tenant has data, once per process"""
+        if tenant.id not in self._registered:
+            await tenant.redis.sadd(TENANTS_KEY, tenant.id)
+            self._registered.add(tenant.id)
+            logger.debug("Tenant registered", extra={"tenant": tenant.id, "shard": self.shard_index(tenant.id)})
+
+    async def all(self) -> list[Tenant]:
+        """Every tenant with data, the default tenant first"""
+        tenants = [self.tenant()]
+        for shard in self.shards:
+            for tenant_id in sorted(await shard.smembers(TENANTS_KEY)):
+                if tenant_id.decode() != DEFAULT_TENANT:
+                    tenants.append(self.tenant(tenant_id.decode()))
+        return tenants
+
+    async def close(self):
+        for shard in self.shards:
+            await shard.close()
+
+    def stats(self) -> dict:
+        return {"shards": len(self.shards), "tenants_seen": len(self._registered)}
+
+
+async def query_tenants(tenants: list[Tenant], stage: Callable[[Any, Tenant], None]) -> list:
+    """Queue `stage(pipe, tenant)` for every tenant on one pipeline per shard, results in tenant order"""
+    by_shard: dict[int, tuple[redis.Redis, list[int]]] = {}
+    for position, tenant in enumerate(tenants):
+        by_shard.setdefault(id(tenant.redis), (tenant.redis, []))[1].append(position)
+
+    results: list = [None] * len(tenants)
+    for shard, positions in by_shard.values():
+        async with shard.pipeline(transaction=False) as pipe:
+            for position in positions:
+                stage(pipe, tenants[position])
+            for position, result in zip(positions, await pipe.execute()):
+                results[position] = result
+    return results
@@ -0,0 +1,37 @@
+import logging
+import uuid
+from typing import Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+TOOL_RESULT_PREFIX = "tool_result:"
+
+
+class ToolResultStore:
+    """Keeps oversized tool outputs out of the conversation, addressable by handle"""
+
+    def __init__(self, redis_client: redis.Redis, ttl_seconds: int = 7 * 24 * 3600):
+        self.redis = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    async def save(self, content: str) -> str:
+        """Store tool output and return its handle"""
+        handle = uuid.uuid4().hex
+        await self.redis.set(
+            f"{TOOL_RESULT_PREFIX}{handle}",
+            content.encode(),
+            ex=self.ttl_seconds or None
+        )
+        logger.debug("Tool result stored", extra={"handle": handle, "content_length": len(content)})
+        return handle
+
+    async def read(self, handle: str, offset: int, limit: int) -> Optional[tuple[str, int]]:
+        """Return page of stored output and its total length in characters, None for unknown handle"""
+        data = await self.redis.get(f"{TOOL_RESULT_PREFIX}{handle}")
+        if data is None:
+            return None
+
+        content = data.decode()
+        return content[offset:offset + limit], len(content)
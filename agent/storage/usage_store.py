@@ -0,0 +1,124 @@
+import json
+import logging
+from datetime import datetime, UTC
+from typing import Any, Optional
+
+import redis.asyncio as redis
+
+from agent.models.turn import Turn
+from agent.storage.tenancy import DEFAULT_TENANT, Tenant, query_tenants
+
+logger = logging.getLogger(__name__)
+
+USAGE_PREFIX = "usage:conversation:"
+TURNS_SUFFIX = ":turns"
+TOOL_USAGE_KEY = "usage:tools"
+TOTAL_USAGE_KEY = "usage:totals"
+
+# Rough size of a token, used where upstream reports no usage
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(chars: int) -> int:
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class UsageStore:
+    """
+    Token usage aggregated in Redis, shared by all workers:
+    - `usage:conversation:{id}` hash: tokens, turns and rounds of the conversation, and the prompt size
+      of its latest round, which is roughly what the next turn starts from
+    - `usage:conversation:{id}:turns` list of the latest turns with their per-round usage, newest first
+    - `usage:tools` hash: calls and characters of output added to prompts per tool
+    - `usage:totals` hash: tokens over all conversations
+
+    Keys are per tenant, under its key prefix. Methods work on the default tenant unless given one.
+    """
+
+    def __init__(self, redis_client: redis.Redis, turns_kept: int = 50):
+        self.redis = redis_client
+        self.default_tenant = Tenant(DEFAULT_TENANT, redis_client)
+        self.turns_kept = turns_kept
+
+    def stage_turn(self, pipe: Any, conversation_id: str, turn: Turn, tenant: Optional[Tenant] = None):
+        """Queue the usage of a finished turn on a pipeline, so it is saved together with the turn"""
+        if not turn.usage_rounds:
+            return
+        tenant = tenant or self.default_tenant
+        key = self.keys(conversation_id, tenant)[0]
+        tool_key, total_key = tenant.key(TOOL_USAGE_KEY), tenant.key(TOTAL_USAGE_KEY)
+        estimated_rounds = sum(1 for usage in turn.usage_rounds if usage["estimated"])
+        record = {
+            "at": datetime.now(UTC).isoformat(),
+            "prompt_tokens": turn.prompt_tokens,
+            "completion_tokens": turn.completion_tokens,
+            "rounds": turn.usage_rounds,
+            "tool_calls": turn.tool_calls,
+            "tool_result_chars": turn.tool_result_chars,
+            "compacted_tool_results": turn.compacted_tool_results,
+            "cancelled": turn.cancelled,
+            "wrapped_up": turn.wrapped_up
+        }
+
+        pipe.hincrby(key, "prompt_tokens", turn.prompt_tokens)
+        pipe.hincrby(key, "completion_tokens", turn.completion_tokens)
+        pipe.hincrby(key, "turns", 1)
+        pipe.hincrby(key, "rounds", len(turn.usage_rounds))
+        pipe.hincrby(key, "estimated_rounds", estimated_rounds)
+        pipe.hset(key, mapping={
+            "last_prompt_tokens": turn.usage_rounds[-1]["prompt_tokens"],
+            "updated_at": record["at"]
+        })
+        pipe.lpush(f"{key}{TURNS_SUFFIX}", json.dumps(record))
+        pipe.ltrim(f"{key}{TURNS_SUFFIX}", 0, self.turns_kept - 1)
+        for tool_name, chars in turn.tool_result_chars.items():
+            pipe.hincrby(tool_key, f"{tool_name}:calls", turn.tool_calls.get(tool_name, 0))
+            pipe.hincrby(tool_key, f"{tool_name}:result_chars", chars)
+        pipe.hincrby(total_key, "prompt_tokens", turn.prompt_tokens)
+        pipe.hincrby(total_key, "completion_tokens", turn.completion_tokens)
+        pipe.hincrby(total_key, "turns", 1)
+
+    async def totals(self, conversation_id: str, tenant: Optional[Tenant] = None) -> dict[str, int]:
+        """Token counters of the conversation, zeros when it has none yet"""
+        tenant = tenant or self.default_tenant
+        data = await tenant.redis.hgetall(self.keys(conversation_id, tenant)[0])
+        totals = {
+            field: int(data.get(field.encode(), 0))
+            for field in ("prompt_tokens", "completion_tokens", "turns", "rounds", "estimated_rounds", "last_prompt_tokens")
+        }
+        totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        return totals
+
+    async def get(self, conversation_id: str, turns: int = 20, tenant: Optional[Tenant] = None) -> Optional[dict[str, Any]]:
+        tenant = tenant or self.default_tenant
+        key, turns_key = self.keys(conversation_id, tenant)
+        if not await tenant.redis.exists(key):
+            return None
+        recent = await tenant.redis.lrange(turns_key, 0, turns - 1)
+        return {**await self.totals(conversation_id, tenant), "recent_turns": [json.loads(turn) for turn in recent]}
+
+    @staticmethod
+    def keys(conversation_id: str, tenant: Tenant) -> list[str]:
+        key = tenant.key(f"{USAGE_PREFIX}{conversation_id}")
+        return [key, f"{key}{TURNS_SUFFIX}"]
+
+    async def delete(self, conversation_id: str, tenant: Optional[Tenant] = None):
+        tenant = tenant or self.default_tenant
+        await tenant.redis.delete(*self.keys(conversation_id, tenant))
+
+    async def stats(self, tenants: Optional[list[Tenant]] = None) -> dict[str, Any]:
+        """Usage over all conversations and per tool, summed over `tenants`, the default tenant by default"""
+        tenants = tenants or [self.default_tenant]
+        totals: dict[str, int] = {}
+        per_tool: dict[str, dict[str, int]] = {}
+        for found in await query_tenants(tenants, lambda pipe, tenant: pipe.hgetall(tenant.key(TOTAL_USAGE_KEY))):
+            for field, value in found.items():
+                totals[field.decode()] = totals.get(field.decode(), 0) + int(value)
+        for tools in await query_tenants(tenants, lambda pipe, tenant: pipe.hgetall(tenant.key(TOOL_USAGE_KEY))):
+            for field, value in tools.items():
+                tool_name, _, counter = field.decode().rpartition(":")
+                usage = per_tool.setdefault(tool_name, {"calls": 0, "result_chars": 0})
+                usage[counter] += int(value)
+        for usage in per_tool.values():
+            usage["estimated_result_tokens"] = estimate_tokens(usage["result_chars"])
+        return {**totals, "tools": per_tool}
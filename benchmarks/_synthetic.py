@@ -0,0 +1,79 @@
+"""Synthetic users and conversations shared by the benchmark scripts"""
+import json
+import random
+
+FIRST_NAMES = ["John", "Maria", "Liam", "Olivia", "Noah", "Emma", "Ivan", "Sofia", "Ahmed", "Yuki", "Chen", "Anna"]
+SURNAMES = ["Smith", "Johnson", "Garcia", "Brown", "Kowalski", "Petrov", "Tanaka", "Nguyen", "Muller", "Rossi"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "company.com", "example.org"]
+GENDERS = ["male", "female", "other", "prefer_not_to_say"]
+HOBBIES = ["hiking", "chess", "painting", "cooking", "cycling", "photography", "reading", "gardening"]
+
+
+def make_user(user_id: int, rng: random.Random) -> dict:
+    name = rng.choice(FIRST_NAMES)
+    surname = rng.choice(SURNAMES)
+    return {
+        "id": user_id,
+        "name": name,
+        "surname": surname,
+        "email": f"{name.lower()}.{surname.lower()}{user_id}@{rng.choice(DOMAINS)}",
+        "phone": f"+1{rng.randint(2000000000, 9999999999)}",
+        "date_of_birth": f"{rng.randint(1950, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "gender": rng.choice(GENDERS),
+        "company": f"{rng.choice(SURNAMES)} {rng.choice(['LLC', 'Inc', 'Group'])}",
+        "salary": rng.randint(30000, 200000),
+        "about_me": f"I'm a curious person who loves {rng.choice(HOBBIES)} and {rng.choice(HOBBIES)}.",
+        "address": {
+            "country": "United States",
+            "city": rng.choice(["Boston", "Austin", "Denver", "Seattle"]),
+            "street": f"{rng.randint(1, 999)} Main St",
+            "flat_house": f"Apt {rng.randint(1, 300)}"
+        },
+        "credit_card": {
+            "num": "-".join(f"{rng.randint(0, 9999):04d}" for _ in range(4)),
+            "cvv": f"{rng.randint(0, 999):03d}",
+            "exp_date": f"{rng.randint(1, 12):02d}/{rng.randint(2027, 2032)}"
+        }
+    }
+
+
+def make_users(count: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    return [make_user(i, rng) for i in range(1, count + 1)]
+
+
+def user_to_text(user: dict) -> str:
+    """Same shape as the UMS MCP server tool output"""
+    return "```\n" + "".join(f"  {key}: {value}\n" for key, value in user.items()) + "```\n"
+
+
+def make_conversation(turns: int, users_per_search: int, seed: int = 42) -> dict:
+    """Conversation where every turn is a search_user tool round followed by an answer"""
+    rng = random.Random(seed)
+    messages = [{"role": "system", "content": "You are a User Management Agent."}]
+    for turn in range(turns):
+        call_id = f"call_{seed}_{turn}"
+        found = [make_user(rng.randint(1, 100000), rng) for _ in range(users_per_search)]
+        messages.append({"role": "user", "content": f"Find users named {rng.choice(FIRST_NAMES)}"})
+        messages.append({
+            "role": "assistant",
+            "tool_calls": [{
+                "id": call_id,
+                "type": "function",
+                "function": {"name": "search_user", "arguments": json.dumps({"name": "john"})}
+            }]
+        })
+        messages.append({
+            "role": "tool",
+            "tool_call_id": call_id,
+            "content": "## Search results: \n" + "".join(user_to_text(u) for u in found)
+        })
+        messages.append({"role": "assistant", "content": f"I found {len(found)} users matching your query."})
+
+    return {
+        "id": f"conversation-{seed}",
+        "title": "Benchmark conversation",
+        "messages": messages,
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "updated_at": "2025-01-01T00:00:00+00:00"
+    }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Bytes per conversation and encode/decode cost of the conversation payload codecs.
+
+    python benchmarks/codec_benchmark.py
+    python benchmarks/codec_benchmark.py --train-dict conversations.zdict
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.storage.codec import ConversationCodec, msgpack, zstandard  # noqa: E402
+from benchmarks._synthetic import make_conversation  # noqa: E402
+
+SHAPES = {
+    "small (3 turns x 5 users)": (3, 5),
+    "medium (10 turns x 20 users)": (10, 20),
+    "large (5 turns x 1000 users)": (5, 1000),
+}
+
+
+def measure(codec: ConversationCodec, conversation: dict, repeat: int) -> tuple[int, float, float]:
+    payload = codec.encode(conversation)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.encode(conversation)
+    encode_ms = (time.perf_counter() - start) / repeat * 1000
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        codec.decode(payload)
+    decode_ms = (time.perf_counter() - start) / repeat * 1000
+
+    return len(payload), encode_ms, decode_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--train-dict", help="train a zstd dictionary on synthetic messages and save it here")
+    parser.add_argument("--dict-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    codecs = {"json": ConversationCodec("json"), "json-zlib": ConversationCodec("json-zlib")}
+    if msgpack is not None and zstandard is not None:
+        codecs["msgpack-zstd"] = ConversationCodec("msgpack-zstd")
+
+        samples = [
+            msgpack.packb(make_conversation(2, 3, seed=seed), use_bin_type=True)
+            for seed in range(1000, 1500)
+        ]
+        dictionary = zstandard.train_dictionary(args.dict_size, samples).as_bytes()
+        codecs["msgpack-zstd+dict"] = ConversationCodec("msgpack-zstd", zstd_dictionary=dictionary)
+        if args.train_dict:
+            with open(args.train_dict, "wb") as f:
+                f.write(dictionary)
+            print(f"zstd dictionary ({len(dictionary)} bytes) saved to {args.train_dict}\n")
+    else:
+        print("msgpack/zstandard not installed, skipping msgpack-zstd\n")
+
+    for shape, (turns, users) in SHAPES.items():
+        conversation = make_conversation(turns, users)
+        print(shape)
+        print(f"  {'codec':<20}{'bytes':>12}{'ratio':>8}{'encode ms':>12}{'decode ms':>12}")
+        baseline = None
+        for name, codec in codecs.items():
+            size, encode_ms, decode_ms = measure(codec, conversation, args.repeat)
+            baseline = baseline or size
+            print(f"  {name:<20}{size:>12}{baseline / size:>8.1f}{encode_ms:>12.3f}{decode_ms:>12.3f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
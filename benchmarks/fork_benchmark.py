@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Redis memory and read latency of heavily branched conversations: every branch stored as a full copy of the
+parent history, as clients had to before, versus forks that reference the history they share.
+
+A parent conversation with a long history is branched many times at random points, each branch then gets
+a turn of its own. Memory is the growth of the Redis `used_memory` over the whole workload, reads load
+every branch with the full history. Use an empty database, it is flushed.
+
+    python benchmarks/fork_benchmark.py --redis-url redis://localhost:6379/15
+    python benchmarks/fork_benchmark.py --branches 2000 --messages 80 --codec msgpack-zstd
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from datetime import datetime, UTC
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.conversation_manager import ConversationManager  # noqa: E402
+from agent.storage.codec import ConversationCodec  # noqa: E402
+
+WORDS = [f"{syllable}{suffix}" for syllable in ("ka", "lo", "mi", "ne", "ru", "sa", "to", "vi") for suffix in
+         ("ber", "dan", "fix", "gor", "hul", "jet", "mox", "pra", "qua", "zen")]
+
+
+def text(rng: random.Random, words: int) -> str:
+    # Random words compress like real text, repeated ones would flatter the compressed codecs
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def make_history(count: int, rng: random.Random) -> list[dict]:
+    """User and assistant messages with a long tool result now and then"""
+    messages = [{"role": "system", "content": text(rng, 100)}]
+    while len(messages) < count:
+        messages.append({"role": "user", "content": text(rng, 30)})
+        if rng.random() < 0.3:
+            call_id = f"call_{len(messages)}"
+            messages.append({
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "search", "arguments": "{}"}}]
+            })
+            messages.append({"role": "tool", "tool_call_id": call_id, "content": text(rng, 400)})
+        messages.append({"role": "assistant", "content": text(rng, 80)})
+    return messages
+
+
+def branch_points(messages: list[dict]) -> list[int]:
+    """Message counts a branch can start with, never inside a tool call"""
+    return [n for n in range(2, len(messages) + 1) if messages[n - 1]["role"] == "user"]
+
+
+async def used_memory(client: redis.Redis) -> int:
+    return (await client.info("memory"))["used_memory"]
+
+
+async def save_turn(manager: ConversationManager, conversation: dict, rng: random.Random) -> dict:
+    turn = [{"role": "user", "content": text(rng, 30)}, {"role": "assistant", "content": text(rng, 80)}]
+    conversation = {
+        **conversation,
+        "messages": [*conversation["messages"], *turn],
+        "updated_at": datetime.now(UTC).isoformat()
+    }
+    await manager._save_conversation(conversation, appended_from=len(conversation["messages"]) - len(turn))
+    return conversation
+
+
+async def copy_branch(manager: ConversationManager, parent: dict, count: int, rng: random.Random) -> dict:
+    conversation = await manager.create_conversation("branch")
+    conversation = {**conversation, "messages": parent["messages"][:count]}
+    await manager._save_conversation(conversation)
+    return await save_turn(manager, conversation, rng)
+
+
+async def fork_branch(manager: ConversationManager, parent: dict, count: int, rng: random.Random) -> dict:
+    conversation = await manager.fork_conversation(parent["id"], count, "branch")
+    return await save_turn(manager, conversation, rng)
+
+
+async def measure(client: redis.Redis, manager: ConversationManager, branch, args) -> dict:
+    rng = random.Random(args.seed)
+    history = make_history(args.messages, rng)
+    points = branch_points(history)
+
+    before = await used_memory(client)
+    parent = await manager.create_conversation("parent")
+    parent = {**parent, "messages": history}
+    await manager._save_conversation(parent)
+
+    start = time.perf_counter()
+    branches = [await branch(manager, parent, rng.choice(points), rng) for _ in range(args.branches)]
+    write_seconds = time.perf_counter() - start
+    memory = await used_memory(client) - before
+
+    start = time.perf_counter()
+    for conversation in branches:
+        loaded = await manager.get_conversation(conversation["id"])
+        assert len(loaded["messages"]) == len(conversation["messages"])
+    read_seconds = time.perf_counter() - start
+    return {
+        "memory": memory,
+        "write_ms": write_seconds / args.branches * 1000,
+        "read_ms": read_seconds / args.branches * 1000
+    }
+
+
+async def run(args):
+    client = redis.Redis.from_url(args.redis_url)
+    # Quiet the per-operation info logs of the manager
+    logging.disable(logging.INFO)
+
+    results = {}
+    for name, branch in (("copy", copy_branch), ("fork", fork_branch)):
+        await client.flushdb()
+        manager = ConversationManager(None, client, codec=ConversationCodec(args.codec))
+        results[name] = await measure(client, manager, branch, args)
+    await client.flushdb()
+    await client.close()
+
+    print(f"{args.branches} branches of a {args.messages} message conversation, {args.codec} payloads")
+    print(f"{'mode':6} {'memory MB':>10} {'per branch KB':>14} {'write ms':>9} {'read ms':>8}")
+    for name, result in results.items():
+        print(
+            f"{name:6} {result['memory'] / 2 ** 20:10.2f} {result['memory'] / args.branches / 1024:14.2f} "
+            f"{result['write_ms']:9.3f} {result['read_ms']:8.3f}"
+        )
+    print(f"forks use {1 - results['fork']['memory'] / results['copy']['memory']:.1%} less memory")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--branches", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=60, help="messages of the parent conversation")
+    parser.add_argument("--codec", default="json")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
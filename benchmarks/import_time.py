@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Import-time budget of the agent: runs `python -X importtime -c "import agent.app"` in a fresh interpreter
+and fails when the import is slower than the budget or pulls in modules that must load lazily.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 800 --forbid openai mcp
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> dict[str, tuple[int, int]]:
+    """Self and cumulative import time in microseconds of every module loaded by importing `module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if match := IMPORT_TIME_LINE.match(line):
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="agent.app")
+    parser.add_argument("--budget-ms", type=float, default=600, help="cumulative import time allowed for --module")
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=["openai", "mcp"],
+        help="packages that must not be imported at module load"
+    )
+    parser.add_argument("--runs", type=int, default=3, help="the fastest run is compared to the budget")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    modules = min(runs, key=lambda run: run[args.module][1])
+    total_ms = modules[args.module][1] / 1000
+
+    print(f"{'module':<45} {'self ms':>9} {'cumulative ms':>14}")
+    heaviest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in heaviest:
+        print(f"{name:<45} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+    print()
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import {args.module} took {total_ms:.1f} ms, budget is {args.budget_ms:.0f} ms")
+    for package in args.forbid:
+        if package in modules:
+            failures.append(f"{package} is imported eagerly, load it on first use")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print(f"OK: import {args.module} took {total_ms:.1f} ms of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Event-loop stall caused by logging on the chat hot path.
+
+Concurrent fake turns log what a tool round logs (tool arguments, result sizes, an MCP init payload)
+while a heartbeat task measures how late the loop wakes it up. The log sink sleeps on every write
+to stand in for a slow stdout pipe of a container runtime.
+
+    python benchmarks/logging_benchmark.py
+    python benchmarks/logging_benchmark.py --write-latency-us 500 --turns 200
+"""
+import argparse
+import asyncio
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.logging_config import TEXT_FORMAT, Lazy, configure_logging  # noqa: E402
+
+logger = logging.getLogger("agent.benchmark")
+
+
+class SlowSink(io.TextIOBase):
+    """Discards output, each write blocks for `latency` seconds"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text: str) -> int:
+        self.writes += 1
+        time.sleep(self.latency)
+        return len(text)
+
+
+class InitResult:
+    """Stands in for a pydantic model with a costly model_dump"""
+
+    def model_dump(self) -> dict:
+        return {f"capability_{i}": {"enabled": True, "options": list(range(20))} for i in range(200)}
+
+
+TOOL_ARGS = {"query": "john", "fields": ["name", "surname", "email"], "limit": 50}
+TOOL_RESULT = [{"id": i, "name": "John", "email": f"john{i}@example.com"} for i in range(500)]
+
+
+async def turn(lazy: bool, rounds: int):
+    for _ in range(rounds):
+        logger.debug("Creating streaming completion", extra={"message_count": 40, "model": "gpt-4o"})
+        logger.info("Calling MCP tool", extra={"tool_name": "search_users", "tool_args": TOOL_ARGS})
+        logger.debug(
+            "MCP tool result received",
+            extra={"content_length": Lazy(lambda: len(str(TOOL_RESULT))) if lazy else len(str(TOOL_RESULT))}
+        )
+        logger.debug(
+            "MCP session initialized",
+            extra={"init_result": Lazy(InitResult().model_dump) if lazy else InitResult().model_dump()}
+        )
+        logger.info("Tool executed successfully", extra={"tool_name": "search_users"})
+        await asyncio.sleep(0)
+
+
+async def run(lazy: bool, turns: int, rounds: int) -> dict:
+    lags = []
+    done = asyncio.Event()
+
+    async def heartbeat():
+        interval = 0.001
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append(time.perf_counter() - start - interval)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(lazy, rounds) for _ in range(turns)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await beat
+
+    lags.sort()
+    return {
+        "wall_ms": elapsed * 1000,
+        "lag_p50_ms": statistics.median(lags) * 1000,
+        "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000,
+        "lag_max_ms": lags[-1] * 1000,
+    }
+
+
+def sync_logging(sink: SlowSink, level: str):
+    """The previous setup: basicConfig with a stdout handler writing on the calling thread"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    logging.basicConfig(level=level, format=TEXT_FORMAT, stream=sink, force=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="concurrent turns")
+    parser.add_argument("--rounds", type=int, default=10, help="tool rounds per turn")
+    parser.add_argument("--write-latency-us", type=float, default=200)
+    args = parser.parse_args()
+
+    latency = args.write_latency_us / 1_000_000
+    scenarios = [
+        ("sync handler, DEBUG, eager extras", lambda sink: sync_logging(sink, "DEBUG"), False),
+        ("queue handler, DEBUG, lazy extras", lambda sink: configure_logging("DEBUG", stream=sink), True),
+        ("queue handler, DEBUG sampled 1/10", lambda sink: configure_logging("DEBUG", sample_rate=0.1, stream=sink), True),
+        ("queue handler, INFO, lazy extras", lambda sink: configure_logging("INFO", stream=sink), True),
+    ]
+
+    print(f"{args.turns} turns x {args.rounds} rounds, sink write latency {args.write_latency_us:.0f} us")
+    print(f"{'setup':<38} {'wall ms':>9} {'lag p50':>9} {'lag p99':>9} {'lag max':>9} {'writes':>7}")
+    for name, setup, lazy in scenarios:
+        sink = SlowSink(latency)
+        handler = setup(sink)
+        result = asyncio.run(run(lazy, args.turns, args.rounds))
+        if handler:
+            # Let the writer thread finish, its time is not spent on the event loop
+            handler.close()
+        print(
+            f"{name:<38} {result['wall_ms']:>9.1f} {result['lag_p50_ms']:>9.2f} "
+            f"{result['lag_p99_ms']:>9.2f} {result['lag_max_ms']:>9.2f} {sink.writes:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+CPU cost of preparing a chat turn on a 300-message conversation:
+pydantic rebuild of the whole history versus appending to wire-ready dicts.
+
+    python benchmarks/message_benchmark.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.models.message import Message, Role, WireMessage  # noqa: E402
+from benchmarks._synthetic import make_conversation  # noqa: E402
+
+
+def pydantic_turn(stored: list[dict], user_message: Message, rounds: int) -> list[dict]:
+    """Previous hot path: validate every stored message, serialize the full list for every round and on save"""
+    messages = [Message(**msg_data) for msg_data in stored]
+    messages.append(user_message)
+    for _ in range(rounds):
+        [msg.to_dict() for msg in messages]
+        messages.append(Message(role=Role.ASSISTANT, content="ok"))
+    return [msg.to_dict() for msg in messages]
+
+
+def wire_turn(stored: list[dict], user_message: Message, rounds: int) -> list[dict]:
+    """Current hot path: history stays wire-ready, only new messages are serialized"""
+    messages = list(stored)
+    messages.append(user_message.to_dict())
+    for _ in range(rounds):
+        messages.append(WireMessage(role=Role.ASSISTANT, content="ok").to_dict())
+    return messages
+
+
+def measure(turn, stored: list[dict], user_message: Message, rounds: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        turn(stored, user_message, rounds)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3, help="model rounds per turn")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    stored = make_conversation(args.messages // 4, 1)["messages"][:args.messages]
+    user_message = Message(role=Role.USER, content="Show me user 42")
+
+    assert pydantic_turn(stored, user_message, args.rounds) == wire_turn(stored, user_message, args.rounds)
+
+    pydantic_ms = measure(pydantic_turn, stored, user_message, args.rounds, args.repeat)
+    wire_ms = measure(wire_turn, stored, user_message, args.rounds, args.repeat)
+
+    print(f"{len(stored)} stored messages, {args.rounds} model rounds per turn")
+    print(f"  pydantic rebuild   {pydantic_ms:8.3f} ms/turn")
+    print(f"  wire-ready dicts   {wire_ms:8.3f} ms/turn  ({pydantic_ms / wire_ms:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
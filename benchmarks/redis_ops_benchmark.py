@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Latency of conversation create, save and delete against a real Redis: one command per round trip, as the
+manager used to write them, versus the MULTI transactions and the delete script it uses now.
+
+The gap grows with the round-trip time, run it against a Redis over the network to see the production
+picture. Use an empty database, it is flushed.
+
+    python benchmarks/redis_ops_benchmark.py --redis-url redis://localhost:6379/15
+    python benchmarks/redis_ops_benchmark.py --operations 5000 --messages 40
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, UTC
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.conversation_manager import CONVERSATION_LIST_KEY, CONVERSATION_PREFIX, ConversationManager  # noqa: E402
+
+
+def percentile(samples: list[float], p: float) -> float:
+    return sorted(samples)[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def make_messages(count: int) -> list[dict]:
+    return [
+        {"role": "user" if n % 2 == 0 else "assistant", "content": f"message {n} " + "lorem ipsum " * 20}
+        for n in range(count)
+    ]
+
+
+class SequentialStore:
+    """Create, save and delete one command at a time"""
+
+    def __init__(self, client: redis.Redis):
+        self.redis = client
+
+    async def create(self, title: str) -> dict:
+        conversation_id = str(uuid.uuid4())
+        now = datetime.now(UTC).isoformat()
+        conversation = {"id": conversation_id, "title": title, "messages": [], "created_at": now, "updated_at": now}
+        await self.redis.set(f"{CONVERSATION_PREFIX}{conversation_id}", json.dumps(conversation))
+        await self.redis.zadd(CONVERSATION_LIST_KEY, {conversation_id: datetime.now(UTC).timestamp()})
+        return conversation
+
+    async def save(self, conversation_id: str, message: dict):
+        conversation = json.loads(await self.redis.get(f"{CONVERSATION_PREFIX}{conversation_id}"))
+        conversation["messages"].append(message)
+        conversation["updated_at"] = datetime.now(UTC).isoformat()
+        await self.redis.set(f"{CONVERSATION_PREFIX}{conversation_id}", json.dumps(conversation))
+        await self.redis.zadd(CONVERSATION_LIST_KEY, {conversation_id: datetime.now(UTC).timestamp()})
+
+    async def delete(self, conversation_id: str):
+        if await self.redis.delete(f"{CONVERSATION_PREFIX}{conversation_id}"):
+            await self.redis.zrem(CONVERSATION_LIST_KEY, conversation_id)
+
+
+class AtomicStore:
+    """The conversation manager, no turns are run so it needs no model client"""
+
+    def __init__(self, client: redis.Redis):
+        self.manager = ConversationManager(None, client)
+        self.conversations: dict[str, dict] = {}
+
+    async def create(self, title: str) -> dict:
+        conversation = await self.manager.create_conversation(title)
+        self.conversations[conversation["id"]] = conversation
+        return conversation
+
+    async def save(self, conversation_id: str, message: dict):
+        # The manager appends to the conversation it loaded for the turn instead of reading it again
+        conversation = self.conversations[conversation_id]
+        self.conversations[conversation_id] = conversation = {
+            **conversation,
+            "messages": [*conversation["messages"], message],
+            "updated_at": datetime.now(UTC).isoformat()
+        }
+        await self.manager._save_conversation(conversation, appended_from=len(conversation["messages"]) - 1)
+
+    async def delete(self, conversation_id: str):
+        await self.manager.delete_conversation(conversation_id)
+        self.conversations.pop(conversation_id, None)
+
+
+async def measure(store, args, messages: list[dict]) -> dict[str, list[float]]:
+    samples: dict[str, list[float]] = {"create": [], "save": [], "delete": []}
+    for n in range(args.operations):
+        start = time.perf_counter()
+        conversation = await store.create(f"benchmark {n}")
+        samples["create"].append(time.perf_counter() - start)
+
+        for message in messages:
+            start = time.perf_counter()
+            await store.save(conversation["id"], message)
+            samples["save"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await store.delete(conversation["id"])
+        samples["delete"].append(time.perf_counter() - start)
+    return samples
+
+
+async def run(args):
+    client = redis.Redis.from_url(args.redis_url)
+    await client.flushdb()
+    messages = make_messages(args.messages)
+    # Quiet the per-operation info logs of the manager
+    logging.disable(logging.INFO)
+
+    results = {}
+    for name, store in (("sequential", SequentialStore(client)), ("atomic", AtomicStore(client))):
+        await measure(store, argparse.Namespace(operations=20), messages[:2])
+        results[name] = await measure(store, args, messages)
+        await client.flushdb()
+
+    print(f"{args.operations} conversations, {args.messages} saves each, latency in ms")
+    print(f"{'operation':10} {'mode':12} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8}")
+    for operation in ("create", "save", "delete"):
+        for name, samples in results.items():
+            values = samples[operation]
+            print(
+                f"{operation:10} {name:12} {percentile(values, 0.5) * 1000:8.3f} {percentile(values, 0.95) * 1000:8.3f} "
+                f"{percentile(values, 0.99) * 1000:8.3f} {sum(values) / len(values) * 1000:8.3f}"
+            )
+    await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--operations", type=int, default=2000, help="conversations created and deleted")
+    parser.add_argument("--messages", type=int, default=10, help="saves per conversation")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Query latency of the conversation search index against a real Redis.
+
+Loads synthetic conversations into the index (user/assistant turns drawn from a Zipf-like vocabulary,
+as in real chats a few words are everywhere and most are rare), then runs single-word, multi-word,
+prefix and phrase queries and reports latency percentiles. Use an empty database, it is flushed.
+
+    python benchmarks/search_benchmark.py --redis-url redis://localhost:6379/15
+    python benchmarks/search_benchmark.py --conversations 100000 --queries 500
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.storage.search_index import ConversationSearchIndex  # noqa: E402
+
+VOCABULARY_SIZE = 20000
+
+
+def word(rank: int) -> str:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    text = ""
+    rank += 26 * 27
+    while rank:
+        rank, digit = divmod(rank, 26)
+        text += letters[digit]
+    return text
+
+
+def sentence(rng: random.Random, words: list[str], weights: list[float], length: int) -> str:
+    return " ".join(rng.choices(words, weights, k=length))
+
+
+async def load(client: redis.Redis, index: ConversationSearchIndex, args, words, weights) -> float:
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for offset in range(0, args.conversations, 500):
+        async with client.pipeline(transaction=False) as pipe:
+            for n in range(offset, min(offset + 500, args.conversations)):
+                messages = [
+                    {"role": "user" if turn % 2 == 0 else "assistant", "content": sentence(rng, words, weights, 25)}
+                    for turn in range(args.messages)
+                ]
+                index.stage(pipe, f"conversation-{n}", messages, title=sentence(rng, words, weights, 3))
+            await pipe.execute()
+    return time.perf_counter() - start
+
+
+async def run(args):
+    client = redis.Redis.from_url(args.redis_url)
+    await client.flushdb()
+    index = ConversationSearchIndex(client)
+
+    words = [word(rank) for rank in range(VOCABULARY_SIZE)]
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    elapsed = await load(client, index, args, words, weights)
+    info = await client.info("memory")
+    print(
+        f"indexed {args.conversations} conversations x {args.messages} messages in {elapsed:.1f} s, "
+        f"redis memory {info['used_memory'] / 1024 / 1024:.0f} MiB"
+    )
+
+    rng = random.Random(2)
+    queries = {
+        "common word": lambda: words[rng.randrange(10)],
+        "rare word": lambda: words[rng.randrange(1000, VOCABULARY_SIZE)],
+        "two words": lambda: f"{words[rng.randrange(50)]} {words[rng.randrange(50, 2000)]}",
+        "three words": lambda: " ".join(words[rng.randrange(500)] for _ in range(3)),
+        "prefix": lambda: f"{words[rng.randrange(100, 2000)][:3]}*",
+        "phrase": lambda: f'"{words[rng.randrange(20)]} {words[rng.randrange(20)]}"',
+    }
+
+    print(f"{'query':<14} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'avg hits':>9}")
+    for name, make_query in queries.items():
+        latencies, hits = [], []
+        for _ in range(args.queries):
+            query = make_query()
+            start = time.perf_counter()
+            results = await index.search(query, limit=args.limit)
+            latencies.append(time.perf_counter() - start)
+            hits.append(len(results))
+        latencies.sort()
+        print(
+            f"{name:<14} {statistics.median(latencies) * 1000:>8.2f} "
+            f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.2f} {latencies[-1] * 1000:>8.2f} "
+            f"{statistics.mean(hits):>9.1f}"
+        )
+    await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--messages", type=int, default=6, help="messages per conversation")
+    parser.add_argument("--queries", type=int, default=200, help="queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
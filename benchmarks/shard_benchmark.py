@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Throughput of the conversation layer spread over 1..N Redis shards.
+
+Worker processes run a chat-like workload for many tenants: create a conversation, save a few turns
+(payload, message list, search index in one transaction each) and search the tenant's conversations.
+The same workload runs against the first shard only, then the first two and so on, and conversations
+per second are reported for each shard count. Throughput grows with shards while Redis is the
+bottleneck, give the workers enough CPU to get there. Use empty databases, they are flushed.
+
+    python benchmarks/shard_benchmark.py --redis-urls redis://localhost:6379/15 redis://localhost:6380/15
+    python benchmarks/shard_benchmark.py --redis-urls ... --processes 8 --concurrency 16 --seconds 20
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, UTC
+
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.conversation_manager import ConversationManager  # noqa: E402
+from agent.storage.search_index import ConversationSearchIndex  # noqa: E402
+from agent.storage.tenancy import TenantShards  # noqa: E402
+
+WORDS = [f"{syllable}{suffix}" for syllable in ("ka", "lo", "mi", "ne", "ru", "sa", "to", "vi") for suffix in
+         ("ber", "dan", "fix", "gor", "hul", "jet", "mox", "pra", "qua", "zen")]
+
+
+def turn(rng: random.Random, words: int) -> list[dict]:
+    return [
+        {"role": "user", "content": " ".join(rng.choices(WORDS, k=words))},
+        {"role": "assistant", "content": " ".join(rng.choices(WORDS, k=words * 3))}
+    ]
+
+
+async def run_worker(urls: list[str], args: argparse.Namespace, seed: int) -> float:
+    clients = [redis.Redis.from_url(url) for url in urls]
+    tenants = TenantShards(clients)
+    # No turns reach a model, the manager only stores them
+    manager = ConversationManager(None, clients[0], search_index=ConversationSearchIndex(clients[0]), tenants=tenants)
+    rng = random.Random(seed)
+    start = time.monotonic()
+    deadline = start + args.seconds
+    conversations = 0
+
+    async def loop():
+        nonlocal conversations
+        while time.monotonic() < deadline:
+            tenant = tenants.tenant(f"tenant-{rng.randrange(args.tenants)}")
+            conversation = await manager.create_conversation(" ".join(rng.choices(WORDS, k=3)), tenant)
+            for _ in range(args.turns):
+                messages = [*conversation["messages"], *turn(rng, args.words)]
+                conversation = {**conversation, "messages": messages, "updated_at": datetime.now(UTC).isoformat()}
+                await manager._save_conversation(conversation, appended_from=len(messages) - 2, tenant=tenant)
+            await manager.search_conversations(rng.choice(WORDS), limit=10, tenant=tenant)
+            conversations += 1
+
+    await asyncio.gather(*(loop() for _ in range(args.concurrency)))
+    elapsed = time.monotonic() - start
+    await tenants.close()
+    return conversations / elapsed
+
+
+def worker(urls: list[str], args: argparse.Namespace, seed: int) -> float:
+    """Conversations per second of one process"""
+    logging.disable(logging.INFO)
+    return asyncio.run(run_worker(urls, args, seed))
+
+
+async def flush(urls: list[str]):
+    for url in urls:
+        client = redis.Redis.from_url(url)
+        await client.flushdb()
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-urls", nargs="+", required=True, help="one URL per shard")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=8, help="conversations in flight per process")
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=4, help="saved turns per conversation")
+    parser.add_argument("--words", type=int, default=20, help="words per user message")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{args.processes} processes x {args.concurrency} conversations in flight, {args.tenants} tenants")
+    print(f"{'shards':>6} {'conversations/s':>16} {'turns/s':>10} {'speedup':>8}  tenants per shard")
+    for count in range(1, len(args.redis_urls) + 1):
+        urls = args.redis_urls[:count]
+        asyncio.run(flush(urls))
+        with multiprocessing.Pool(args.processes) as pool:
+            rate = sum(pool.starmap(worker, [(urls, args, seed) for seed in range(args.processes)]))
+
+        baseline = baseline or rate
+        placement = TenantShards([None] * count)
+        per_shard = Counter(placement.shard_index(f"tenant-{n}") for n in range(args.tenants))
+        print(
+            f"{count:>6} {rate:>16.1f} {rate * args.turns:>10.1f} {rate / baseline:>7.2f}x  "
+            f"{[per_shard[index] for index in range(count)]}"
+        )
+    asyncio.run(flush(args.redis_urls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Build time and search latency of the UMS MCP server in-memory user index.
+
+    python benchmarks/user_index_benchmark.py
+    python benchmarks/user_index_benchmark.py --sizes 1000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "docker", "ums-mcp-server"))
+
+from user_index import UserIndex  # noqa: E402
+
+SYLLABLES = ["an", "be", "ca", "da", "el", "fi", "go", "ha", "is", "jo", "ka", "li", "mo", "na", "ol", "pe", "ri",
+             "sa", "ta", "ul", "va", "wi", "xe", "yo", "za"]
+DOMAINS = ["gmail.com", "yahoo.com", "outlook.com", "company.com", "example.org"]
+GENDERS = ["male", "female", "other", "prefer_not_to_say"]
+
+
+def make_word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def make_users(count: int, seed: int = 7) -> list[dict]:
+    """Only the indexed fields matter for the index, other fields are kept out to save memory"""
+    rng = random.Random(seed)
+    users = []
+    for user_id in range(1, count + 1):
+        name, surname = make_word(rng), make_word(rng)
+        users.append({
+            "id": user_id,
+            "name": name,
+            "surname": surname,
+            "email": f"{name.lower()}.{surname.lower()}{user_id}@{rng.choice(DOMAINS)}",
+            "gender": rng.choice(GENDERS),
+        })
+    return users
+
+
+def percentile(samples: list[float], p: float) -> float:
+    return sorted(samples)[min(int(len(samples) * p), len(samples) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        users = make_users(size)
+        start = time.perf_counter()
+        index = UserIndex.build(users)
+        build_s = time.perf_counter() - start
+
+        rng = random.Random(size)
+        samples = [rng.choice(users) for _ in range(args.queries)]
+        workloads = {
+            "surname (full)": lambda u: {"surname": u["surname"]},
+            "name prefix + gender": lambda u: {"name": u["name"][:4], "gender": u["gender"]},
+            "email (exact user)": lambda u: {"email": u["email"].split("@")[0]},
+            "name + surname": lambda u: {"name": u["name"], "surname": u["surname"]},
+        }
+
+        print(f"{size} users, index built in {build_s:.2f} s")
+        print(f"  {'query':<24}{'p50 ms':>10}{'p99 ms':>10}{'avg matches':>14}")
+        for label, criteria in workloads.items():
+            timings, matches = [], []
+            for user in samples:
+                query = criteria(user)
+                start = time.perf_counter()
+                result = index.search(**query)
+                timings.append((time.perf_counter() - start) * 1000)
+                matches.append(len(result))
+            print(
+                f"  {label:<24}{statistics.median(timings):>10.3f}{percentile(timings, 0.99):>10.3f}"
+                f"{statistics.mean(matches):>14.1f}"
+            )
+        print()
+        del index, users
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,35 @@
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
 
+import httpx
+import uvicorn
 from mcp.server.fastmcp import FastMCP
+from mcp.types import ToolAnnotations
+from pydantic import BaseModel
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from models.user_info import UserSearchRequest, UserCreate, UserUpdate
 from user_client import UserClient
+from user_data_client import UserDataClient, DEFAULT_SEARCH_FIELDS, project
+from user_index import UserIndex
+
+logger = logging.getLogger(__name__)
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+BATCH_MAX_OUTPUT_CHARS = int(os.getenv("BATCH_MAX_OUTPUT_CHARS", 20000))
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+USER_INDEX_ENABLED = os.getenv("USER_INDEX_ENABLED", "false").lower() == "true"
+USER_INDEX_RECONCILE_SECONDS = float(os.getenv("USER_INDEX_RECONCILE_SECONDS", 300))
+# First retry of a failed index build, doubled up to USER_INDEX_RECONCILE_SECONDS
+USER_INDEX_RETRY_SECONDS = float(os.getenv("USER_INDEX_RETRY_SECONDS", 5))
 
 mcp = FastMCP(
     name="users-management-mcp-server",
@@ -14,7 +38,110 @@ mcp = FastMCP(
     log_level="DEBUG"
 )
 
+# Lets the agent share one call between concurrent identical requests
+READ_ONLY = ToolAnnotations(readOnlyHint=True)
+
 user_client = UserClient()
+user_data_client = UserDataClient()
+
+# ==================== SEARCH INDEX ====================
+user_index: Optional[UserIndex] = None
+_user_index_task: Optional[asyncio.Task] = None
+# Changes made by tools while the index is being built, replayed onto the new index
+_user_index_journal: Optional[list[tuple[str, Any]]] = None
+
+
+@asynccontextmanager
+async def _user_index_lifespan():
+    """Index is built when the server starts and then periodically reconciled with the user service"""
+    global _user_index_task
+    if USER_INDEX_ENABLED:
+        _user_index_task = asyncio.create_task(_maintain_user_index())
+    try:
+        yield
+    finally:
+        if _user_index_task:
+            _user_index_task.cancel()
+            await asyncio.gather(_user_index_task, return_exceptions=True)
+
+
+async def _build_user_index() -> UserIndex:
+    global _user_index_journal
+    _user_index_journal = []
+    try:
+        users = await user_data_client.list_users()
+        index = await asyncio.to_thread(UserIndex.build, users)
+        for operation, value in _user_index_journal:
+            _apply_index_change(index, operation, value)
+        logger.info(f"User index loaded with {len(index)} users")
+        return index
+    finally:
+        _user_index_journal = None
+
+
+async def _maintain_user_index():
+    """
+    Builds the index, then rebuilds it every USER_INDEX_RECONCILE_SECONDS. A failed build is retried with
+    backoff, searches meanwhile go to the user service (or to the last index that was built).
+    """
+    global user_index
+    retry_delay = USER_INDEX_RETRY_SECONDS
+    while True:
+        try:
+            user_index = await _build_user_index()
+        except Exception as e:
+            logger.warning(f"Failed to build user index, retrying in {retry_delay:.0f}s: {e}")
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, USER_INDEX_RECONCILE_SECONDS)
+            continue
+        retry_delay = USER_INDEX_RETRY_SECONDS
+        await asyncio.sleep(USER_INDEX_RECONCILE_SECONDS)
+
+
+def _apply_index_change(index: UserIndex, operation: str, value: Any):
+    if operation == "upsert":
+        index.upsert(value)
+    else:
+        index.remove(value)
+
+
+def _index_active() -> bool:
+    """An index is in use or being built, writes have to reach it"""
+    return user_index is not None or _user_index_journal is not None
+
+
+def _record_index_change(operation: str, value: Any):
+    if user_index is not None:
+        _apply_index_change(user_index, operation, value)
+    if _user_index_journal is not None:
+        _user_index_journal.append((operation, value))
+
+
+async def _refresh_indexed_user(user_id: int):
+    """Re-read user after a write made through this server, a user the service no longer has is dropped"""
+    if not _index_active():
+        return
+    try:
+        user = await user_data_client.get_user(user_id)
+    except Exception as e:
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+            _record_index_change("remove", user_id)
+        else:
+            logger.warning(f"Failed to refresh indexed user {user_id}, it is fixed by reconciliation: {e}")
+        return
+    _record_index_change("upsert", user)
+
+
+async def _refresh_indexed_email(email: str):
+    """Index a newly added user, the service assigns the id so it is looked up by its unique email"""
+    if not _index_active():
+        return
+    try:
+        for user in await user_data_client.search_users(email=email):
+            if str(user.get("email", "")).lower() == email.lower():
+                _record_index_change("upsert", user)
+    except Exception as e:
+        logger.warning(f"Failed to index added user, it will appear after reconciliation: {e}")
 
 # ==================== HEALTH CHECK ====================
 @mcp.custom_route("/health", methods=["GET"], include_in_schema=False)
@@ -23,30 +150,154 @@ async def health_check(_: Request) -> JSONResponse:
     return JSONResponse({"status": "healthy"})
 
 # ==================== EXISTING TOOLS ====================
-@mcp.tool()
-async def get_user_by_id(user_id: int) -> str:
-    """Provides full user information by user_id"""
-    return await user_client.get_user(user_id)
+@mcp.tool(annotations=READ_ONLY)
+async def get_user_by_id(user_id: int, fields: Optional[list[str]] = None) -> str:
+    """
+    Provides full user information by user_id.
+    Pass `fields` (e.g. ["name", "email", "address.city"]) to get only those fields.
+    """
+    if not fields:
+        return await user_client.get_user(user_id)
+    return json.dumps(project(await user_data_client.get_user(user_id), fields))
 
 @mcp.tool()
 async def delete_user(user_id: int) -> str:
     """Deletes user by user_id"""
-    return await user_client.delete_user(user_id)
-
-@mcp.tool()
-async def search_user(search_user_request: UserSearchRequest) -> str:
-    """Searches for users by name, surname, email and gender"""
-    return await user_client.search_users(**search_user_request.model_dump())
+    result = await user_client.delete_user(user_id)
+    await _refresh_indexed_user(user_id)
+    return result
+
+@mcp.tool(annotations=READ_ONLY)
+async def search_user(
+        search_user_request: UserSearchRequest,
+        fields: Optional[list[str]] = None,
+        limit: int = SEARCH_DEFAULT_LIMIT,
+        offset: int = 0
+) -> str:
+    """
+    Searches for users by name, surname, email and gender.
+    Returns the total match count and one JSON object per user with fields id, name, surname, email and gender.
+    Pass `fields` to select other fields (dotted names like "address.city" for nested ones, ["*"] for everything),
+    use `limit` (max 100) and `offset` to page through large result sets.
+    """
+    criteria = search_user_request.model_dump(mode="json")
+    if user_index is not None:
+        users = user_index.search(**criteria)
+    else:
+        users = await user_data_client.search_users(**criteria)
+    return _format_page(users, fields or DEFAULT_SEARCH_FIELDS, limit, offset)
+
+
+def _format_page(users: list[dict[str, Any]], fields: list[str], limit: int, offset: int) -> str:
+    """Compact page of projected users, one JSON object per line"""
+    limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
+    offset = max(offset, 0)
+    page = users[offset:offset + limit]
+
+    header = f"## Search results: total={len(users)}, offset={offset}, returned={len(page)}"
+    if offset + len(page) < len(users):
+        header += f", next_offset={offset + len(page)}"
+    lines = [header]
+    lines.extend(json.dumps(project(user, fields), separators=(",", ":")) for user in page)
+    return "\n".join(lines)
 
 @mcp.tool()
 async def add_user(user_create_model: UserCreate) -> str:
     """Adds new user into the system"""
-    return await user_client.add_user(user_create_model)
+    result = await user_client.add_user(user_create_model)
+    await _refresh_indexed_email(user_create_model.email)
+    return result
 
 @mcp.tool()
 async def update_user(user_id: int, user_update_model: UserUpdate) -> str:
     """Updates user by user_id"""
-    return await user_client.update_user(user_id, user_update_model)
+    result = await user_client.update_user(user_id, user_update_model)
+    await _refresh_indexed_user(user_id)
+    return result
+
+# ==================== BATCH TOOLS ====================
+
+class UserUpdateItem(BaseModel):
+    user_id: int
+    user_update_model: UserUpdate
+
+
+async def _run_batch(items: list[tuple[str, Callable[[], Awaitable[str]]]]) -> str:
+    """
+    Runs batch items against the user service with bounded concurrency.
+    Every item gets a status line, item outputs are included while they fit into BATCH_MAX_OUTPUT_CHARS.
+    """
+    if len(items) > BATCH_MAX_ITEMS:
+        return f"Error: batch of {len(items)} items exceeds the limit of {BATCH_MAX_ITEMS}, split it into smaller batches"
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(operation: Callable[[], Awaitable[str]]) -> tuple[bool, str]:
+        async with semaphore:
+            try:
+                return True, str(await operation())
+            except Exception as e:
+                return False, str(e)
+
+    results = await asyncio.gather(*(run(operation) for _, operation in items))
+
+    succeeded = sum(1 for ok, _ in results if ok)
+    lines = [f"## Batch results: {succeeded} succeeded, {len(results) - succeeded} failed\n"]
+    budget = BATCH_MAX_OUTPUT_CHARS
+    omitted = 0
+    for (label, _), (ok, output) in zip(items, results):
+        status = "ok" if ok else "error"
+        entry = f"### {label}: {status}\n{output}\n"
+        if len(entry) <= budget:
+            lines.append(entry)
+            budget -= len(entry)
+        else:
+            lines.append(f"### {label}: {status} (output omitted)\n")
+            omitted += 1
+
+    if omitted:
+        lines.append(f"\n{omitted} outputs omitted to keep the response under {BATCH_MAX_OUTPUT_CHARS} characters.")
+    return "".join(lines)
+
+
+def _unique(values: list[Any]) -> list[Any]:
+    return list(dict.fromkeys(values))
+
+
+@mcp.tool(annotations=READ_ONLY)
+async def get_users_by_ids(user_ids: list[int]) -> str:
+    """Provides full user information for several users at once, with a status per user_id"""
+    return await _run_batch([
+        (f"user_id={user_id}", lambda user_id=user_id: user_client.get_user(user_id))
+        for user_id in _unique(user_ids)
+    ])
+
+@mcp.tool()
+async def delete_users(user_ids: list[int]) -> str:
+    """Deletes several users by user_id, with a status per user_id"""
+    return await _run_batch([
+        (f"user_id={user_id}", lambda user_id=user_id: delete_user(user_id))
+        for user_id in _unique(user_ids)
+    ])
+
+@mcp.tool()
+async def add_users(user_create_models: list[UserCreate]) -> str:
+    """Adds several new users into the system, with a status per user"""
+    return await _run_batch([
+        (f"#{index} {model.name} {model.surname}", lambda model=model: add_user(model))
+        for index, model in enumerate(user_create_models, start=1)
+    ])
+
+@mcp.tool()
+async def update_users(updates: list[UserUpdateItem]) -> str:
+    """Updates several users, each item holds user_id and its user_update_model"""
+    return await _run_batch([
+        (
+            f"user_id={item.user_id}",
+            lambda item=item: update_user(item.user_id, item.user_update_model)
+        )
+        for item in updates
+    ])
 
 # ==================== MCP RESOURCES ====================
 
@@ -192,7 +443,25 @@ When creating profiles, aim for diversity in:
 """
 
 
+async def serve():
+    """`mcp.run(transport="streamable-http")` with the search index started and stopped alongside the server"""
+    app = mcp.streamable_http_app()
+    session_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(starlette_app):
+        async with _user_index_lifespan(), session_lifespan(starlette_app):
+            yield
+
+    app.router.lifespan_context = lifespan
+    config = uvicorn.Config(
+        app,
+        host=mcp.settings.host,
+        port=mcp.settings.port,
+        log_level=mcp.settings.log_level.lower()
+    )
+    await uvicorn.Server(config).serve()
+
+
 if __name__ == "__main__":
-    mcp.run(
-        transport="streamable-http"
-    )
\ No newline at end of file
+    asyncio.run(serve())
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+from typing import Any, Optional
+
+import httpx
+
+DEFAULT_SEARCH_FIELDS = ["id", "name", "surname", "email", "gender"]
+ALL_FIELDS = "*"
+
+
+class UserDataClient:
+    """Reads user records from the user service as dicts, for tools that shape their own output"""
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 30.0):
+        self.base_url = (base_url or os.getenv("USERS_MANAGEMENT_SERVICE_URL", "http://localhost:8041")).rstrip("/")
+        self._client = httpx.AsyncClient(base_url=self.base_url, timeout=timeout)
+
+    async def get_user(self, user_id: int) -> dict[str, Any]:
+        response = await self._client.get(f"/v1/users/{user_id}")
+        response.raise_for_status()
+        return response.json()
+
+    async def search_users(
+            self,
+            name: Optional[str] = None,
+            surname: Optional[str] = None,
+            email: Optional[str] = None,
+            gender: Optional[str] = None
+    ) -> list[dict[str, Any]]:
+        params = {
+            key: value
+            for key, value in {"name": name, "surname": surname, "email": email, "gender": gender}.items()
+            if value
+        }
+        response = await self._client.get("/v1/users/search", params=params)
+        response.raise_for_status()
+        return _as_user_list(response.json())
+
+    async def list_users(self) -> list[dict[str, Any]]:
+        response = await self._client.get("/v1/users")
+        response.raise_for_status()
+        return _as_user_list(response.json())
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def _as_user_list(payload: Any) -> list[dict[str, Any]]:
+    """The user service answers listings and searches with a JSON array of user objects"""
+    if not isinstance(payload, list) or not all(isinstance(user, dict) for user in payload):
+        raise ValueError(f"Unexpected user list from the user service: {str(payload)[:200]}")
+    return payload
+
+
+def project(user: dict[str, Any], fields: Optional[list[str]]) -> dict[str, Any]:
+    """Keep only requested fields, dotted names select nested fields, e.g. `address.city`"""
+    if not fields or ALL_FIELDS in fields:
+        return user
+
+    projected: dict[str, Any] = {}
+    for field in fields:
+        value: Any = user
+        for part in field.split("."):
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
+        else:
+            target = projected
+            *parents, leaf = field.split(".")
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = value
+    return projected
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
+INDEXED_FIELDS = ("name", "surname", "email")
+
+
+def _trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class UserIndex:
+    """
+    In-memory search index with the same semantics as the user service search:
+    case-insensitive substring match on name, surname and email, exact match on gender,
+    all given criteria combined with AND.
+
+    Substring queries of 3+ characters are answered by intersecting trigram postings and
+    verifying the few remaining candidates, shorter ones fall back to a scan.
+    """
+
+    def __init__(self):
+        self._users: dict[int, dict[str, Any]] = {}
+        self._values: dict[str, dict[int, str]] = {field: {} for field in INDEXED_FIELDS}
+        self._postings: dict[str, dict[str, set[int]]] = {field: defaultdict(set) for field in INDEXED_FIELDS}
+        self._genders: dict[str, set[int]] = defaultdict(set)
+
+    @classmethod
+    def build(cls, users: Iterable[dict[str, Any]]) -> 'UserIndex':
+        index = cls()
+        for user in users:
+            index.upsert(user)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def upsert(self, user: dict[str, Any]):
+        user_id = user["id"]
+        if user_id in self._users:
+            self.remove(user_id)
+
+        self._users[user_id] = user
+        for field in INDEXED_FIELDS:
+            value = str(user.get(field) or "").lower()
+            self._values[field][user_id] = value
+            postings = self._postings[field]
+            for trigram in _trigrams(value):
+                postings[trigram].add(user_id)
+        if gender := user.get("gender"):
+            self._genders[str(gender).lower()].add(user_id)
+
+    def remove(self, user_id: int):
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+
+        for field in INDEXED_FIELDS:
+            value = self._values[field].pop(user_id, "")
+            postings = self._postings[field]
+            for trigram in _trigrams(value):
+                ids = postings.get(trigram)
+                if ids is not None:
+                    ids.discard(user_id)
+                    if not ids:
+                        del postings[trigram]
+        if gender := user.get("gender"):
+            ids = self._genders.get(str(gender).lower())
+            if ids is not None:
+                ids.discard(user_id)
+
+    def search(
+            self,
+            name: Optional[str] = None,
+            surname: Optional[str] = None,
+            email: Optional[str] = None,
+            gender: Optional[str] = None
+    ) -> list[dict[str, Any]]:
+        """Matching users ordered by id"""
+        constraints = [
+            (field, query.lower())
+            for field, query in (("name", name), ("surname", surname), ("email", email))
+            if query
+        ]
+
+        candidates: Optional[set[int]] = None
+        if gender:
+            candidates = self._genders.get(gender.lower())
+            if not candidates:
+                return []
+
+        for field, query in constraints:
+            if len(query) < 3:
+                continue
+            postings = [self._postings[field].get(trigram) for trigram in _trigrams(query)]
+            if not all(postings):
+                return []
+            postings.sort(key=len)
+            if candidates is not None:
+                postings.insert(0, candidates)
+                postings.sort(key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            if not candidates:
+                return []
+
+        if candidates is None:
+            candidates = self._users.keys()
+
+        values = self._values
+        matched = [
+            user_id
+            for user_id in candidates
+            if all(query in values[field][user_id] for field, query in constraints)
+        ]
+        matched.sort()
+        return [self._users[user_id] for user_id in matched]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible chat completions server for exercising the agent's resilience layer.
+Delays and failures are injected at runtime through the /control endpoint.
+
+    python fake_openai_server.py --port 8099
+    DIAL_URL=http://localhost:8099 python run_agent.py
+
+    curl -X POST localhost:8099/control -H 'Content-Type: application/json' \\
+         -d '{"first_token_delay": 5, "error_rate": 0.3}'
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_SETTINGS = {
+    # seconds before the first chunk (or the whole non-streaming response)
+    "first_token_delay": 0.0,
+    # seconds between stream chunks
+    "chunk_delay": 0.01,
+    # share of requests answered with `error_status`
+    "error_rate": 0.0,
+    "error_status": 500,
+    # share of requests that never answer
+    "hang_rate": 0.0,
+    # share of streams that stop sending chunks after the first one
+    "stall_rate": 0.0,
+    "content": "Hello from the fake model, this answer is streamed word by word.",
+}
+
+settings = dict(DEFAULT_SETTINGS)
+stats = {"requests": 0, "errors": 0, "hangs": 0, "stalls": 0, "cancelled": 0}
+
+app = FastAPI()
+
+
+@app.get("/control")
+async def get_control():
+    return {"settings": settings, "stats": stats}
+
+
+@app.post("/control")
+async def set_control(request: Request):
+    """Update fault injection settings, `{"reset": true}` restores defaults and clears stats"""
+    body = await request.json()
+    if body.pop("reset", False):
+        settings.clear()
+        settings.update(DEFAULT_SETTINGS)
+        stats.update({key: 0 for key in stats})
+    settings.update(body)
+    return {"settings": settings}
+
+
+@app.post("/openai/deployments/{model}/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request, model: str = "fake-model"):
+    body = await request.json()
+    model = body.get("model", model)
+    stats["requests"] += 1
+
+    if random.random() < settings["hang_rate"]:
+        stats["hangs"] += 1
+        await _sleep_tracked(3600)
+
+    if random.random() < settings["error_rate"]:
+        stats["errors"] += 1
+        return JSONResponse(
+            status_code=settings["error_status"],
+            content={"error": {"message": "Injected failure", "type": "server_error"}}
+        )
+
+    await _sleep_tracked(settings["first_token_delay"])
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    words = settings["content"].split(" ")
+    usage = {
+        "prompt_tokens": sum(len(str(m.get("content") or "")) // 4 for m in body.get("messages", [])),
+        "completion_tokens": len(words),
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": settings["content"]},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+    stall = random.random() < settings["stall_rate"]
+
+    async def events():
+        def chunk(delta: dict, finish_reason=None, chunk_usage=None, choices=True):
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else [],
+            }
+            if chunk_usage is not None:
+                data["usage"] = chunk_usage
+            return f"data: {json.dumps(data)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        if stall:
+            stats["stalls"] += 1
+            await _sleep_tracked(3600)
+        for index, word in enumerate(words):
+            yield chunk({"content": word if index == 0 else f" {word}"})
+            await _sleep_tracked(settings["chunk_delay"])
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, chunk_usage=usage, choices=False)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+async def _sleep_tracked(seconds: float):
+    try:
+        await asyncio.sleep(seconds)
+    except asyncio.CancelledError:
+        stats["cancelled"] += 1
+        raise
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from agent.clients.admission import AdmissionController, AdmissionRejected
+
+
+def test_waiting_conversations_are_served_round_robin():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=10, queue_timeout=5)
+        order, release = [], asyncio.Event()
+
+        async def call(key: str, name: str):
+            async with admission.slot(key):
+                order.append(name)
+                await release.wait()
+
+        holder = asyncio.create_task(call("a", "a0"))
+        await asyncio.sleep(0)
+        waiters = []
+        for key, name in (("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")):
+            waiters.append(asyncio.create_task(call(key, name)))
+            await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *waiters)
+
+        assert order == ["a0", "a1", "b1", "a2", "a3"]
+        assert admission.stats()["active"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_queue_timeout_reject_calls():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.05)
+        async with admission.slot("a"):
+            queued = asyncio.create_task(admission._acquire("b"))
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as rejected:
+                await admission._acquire("c")
+            assert rejected.value.retry_after >= 1
+            assert not admission.has_capacity()
+            with pytest.raises(AdmissionRejected):
+                await queued
+        stats = admission.stats()
+        assert (stats["rejected"], stats["timed_out"], stats["queued"], stats["active"]) == (1, 1, 0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        admission = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=5)
+        async with admission.slot("a"):
+            waiter = asyncio.create_task(admission._acquire("b"))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert admission.stats()["queued"] == 0
+        assert admission.stats()["active"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+
+import httpx
+from fakeredis import aioredis
+
+from agent import app as app_module
+from agent.conversation_manager import ConversationManager
+
+
+def test_conversation_answers_a_matching_etag_with_not_modified(monkeypatch):
+    async def scenario():
+        manager = ConversationManager(None, aioredis.FakeRedis())
+        monkeypatch.setattr(app_module, "conversation_manager", manager)
+        conversation = await manager.create_conversation("etag")
+        url = f"/conversations/{conversation['id']}"
+
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://agent") as client:
+            etags = []
+            for params in ({}, {"limit": 10}):
+                response = await client.get(url, params=params)
+                assert response.status_code == 200
+                etags.append(response.headers["etag"])
+                headers = {"If-None-Match": f'W/"other", {etags[-1]}'}
+                assert (await client.get(url, params=params, headers=headers)).status_code == 304
+            assert etags[0] != etags[1]
+
+            assert (await client.get(url, params={"since_version": 5})).status_code == 400
+
+    asyncio.run(scenario())
+
+
+def test_admin_drain_fails_readiness_and_stops_the_server_once_drained(monkeypatch):
+    async def scenario():
+        stopped = []
+        monkeypatch.setattr(app_module, "conversation_manager", ConversationManager(None, aioredis.FakeRedis()))
+        monkeypatch.setattr(app_module, "admin_token", "secret")
+        monkeypatch.setattr(app_module, "drain_task", None)
+        monkeypatch.setattr(app_module, "stop_server", lambda: stopped.append(1))
+
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://agent") as client:
+            assert (await client.get("/ready")).status_code == 200
+            assert (await client.post("/admin/drain")).status_code == 401
+            response = await client.post("/admin/drain", headers={"Authorization": "Bearer secret"})
+            assert response.status_code == 202 and response.json()["draining"]
+
+            assert await app_module.drain_task == {"running_turns": 0, "cancelled_turns": 0}
+            await asyncio.sleep(0)
+            assert stopped == [1]
+            assert (await client.get("/ready")).json() == {"status": "draining"}
+
+    asyncio.run(scenario())
@@ -0,0 +1,50 @@
+import asyncio
+
+from fakeredis import aioredis
+
+from agent.conversation_manager import ConversationManager
+from agent.storage.archive import ConversationArchive
+
+
+async def archived_manager(tmp_path) -> tuple[ConversationManager, dict]:
+    manager = ConversationManager(None, aioredis.FakeRedis(), archive=ConversationArchive(str(tmp_path / "archive.db")))
+    conversation = await manager.create_conversation("cold")
+    conversation = {**conversation, "messages": [{"role": "user", "content": "hello"}]}
+    await manager._save_conversation(conversation, appended_from=0)
+    assert await manager.archive_conversation(conversation["id"])
+    return manager, conversation
+
+
+def test_archived_conversation_is_listed_and_rehydrated_on_access(tmp_path):
+    async def scenario():
+        manager, conversation = await archived_manager(tmp_path)
+        key = f"conversation:{conversation['id']}"
+        assert not await manager.redis.exists(key)
+        assert [listed["id"] for listed in await manager.list_conversations()] == [conversation["id"]]
+
+        assert (await manager.get_conversation(conversation["id"]))["messages"] == conversation["messages"]
+        assert await manager.redis.exists(key)
+        assert not await manager.redis.hexists("conversations:archived", conversation["id"])
+        assert manager.rehydrated == 1
+
+    asyncio.run(scenario())
+
+
+def test_deleting_an_archived_conversation_removes_the_archived_copy(tmp_path):
+    async def scenario():
+        manager, conversation = await archived_manager(tmp_path)
+        assert await manager.archive.count() == 1
+        assert await manager.delete_conversation(conversation["id"])
+        assert await manager.archive.count() == 0
+        assert await manager.get_conversation(conversation["id"]) is None
+
+    asyncio.run(scenario())
+
+
+def test_conversation_with_forks_stays_in_redis(tmp_path):
+    async def scenario():
+        manager, conversation = await archived_manager(tmp_path)
+        await manager.fork_conversation(conversation["id"])
+        assert not await manager.archive_conversation(conversation["id"])
+
+    asyncio.run(scenario())
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from fakeredis import aioredis
+
+from agent.batch import BatchJob, run_to_file
+
+
+class FlakyManager:
+    """Fails the prompts in `failing`, answers the others"""
+
+    def __init__(self, failing: set[str]):
+        self.failing = failing
+        self.conversations = 0
+
+    async def create_conversation(self, title, tenant=None):
+        self.conversations += 1
+        return {"id": str(self.conversations)}
+
+    async def delete_conversation(self, conversation_id, tenant=None):
+        return True
+
+    async def chat(self, message, conversation_id, **kwargs):
+        if message.content in self.failing:
+            raise RuntimeError("model error")
+        return {"content": message.content.upper()}
+
+
+def test_resumed_job_lists_every_id_once(tmp_path):
+    async def scenario():
+        client = aioredis.FakeRedis()
+        items = [{"id": item_id, "prompt": item_id, "title": None} for item_id in ("a", "b", "c")]
+        output = str(tmp_path / "results.jsonl")
+
+        job = BatchJob(FlakyManager({"b"}), client, "job")
+        assert await job.submit(items)
+        await run_to_file(job, output, resumed=False)
+
+        job = BatchJob(FlakyManager(set()), client, "job")
+        assert not await job.submit(items)
+        stats = await run_to_file(job, output, resumed=True)
+        assert stats["skipped"] == 2
+
+        with open(output, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        assert sorted(record["id"] for record in records) == ["a", "b", "c"]
+        assert {record["status"] for record in records} == {"ok"}
+
+    asyncio.run(scenario())
+
+
+def test_redis_error_of_one_prompt_fails_only_that_prompt():
+    async def scenario():
+        client = aioredis.FakeRedis()
+        manager = FlakyManager(set())
+        create_conversation = manager.create_conversation
+
+        async def unreliable_create(title, tenant=None):
+            if title == "broken":
+                raise ConnectionError("connection reset")
+            return await create_conversation(title, tenant)
+
+        manager.create_conversation = unreliable_create
+        job = BatchJob(manager, client, "job", concurrency=1)
+        await job.submit([
+            {"id": "a", "prompt": "a", "title": "broken"},
+            {"id": "b", "prompt": "b", "title": None}
+        ])
+        stats = await job.run()
+
+        assert (stats["completed"], stats["failed"]) == (1, 1)
+        records = {record["id"]: record async for record in job.results()}
+        assert records["a"]["status"] == "error" and records["a"]["conversation_id"] is None
+        assert records["b"]["content"] == "B"
+        assert (await job.progress())["status"] == "completed_with_errors"
+
+    asyncio.run(scenario())
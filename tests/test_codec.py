@@ -0,0 +1,44 @@
+import pytest
+import zstandard
+
+from agent.storage.codec import ConversationCodec
+
+CONVERSATION = {
+    "id": "c1",
+    "title": "Zürich users",
+    "messages": [
+        {"role": "user", "content": "Find users in Zürich"},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": "call_1", "function": {"arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "call_1", "content": "user " * 200}
+    ]
+}
+
+
+@pytest.mark.parametrize("codec", ["json", "json-zlib", "msgpack-zstd"])
+def test_round_trip(codec):
+    assert ConversationCodec(codec).decode(ConversationCodec(codec).encode(CONVERSATION)) == CONVERSATION
+
+
+def test_payloads_of_every_format_stay_readable_after_a_codec_change():
+    reader = ConversationCodec("msgpack-zstd")
+    for codec in ("json", "json-zlib", "msgpack-zstd"):
+        assert reader.decode(ConversationCodec(codec).encode(CONVERSATION)) == CONVERSATION
+    assert reader.decode('{"id": "legacy"}') == {"id": "legacy"}
+
+
+def test_compressed_payload_is_smaller():
+    plain = ConversationCodec("json").encode(CONVERSATION)
+    assert len(ConversationCodec("json-zlib").encode(CONVERSATION)) < len(plain) / 3
+    assert len(ConversationCodec("msgpack-zstd").encode(CONVERSATION)) < len(plain) / 3
+
+
+def test_dictionary_payloads_need_the_same_dictionary():
+    samples = [ConversationCodec("json").encode({**CONVERSATION, "id": f"c{n}"}) for n in range(200)]
+    dictionary = zstandard.train_dictionary(4096, samples).as_bytes()
+    payload = ConversationCodec("msgpack-zstd", zstd_dictionary=dictionary).encode(CONVERSATION)
+
+    assert ConversationCodec("msgpack-zstd", zstd_dictionary=dictionary).decode(payload) == CONVERSATION
+    with pytest.raises(ValueError):
+        ConversationCodec("msgpack-zstd").decode(payload)
+    with pytest.raises(ValueError):
+        ConversationCodec("unknown")
@@ -0,0 +1,94 @@
+import asyncio
+
+from fakeredis import FakeServer, aioredis
+
+from agent.conversation_manager import ConversationManager
+from agent.storage.conversation_cache import ConversationCache
+
+
+def test_read_racing_a_save_does_not_cache_the_older_version():
+    async def scenario():
+        client = aioredis.FakeRedis()
+        cache = ConversationCache(client)
+        await cache.start()
+        while not cache.stats()["enabled"]:
+            await asyncio.sleep(0.01)
+        manager = ConversationManager(None, client, cache=cache)
+        conversation = await manager.create_conversation("race")
+        cache.discard(manager.default_tenant.key(conversation["id"]))
+
+        # The reader loads the stored version, the save lands before it gets to cache it
+        loaded, release = asyncio.Event(), asyncio.Event()
+        redis_get = client.get
+
+        async def slow_get(key):
+            payload = await redis_get(key)
+            loaded.set()
+            await release.wait()
+            return payload
+
+        client.get = slow_get
+        reader = asyncio.create_task(manager.get_conversation(conversation["id"]))
+        await loaded.wait()
+        saved = {**conversation, "messages": [{"role": "user", "content": "hello"}]}
+        await manager._save_conversation(saved, appended_from=0)
+        release.set()
+        assert (await reader)["messages"] == []
+
+        client.get = redis_get
+        assert (await manager.get_conversation(conversation["id"]))["messages"] == saved["messages"]
+        await cache.stop()
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire():
+    cache = ConversationCache(None, ttl_seconds=0)
+    cache._coherent = True
+    cache.put("c1", {"messages": []}, 10)
+    assert cache.get("c1") is None
+
+
+async def coherent_cache(client) -> ConversationCache:
+    cache = ConversationCache(client)
+    await cache.start()
+    while not cache.stats()["enabled"]:
+        await asyncio.sleep(0.01)
+    return cache
+
+
+def test_save_on_one_worker_drops_the_copy_cached_by_another():
+    async def scenario():
+        server = FakeServer()
+        writer_cache = await coherent_cache(aioredis.FakeRedis(server=server))
+        reader_cache = await coherent_cache(aioredis.FakeRedis(server=server))
+        writer = ConversationManager(None, aioredis.FakeRedis(server=server), cache=writer_cache)
+        reader = ConversationManager(None, aioredis.FakeRedis(server=server), cache=reader_cache)
+
+        conversation = await writer.create_conversation("shared")
+        assert (await reader.get_conversation(conversation["id"]))["messages"] == []
+        assert reader_cache.get(conversation["id"]) is not None
+
+        saved = {**conversation, "messages": [{"role": "user", "content": "hello"}]}
+        await writer._save_conversation(saved, appended_from=0)
+        while reader_cache.get(conversation["id"]) is not None:
+            await asyncio.sleep(0.01)
+        assert (await reader.get_conversation(conversation["id"]))["messages"] == saved["messages"]
+
+        await writer_cache.stop()
+        await reader_cache.stop()
+
+    asyncio.run(scenario())
+
+
+def test_cache_is_bypassed_until_subscribed_and_bounded_by_size():
+    cache = ConversationCache(None, max_entries=10, max_bytes=100)
+    cache.put("c1", {"messages": []}, 10)
+    assert cache.get("c1") is None
+
+    cache._coherent = True
+    for conversation_id in ("c1", "c2", "c3"):
+        cache.put(conversation_id, {"messages": []}, 40)
+    assert cache.get("c1") is None
+    assert cache.get("c3") is not None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fakeredis import aioredis
+
+from agent.conversation_manager import ConversationManager
+
+
+async def saved(manager: ConversationManager, conversation: dict, *contents: str) -> dict:
+    messages = [{"role": role, "content": content} for role, content in zip(("user", "assistant") * 8, contents)]
+    conversation = {**conversation, "messages": [*conversation["messages"], *messages]}
+    await manager._save_conversation(conversation)
+    return conversation
+
+
+def test_deleting_the_last_fork_releases_the_retained_parents():
+    async def scenario():
+        client = aioredis.FakeRedis()
+        manager = ConversationManager(None, client)
+        parent = await saved(manager, await manager.create_conversation("parent"), "hi", "hello")
+        fork = await saved(manager, await manager.fork_conversation(parent["id"]), "and", "more")
+        fork_of_fork = await saved(manager, await manager.fork_conversation(fork["id"]), "last", "one")
+
+        assert await manager.delete_conversation(parent["id"])
+        assert await manager.delete_conversation(fork["id"])
+        assert [m["content"] for m in (await manager.get_conversation(fork_of_fork["id"]))["messages"]] == \
+               ["hi", "hello", "and", "more", "last", "one"]
+
+        assert await manager.delete_conversation(fork_of_fork["id"])
+        assert await client.keys("*conversation:*") == []
+        assert await client.hgetall(manager.default_tenant.key("conversations:forks")) == {}
+        assert await client.hgetall(manager.default_tenant.key("conversations:parents")) == {}
+
+    asyncio.run(scenario())
+
+
+def test_delete_with_an_outdated_parent_chain_changes_nothing():
+    async def scenario():
+        manager = ConversationManager(None, aioredis.FakeRedis())
+        parent = await saved(manager, await manager.create_conversation("parent"), "hi", "hello")
+        fork = await manager.fork_conversation(parent["id"])
+
+        async def no_parents(conversation_id, tenant):
+            return []
+
+        manager._parents = no_parents
+        with pytest.raises(ValueError):
+            await manager.delete_conversation(fork["id"])
+        assert await manager.get_conversation(fork["id"]) is not None
+
+    asyncio.run(scenario())
+
+
+def test_fork_stores_only_its_own_messages():
+    async def scenario():
+        client = aioredis.FakeRedis()
+        manager = ConversationManager(None, client)
+        parent = await saved(manager, await manager.create_conversation("parent"), "hi", "hello", "more", "text")
+        fork = await saved(manager, await manager.fork_conversation(parent["id"], 2), "other", "branch")
+
+        stored = manager.codec.decode(await client.get(f"conversation:{fork['id']}"))
+        assert [m["content"] for m in stored["messages"]] == ["other", "branch"]
+        assert [m["content"] for m in (await manager.get_conversation(fork["id"]))["messages"]] == \
+               ["hi", "hello", "other", "branch"]
+        with pytest.raises(ValueError):
+            await manager.fork_conversation(parent["id"], 9)
+
+    asyncio.run(scenario())
+
+
+def test_message_pages_walk_back_and_deltas_follow_new_messages():
+    async def scenario():
+        client = aioredis.FakeRedis()
+        manager = ConversationManager(None, client)
+        conversation = await saved(manager, await manager.create_conversation("paged"), *map(str, range(7)))
+
+        last = await manager.get_messages(conversation["id"], limit=3)
+        assert [m["content"] for m in last["messages"]] == ["4", "5", "6"]
+        assert (last["version"], last["has_more"]) == (7, True)
+        first = await manager.get_messages(conversation["id"], before=2, limit=3)
+        assert ([m["index"] for m in first["messages"]], first["has_more"]) == ([0, 1], False)
+
+        await client.delete(manager.default_tenant.key(f"conversation:{conversation['id']}:messages"))
+        await saved(manager, conversation, "7", "8")
+        delta = await manager.get_messages(conversation["id"], since_version=7)
+        assert [(m["index"], m["content"]) for m in delta["messages"]] == [(7, "7"), (8, "8")]
+        with pytest.raises(ValueError):
+            await manager.get_messages(conversation["id"], since_version=10)
+
+    asyncio.run(scenario())
+
+
+def test_chat_view_leaves_out_tool_messages():
+    async def scenario():
+        manager = ConversationManager(None, aioredis.FakeRedis())
+        conversation = await manager.create_conversation("tools")
+        conversation["messages"] = [
+            {"role": "system", "content": "prompt"},
+            {"role": "user", "content": "Who is user 1?"},
+            {"role": "assistant", "tool_calls": [{"id": "call-1"}]},
+            {"role": "tool", "content": "Anna", "tool_call_id": "call-1"},
+            {"role": "assistant", "content": "Anna"}
+        ]
+        await manager._save_conversation(conversation)
+
+        page = await manager.get_messages(conversation["id"], include_tool_messages=False)
+        assert [(m["index"], m["role"]) for m in page["messages"]] == [(1, "user"), (4, "assistant")]
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import asyncio
+import re
+
+from fakeredis import aioredis
+
+from agent.clients.dial_client import READ_TOOL_RESULT, DialClient
+from agent.storage.tool_result_store import ToolResultStore
+
+
+def paging_client(max_inline: int = 100, preview: int = 30) -> DialClient:
+    store = ToolResultStore(aioredis.FakeRedis())
+    return DialClient(
+        "key", "http://localhost", "model", [], {},
+        tool_result_store=store, max_inline_tool_result_chars=max_inline, tool_result_preview_chars=preview
+    )
+
+
+def test_oversized_tool_result_is_offloaded_and_read_back_in_pages():
+    async def scenario():
+        client = paging_client()
+        content = "".join(f"user {n};" for n in range(40))
+        inline = await client._inline_tool_result(content)
+        assert inline.startswith(content[:30] + "\n\n[Tool result truncated")
+        assert READ_TOOL_RESULT in [tool["function"]["name"] for tool in client.tools]
+
+        handle, offset = re.search(r'handle="(\w+)" and offset=(\d+)', inline).groups()
+        pages, offset = [content[:30]], int(offset)
+        while True:
+            page = await client._read_tool_result({"handle": handle, "offset": offset, "limit": 50})
+            text, _, footer = page.rpartition("\n\n")
+            pages.append(text)
+            if "End of result" in footer:
+                break
+            offset = int(re.search(r"offset=(\d+)", footer).group(1))
+        assert "".join(pages) == content
+        assert (client.offloaded_tool_results, client.tool_result_pages_read) == (1, 6)
+
+    asyncio.run(scenario())
+
+
+def test_small_tool_result_stays_inline_and_unknown_handles_are_reported():
+    async def scenario():
+        client = paging_client()
+        assert await client._inline_tool_result("short") == "short"
+        assert "not found or expired" in await client._read_tool_result({"handle": "missing"})
+
+    asyncio.run(scenario())
+
+
+def test_read_tool_result_with_bad_arguments_returns_an_error_message():
+    async def scenario():
+        store = ToolResultStore(aioredis.FakeRedis())
+        client = DialClient("key", "http://localhost", "model", [], {}, tool_result_store=store)
+        handle = await store.save("x" * 100)
+
+        for tool_args in ({"handle": handle, "offset": "ten"}, {"handle": handle, "limit": None}):
+            assert "must be whole numbers" in await client._read_tool_result(tool_args)
+        assert (await client._read_tool_result({"handle": handle, "offset": "90"})).startswith("x" * 10 + "\n")
+        assert client.tool_result_pages_read == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import json
+import logging
+import queue
+
+from agent.logging_config import NonBlockingQueueHandler, SamplingFilter, StructuredFormatter
+
+
+def queued_logger(handler: NonBlockingQueueHandler) -> logging.Logger:
+    logger = logging.getLogger(f"test.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_message_and_exception_are_rendered_when_queued():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    logger = queued_logger(handler)
+    users = ["ann"]
+    logger.info("Users %s", users, extra={"tenant": "acme"})
+    users.append("bob")
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logger.exception("Failed")
+
+    first, second = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert (first.msg, first.args) == ("Users ['ann']", None)
+    assert StructuredFormatter().format(first).endswith("Users ['ann'] {\"tenant\": \"acme\"}")
+    assert second.exc_info is None
+    payload = json.loads(StructuredFormatter(json_output=True).format(second))
+    assert payload["message"] == "Failed" and "ValueError: broken" in payload["exc_info"]
+    assert "ValueError: broken" in StructuredFormatter().format(second)
+
+
+def test_full_queue_drops_records_and_sampling_keeps_one_in_n():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=3))
+    handler.addFilter(SamplingFilter(("Processing tool call",), 0.25))
+    logger = queued_logger(handler)
+    for _ in range(8):
+        logger.debug("Processing tool call")
+    for n in range(3):
+        logger.info("Turn %d", n)
+
+    assert handler.stats() == {"queued": 3, "dropped": 2, "sampled_out": 6}
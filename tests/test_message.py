@@ -0,0 +1,14 @@
+from agent.models.message import Message, Role, WireMessage
+
+
+def test_message_and_wire_message_serialize_alike():
+    tool_calls = [{"id": "call_1", "type": "function", "function": {"name": "search", "arguments": "{}"}}]
+    for fields in (
+        {"role": Role.USER, "content": "hello"},
+        {"role": Role.ASSISTANT, "content": None, "tool_calls": tool_calls},
+        {"role": Role.ASSISTANT, "content": "", "tool_calls": []},
+        {"role": Role.TOOL, "content": "found", "tool_call_id": "call_1", "name": "search"}
+    ):
+        wire = WireMessage(**fields).to_dict()
+        assert wire == Message(**fields).to_dict()
+        assert list(wire) == list(Message(**fields).to_dict())
@@ -0,0 +1,40 @@
+import pytest
+
+from agent.clients.model_router import ESCALATION_RULES, ModelRouter
+from agent.models.message import Role, WireMessage
+
+TOOLS = {"search_user": {"required": ["search_user_request"]}}
+
+
+def tool_call(name: str, arguments: str) -> WireMessage:
+    return WireMessage(
+        role=Role.ASSISTANT,
+        tool_calls=[{"id": "call_1", "type": "function", "function": {"name": name, "arguments": arguments}}]
+    )
+
+
+def test_only_rounds_right_after_the_user_message_go_to_the_fast_model():
+    assert ModelRouter.is_dispatch_round([{"role": "system"}, {"role": "user"}])
+    assert not ModelRouter.is_dispatch_round([{"role": "user"}, {"role": "assistant"}, {"role": "tool"}])
+    assert not ModelRouter.is_dispatch_round([])
+
+
+@pytest.mark.parametrize("message, finish_reason, reason", [
+    (tool_call("search_user", '{"search_user_request": {}}'), "tool_calls", None),
+    (tool_call("search_user", "{}"), "tool_calls", "invalid_tool_args"),
+    (tool_call("search_user", "not json"), "tool_calls", "invalid_tool_args"),
+    (tool_call("drop_users", "{}"), "tool_calls", "unknown_tool"),
+    (WireMessage(role=Role.ASSISTANT, content="Hi"), "length", "truncated"),
+    (WireMessage(role=Role.ASSISTANT), "stop", "empty"),
+    (WireMessage(role=Role.ASSISTANT, content="Hi"), "stop", "simple_turn"),
+])
+def test_fast_rounds_escalate_on_the_configured_rules(message, finish_reason, reason):
+    router = ModelRouter("fast", "strong", ESCALATION_RULES)
+    assert router.escalation_reason(message, finish_reason, TOOLS) == reason
+
+
+def test_unconfigured_rules_do_not_escalate_and_unknown_ones_are_refused():
+    router = ModelRouter("fast", "strong", frozenset({"unknown_tool"}))
+    assert router.escalation_reason(WireMessage(role=Role.ASSISTANT, content="Hi"), "stop", TOOLS) is None
+    with pytest.raises(ValueError):
+        ModelRouter("fast", "strong", frozenset({"slow"}))
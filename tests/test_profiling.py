@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from agent import app as app_module
+from agent.profiling import LoopLagMonitor, MemoryProfiler, ProfilerBusy, SamplingProfiler
+
+
+def busy_loop(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_cpu_profile_shows_the_blocking_code_in_collapsed_stacks():
+    async def scenario():
+        profiler = SamplingProfiler()
+        profile = asyncio.create_task(profiler.profile(0.2, interval=0.002))
+        await asyncio.sleep(0.02)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        busy_loop(0.1)
+        return await profile
+
+    leaves = {}
+    for line in asyncio.run(scenario()).splitlines():
+        stack, count = line.rsplit(" ", 1)
+        leaf = stack.split(";")[-1].split(" (")[0]
+        leaves[leaf] = leaves.get(leaf, 0) + int(count)
+    assert leaves["busy_loop"] > 10 and "select" in leaves
+
+
+def test_memory_diff_points_at_the_growing_allocation_site():
+    async def scenario():
+        profiler = MemoryProfiler()
+        profiler.start(frames=1)
+        try:
+            profiler.snapshot()
+            kept = [bytearray(1024) for _ in range(2000)]
+            diff = profiler.diff(limit=1)
+            assert diff["top"][0]["site"][0].rsplit(":", 1)[0].endswith("test_profiling.py")
+            assert diff["size_diff"] >= 2000 * 1024 > 0 and len(kept) == 2000
+        finally:
+            profiler.stop()
+        assert not profiler.tracing
+        with pytest.raises(ValueError):
+            profiler.diff()
+
+    asyncio.run(scenario())
+
+
+def test_loop_lag_monitor_records_a_blocked_loop():
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.01)
+        await monitor.start()
+        await asyncio.sleep(0.005)
+        busy_loop(0.1)
+        await asyncio.sleep(0.02)
+        await monitor.stop()
+        return monitor.lag.stats()
+
+    assert asyncio.run(scenario())["max_ms"] >= 80
+
+
+def test_profiling_endpoints_are_hidden_unless_enabled_and_need_the_admin_token(monkeypatch):
+    async def get(path: str, token: str = "") -> int:
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://agent") as client:
+            headers = {"Authorization": f"Bearer {token}"} if token else {}
+            return (await client.get(path, headers=headers)).status_code
+
+    monkeypatch.setattr(app_module, "admin_token", "secret")
+    assert asyncio.run(get("/admin/profile", "secret")) == 404
+
+    monkeypatch.setattr(app_module, "cpu_profiler", SamplingProfiler())
+    monkeypatch.setattr(app_module, "memory_profiler", MemoryProfiler())
+    assert asyncio.run(get("/admin/profile")) == 401
+    assert asyncio.run(get("/admin/profile", "wrong")) == 401
+    assert asyncio.run(get("/admin/profile", "secret")) == 200
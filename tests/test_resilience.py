@@ -0,0 +1,149 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import APIConnectionError
+
+from agent.clients.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, ResiliencePolicy, \
+    ResilientCompletions
+
+
+def half_open_completions() -> ResilientCompletions:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    return ResilientCompletions(None, ResiliencePolicy(max_retries=0, breaker=breaker))
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        completions = half_open_completions()
+        probe = asyncio.create_task(completions._with_retries(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            completions.breaker.check()
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        assert await completions._with_retries(lambda: asyncio.sleep(0, "ok")) == "ok"
+        assert completions.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_expired_deadline_does_not_take_the_probe():
+    async def scenario():
+        completions = half_open_completions()
+        with pytest.raises(DeadlineExceeded):
+            await completions._with_retries(lambda: asyncio.sleep(0, "ok"), deadline=time.monotonic() - 1)
+
+        assert await completions._with_retries(lambda: asyncio.sleep(0, "ok")) == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_rejected_probe_leaves_the_breaker_half_open():
+    async def scenario():
+        completions = half_open_completions()
+
+        async def bad_request():
+            raise ValueError("malformed request")
+
+        with pytest.raises(ValueError):
+            await completions._with_retries(bad_request)
+        assert completions.breaker.state == "half_open"
+        assert completions.breaker.check() is not None
+
+    asyncio.run(scenario())
+
+
+def test_call_from_the_closed_period_does_not_release_the_probe():
+    async def scenario():
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        completions = ResilientCompletions(None, ResiliencePolicy(max_retries=0, breaker=breaker))
+        finish = asyncio.Event()
+
+        async def slow_bad_request():
+            await finish.wait()
+            raise ValueError("malformed request")
+
+        late = asyncio.create_task(completions._with_retries(slow_bad_request))
+        await asyncio.sleep(0)
+        breaker.record_failure()
+        assert breaker.check() is not None
+
+        finish.set()
+        with pytest.raises(ValueError):
+            await late
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+
+    asyncio.run(scenario())
+
+
+class ScriptedCompletions:
+    """`create` plays the given steps in order, a step is (delay, result or exception)"""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        delay, outcome = self.steps[min(self.calls, len(self.steps) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def connection_error() -> Exception:
+    return APIConnectionError(request=httpx.Request("POST", "http://model"))
+
+
+def test_slow_call_is_hedged_and_the_faster_answer_wins():
+    async def scenario():
+        completions = ScriptedCompletions((1, "slow"), (0, "fast"))
+        policy = ResiliencePolicy(hedge_min_samples=3, hedge_min_delay=0.02)
+        resilient = ResilientCompletions(completions, policy)
+        for _ in range(3):
+            resilient.response_latency.record(0.01)
+
+        assert await resilient.create(model="m") == "fast"
+        assert (completions.calls, resilient.hedges, resilient.hedge_wins) == (2, 1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_retryable_errors_are_retried_and_open_the_breaker():
+    async def scenario():
+        completions = ScriptedCompletions((0, connection_error()), (0, "ok"))
+        resilient = ResilientCompletions(completions, ResiliencePolicy(retry_backoff=0, hedge=False))
+        assert await resilient.create(model="m") == "ok"
+        assert (resilient.retries, resilient.breaker.state) == (1, "closed")
+
+        failing = ScriptedCompletions((0, connection_error()))
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        resilient = ResilientCompletions(failing, ResiliencePolicy(retry_backoff=0, hedge=False, breaker=breaker))
+        with pytest.raises(APIConnectionError):
+            await resilient.create(model="m")
+        with pytest.raises(CircuitOpenError):
+            await resilient.create(model="m")
+        assert (failing.calls, breaker.state, breaker.opened) == (3, "open", 1)
+
+    asyncio.run(scenario())
+
+
+def test_slow_upstream_is_cut_off_at_the_turn_deadline():
+    async def scenario():
+        completions = ScriptedCompletions((1, "late"))
+        resilient = ResilientCompletions(completions, ResiliencePolicy(retry_backoff=0, hedge=False))
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            await resilient.create(deadline=start + 0.05, model="m")
+        assert time.monotonic() - start < 0.5
+        assert resilient.breaker.state == "closed"
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import asyncio
+
+from fakeredis import aioredis
+
+from agent.storage.search_index import ConversationSearchIndex
+
+
+async def indexed(messages: list[dict], title: str = "lookups") -> ConversationSearchIndex:
+    index = ConversationSearchIndex(aioredis.FakeRedis())
+    async with index.default_tenant.redis.pipeline(transaction=True) as pipe:
+        index.stage(pipe, "c1", messages, title=title)
+        await pipe.execute()
+    return index
+
+
+def test_phrase_with_a_short_word_matches():
+    async def scenario():
+        index = await indexed([
+            {"role": "user", "content": "Please find a user named Ann"},
+            {"role": "assistant", "content": "I found one user"}
+        ])
+        hits = await index.search('"find a user"', 10)
+        assert [(hit["conversation_id"], hit["message_index"]) for hit in hits] == [("c1", 0)]
+        assert await index.search('"find the user"', 10) == []
+
+    asyncio.run(scenario())
+
+
+def test_phrase_matches_whole_words_only():
+    async def scenario():
+        index = await indexed([{"role": "user", "content": "rewind a username"}])
+        assert await index.search('"wind a user"', 10) == []
+
+    asyncio.run(scenario())
+
+
+def test_phrase_in_the_title_matches():
+    async def scenario():
+        index = await indexed([{"role": "user", "content": "who moved to Berlin?"}], title="Users of the Berlin office")
+        hits = await index.search('"berlin office"', 10)
+        assert [(hit["conversation_id"], hit["message_index"], hit["snippet"]) for hit in hits] == \
+               [("c1", None, "Users of the Berlin office")]
+
+    asyncio.run(scenario())
@@ -0,0 +1,95 @@
+import asyncio
+
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+from mcp.types import ToolAnnotations
+
+from agent.clients.single_flight import ToolCallCoalescer
+
+
+def test_concurrent_identical_calls_of_an_annotated_tool_hit_the_server_once():
+    async def scenario():
+        server = FastMCP(name="users")
+        executions = []
+
+        @server.tool(annotations=ToolAnnotations(readOnlyHint=True))
+        async def get_user_by_id(user_id: int) -> str:
+            executions.append(user_id)
+            await asyncio.sleep(0.05)
+            return f"user {user_id}"
+
+        async with create_connected_server_and_client_session(server._mcp_server) as session:
+            tools = (await session.list_tools()).tools
+            read_only = {tool.name for tool in tools if tool.annotations and tool.annotations.readOnlyHint}
+            coalescer = ToolCallCoalescer(read_only)
+
+            def execute():
+                return session.call_tool("get_user_by_id", {"user_id": 7})
+
+            first, second = await asyncio.gather(
+                coalescer.call("get_user_by_id", {"user_id": 7}, execute),
+                coalescer.call("get_user_by_id", {"user_id": 7}, execute)
+            )
+
+        assert executions == [7]
+        assert first is second
+        assert first.content[0].text == "user 7"
+        assert coalescer.stats()["coalesced"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_shared_call_survives_a_cancelled_caller_and_stops_with_the_last_one():
+    async def scenario():
+        coalescer = ToolCallCoalescer({"search_users"})
+        release, executions, cancelled = asyncio.Event(), [], []
+
+        async def execute():
+            executions.append(1)
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "users"
+
+        first = asyncio.create_task(coalescer.call("search_users", {"name": "a"}, execute))
+        second = asyncio.create_task(coalescer.call("search_users", {"name": "a"}, execute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "users"
+        assert (first.cancelled(), executions, cancelled) == (True, [1], [])
+
+        release.clear()
+        alone = asyncio.create_task(coalescer.call("search_users", {"name": "a"}, execute))
+        await asyncio.sleep(0)
+        alone.cancel()
+        await asyncio.gather(alone, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert (executions, cancelled, coalescer.stats()["in_flight"]) == ([1, 1], [1], 0)
+
+    asyncio.run(scenario())
+
+
+def test_calls_of_other_tools_and_arguments_run_separately():
+    async def scenario():
+        coalescer = ToolCallCoalescer({"get_user_by_id"})
+        executions = []
+
+        async def execute():
+            executions.append(1)
+            await asyncio.sleep(0.01)
+            return len(executions)
+
+        await asyncio.gather(
+            coalescer.call("get_user_by_id", {"user_id": 1}, execute),
+            coalescer.call("get_user_by_id", {"user_id": 2}, execute),
+            coalescer.call("delete_user", {"user_id": 1}, execute),
+            coalescer.call("delete_user", {"user_id": 1}, execute)
+        )
+        assert len(executions) == 4
+        assert coalescer.key("t", {"b": 1, "a": 2}) == coalescer.key("t", {"a": 2, "b": 1})
+
+    asyncio.run(scenario())
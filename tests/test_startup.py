@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+from agent.metrics import StartupTimeline
+
+
+def test_importing_the_app_leaves_openai_and_mcp_unloaded():
+    code = (
+        "import sys, agent.app\n"
+        "print('loaded:', *sorted({m.split('.')[0] for m in sys.modules} & {'openai', 'mcp'}))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.splitlines()[-1] == "loaded:"
+
+
+def test_startup_timeline_reports_time_spent_per_phase():
+    timeline = StartupTimeline()
+    timeline.origin -= 1
+    timeline.mark("imports")
+    timeline.mark("redis")
+
+    stats = timeline.stats()
+    assert list(stats) == ["imports", "redis"]
+    assert stats["imports"]["took_ms"] == stats["imports"]["at_ms"] >= 1000
+    assert 0 <= stats["redis"]["took_ms"] < 1000
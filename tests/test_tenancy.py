@@ -0,0 +1,41 @@
+import asyncio
+
+from fakeredis import aioredis
+from redis.crc import key_slot
+
+from agent.conversation_manager import ConversationManager
+from agent.storage.tenancy import TenantShards
+
+
+def test_default_tenant_keeps_unprefixed_keys():
+    tenant = TenantShards([aioredis.FakeRedis()]).tenant()
+    assert tenant.key("conversations:list") == "conversations:list"
+
+
+def test_keys_of_a_tenant_share_one_slot():
+    tenant = TenantShards([aioredis.FakeRedis()]).tenant("acme")
+    keys = [tenant.key(name) for name in ("conversation:1", "conversations:list", "search:term:hello")]
+    assert len({key_slot(key.encode()) for key in keys}) == 1
+
+
+def test_tenants_are_placed_by_slot_and_the_default_tenant_stays_on_the_first_shard():
+    shards = TenantShards([aioredis.FakeRedis() for _ in range(4)])
+    assert shards.tenant().redis is shards.primary
+    placed = {shards.shard_index(f"tenant-{n}") for n in range(200)}
+    assert placed == {0, 1, 2, 3}
+    assert shards.tenant("acme").redis is shards.tenant("acme").redis
+
+
+def test_conversations_are_only_seen_by_their_tenant():
+    async def scenario():
+        shards = TenantShards([aioredis.FakeRedis(), aioredis.FakeRedis()])
+        manager = ConversationManager(None, shards.primary, tenants=shards)
+        acme, other = shards.tenant("acme"), shards.tenant("other")
+        conversation = await manager.create_conversation("acme only", acme)
+
+        assert await manager.get_conversation(conversation["id"], acme) is not None
+        assert await manager.get_conversation(conversation["id"], other) is None
+        assert await manager.get_conversation(conversation["id"]) is None
+        assert [tenant.id for tenant in await shards.all()] == ["default", "acme"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,161 @@
+import asyncio
+import json
+
+import pytest
+from fakeredis import aioredis
+
+from agent import conversation_manager
+from agent.clients.resilience import DeadlineExceeded
+from agent.conversation_manager import CANCELLED_TOOL_CALL_MESSAGE, ConversationManager, ServiceDraining
+from agent.models.message import Message, Role, WireMessage
+
+TOOL_CALL = {"id": "call-1", "type": "function", "function": {"name": "get_user_by_id", "arguments": "{}"}}
+
+
+class StalledDialClient:
+    """Starts a tool call and then never finishes the turn"""
+
+    tool_result_store = None
+
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def response(self, messages, turn=None):
+        messages.append({"role": "assistant", "content": "Looking the user up", "tool_calls": [TOOL_CALL]})
+        self.started.set()
+        await asyncio.Event().wait()
+
+    async def stream_response(self, messages, turn=None):
+        messages.append({"role": "assistant", "content": "Looking the user up", "tool_calls": [TOOL_CALL]})
+        yield "data: {\"content\": \"Looking\"}\n\n"
+        await asyncio.Event().wait()
+
+
+async def settled(manager: ConversationManager):
+    while manager._pending_saves:
+        await asyncio.gather(*manager._pending_saves)
+
+
+def test_cancelled_turn_saves_its_partial_messages_with_closed_tool_calls():
+    async def scenario():
+        dial_client = StalledDialClient()
+        manager = ConversationManager(dial_client, aioredis.FakeRedis())
+        conversation = await manager.create_conversation("cancelled")
+
+        chat = asyncio.create_task(manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"]))
+        await dial_client.started.wait()
+        chat.cancel()
+        await asyncio.gather(chat, return_exceptions=True)
+        await settled(manager)
+
+        messages = (await manager.get_conversation(conversation["id"]))["messages"]
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "tool"]
+        assert messages[-1] == {"role": "tool", "content": CANCELLED_TOOL_CALL_MESSAGE, "tool_call_id": "call-1"}
+        assert (manager.cancelled_turns, manager.partial_chars_saved) == (1, len("Looking the user up"))
+        assert not manager._active_turns
+
+    asyncio.run(scenario())
+
+
+def test_disconnected_stream_saves_its_partial_messages():
+    async def scenario():
+        manager = ConversationManager(StalledDialClient(), aioredis.FakeRedis())
+        conversation = await manager.create_conversation("disconnected")
+
+        events = await manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"], stream=True)
+        assert (await anext(events)).startswith("data: {\"conversation_id\"")
+        assert await anext(events) == "data: {\"content\": \"Looking\"}\n\n"
+        await events.aclose()
+        await settled(manager)
+
+        messages = (await manager.get_conversation(conversation["id"]))["messages"]
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "tool"]
+        assert manager.cancelled_turns == 1
+
+    asyncio.run(scenario())
+
+
+class OverdueDialClient:
+    """Starts a tool call, then the turn runs out of time"""
+
+    tool_result_store = None
+
+    async def response(self, messages, turn=None):
+        messages.append({"role": "assistant", "content": None, "tool_calls": [TOOL_CALL]})
+        raise DeadlineExceeded()
+
+    async def stream_response(self, messages, turn=None):
+        messages.append({"role": "assistant", "content": None, "tool_calls": [TOOL_CALL]})
+        raise DeadlineExceeded()
+        yield
+
+
+def test_overdue_turn_is_saved_and_reported():
+    async def scenario():
+        manager = ConversationManager(OverdueDialClient(), aioredis.FakeRedis(), turn_deadline_seconds=30)
+        conversation = await manager.create_conversation("overdue")
+
+        with pytest.raises(DeadlineExceeded):
+            await manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"])
+        events = await manager.chat(Message(role=Role.USER, content="And user 2?"), conversation["id"], stream=True)
+        events = [event async for event in events]
+        assert json.loads(events[1].removeprefix("data: ")) == \
+               {"error": {"message": "Chat turn deadline exceeded", "code": 504}}
+        assert events[-1] == "data: [DONE]\n\n"
+
+        messages = (await manager.get_conversation(conversation["id"]))["messages"]
+        assert [m["role"] for m in messages] == ["system", "user", "assistant", "tool", "user", "assistant", "tool"]
+        assert manager.deadline_exceeded_turns == 2
+
+    asyncio.run(scenario())
+
+
+class PatientDialClient:
+    """Answers once the turn runs out of time, or never when `stubborn`"""
+
+    tool_result_store = None
+
+    def __init__(self, stubborn: bool = False):
+        self.stubborn = stubborn
+        self.started = asyncio.Event()
+
+    async def response(self, messages, turn=None):
+        self.started.set()
+        while self.stubborn or turn.remaining() is None or turn.remaining() > 0:
+            await asyncio.sleep(0.01)
+        return WireMessage(role=Role.ASSISTANT, content="Wrapped up")
+
+
+def test_drain_brings_deadlines_forward_and_refuses_new_turns():
+    async def scenario():
+        dial_client = PatientDialClient()
+        manager = ConversationManager(dial_client, aioredis.FakeRedis())
+        conversation = await manager.create_conversation("draining")
+
+        chat = asyncio.create_task(manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"]))
+        await dial_client.started.wait()
+        assert await manager.drain(0.05) == {"running_turns": 1, "cancelled_turns": 0}
+        assert (await chat)["content"] == "Wrapped up"
+
+        with pytest.raises(ServiceDraining):
+            await manager.chat(Message(role=Role.USER, content="And user 2?"), conversation["id"])
+
+    asyncio.run(scenario())
+
+
+def test_drain_cancels_turns_that_keep_running_and_saves_them(monkeypatch):
+    monkeypatch.setattr(conversation_manager, "DRAIN_GRACE_SECONDS", 0.05)
+
+    async def scenario():
+        dial_client = PatientDialClient(stubborn=True)
+        manager = ConversationManager(dial_client, aioredis.FakeRedis())
+        conversation = await manager.create_conversation("stubborn")
+
+        chat = asyncio.create_task(manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"]))
+        await dial_client.started.wait()
+        assert await manager.drain(0.01) == {"running_turns": 1, "cancelled_turns": 1}
+        assert chat.cancelled() and manager.cancelled_turns == 1
+        messages = (await manager.get_conversation(conversation["id"]))["messages"]
+        assert [m["role"] for m in messages] == ["system", "user"]
+
+    asyncio.run(scenario())
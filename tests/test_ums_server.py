@@ -0,0 +1,170 @@
+import asyncio
+import importlib
+import json
+import os
+import sys
+import types
+
+import httpx
+import pytest
+from pydantic import BaseModel
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docker", "ums-mcp-server")
+USERS = [
+    {"id": 1, "name": "Anna", "surname": "Berg", "email": "anna@example.com", "gender": "female"},
+    {"id": 2, "name": "Boris", "surname": "Kahn", "email": "boris@example.com", "gender": "male"}
+]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """server.py with the user service models and client of the MCP server image replaced by minimal ones"""
+    user_info = types.ModuleType("models.user_info")
+    for name in ("UserSearchRequest", "UserCreate", "UserUpdate"):
+        setattr(user_info, name, type(name, (BaseModel,), {"__annotations__": {"name": str | None}, "name": None}))
+    user_client = types.ModuleType("user_client")
+    user_client.UserClient = object
+    monkeypatch.setitem(sys.modules, "models", types.ModuleType("models"))
+    monkeypatch.setitem(sys.modules, "models.user_info", user_info)
+    monkeypatch.setitem(sys.modules, "user_client", user_client)
+    monkeypatch.syspath_prepend(SERVER_DIR)
+    for module in ("server", "user_data_client", "user_index"):
+        monkeypatch.delitem(sys.modules, module, raising=False)
+
+    server = importlib.import_module("server")
+    monkeypatch.setattr(server, "USER_INDEX_ENABLED", True)
+    monkeypatch.setattr(server, "USER_INDEX_RETRY_SECONDS", 0.01)
+    monkeypatch.setattr(server, "USER_INDEX_RECONCILE_SECONDS", 60)
+    return server
+
+
+def not_found(user_id: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", f"http://users/v1/users/{user_id}")
+    return httpx.HTTPStatusError("not found", request=request, response=httpx.Response(404, request=request))
+
+
+async def built(server):
+    while server.user_index is None:
+        await asyncio.sleep(0.01)
+    return server.user_index
+
+
+def test_index_is_built_at_startup_and_a_failed_build_is_retried(server, monkeypatch):
+    attempts = []
+
+    async def list_users():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("user service down")
+        return USERS
+
+    monkeypatch.setattr(server.user_data_client, "list_users", list_users)
+
+    async def scenario():
+        async with server._user_index_lifespan():
+            index = await asyncio.wait_for(built(server), 5)
+            assert [user["id"] for user in index.search(name="ann")] == [1]
+        assert len(attempts) == 2
+        assert server._user_index_task.done()
+
+    asyncio.run(scenario())
+
+
+def test_write_during_the_first_build_reaches_the_index(server, monkeypatch):
+    listed, release = asyncio.Event(), asyncio.Event()
+    changed = {**USERS[1], "name": "Bruno"}
+
+    async def list_users():
+        listed.set()
+        await release.wait()
+        return USERS
+
+    async def get_user(user_id):
+        return changed
+
+    monkeypatch.setattr(server.user_data_client, "list_users", list_users)
+    monkeypatch.setattr(server.user_data_client, "get_user", get_user)
+
+    async def scenario():
+        async with server._user_index_lifespan():
+            await listed.wait()
+            await server._refresh_indexed_user(2)
+            release.set()
+            index = await asyncio.wait_for(built(server), 5)
+            assert index.search(name="bruno") == [changed]
+
+    asyncio.run(scenario())
+
+
+def test_refresh_drops_a_user_only_when_the_service_no_longer_has_it(server, monkeypatch):
+    errors = [httpx.ConnectError("timeout"), not_found(1)]
+
+    async def get_user(user_id):
+        raise errors.pop(0)
+
+    monkeypatch.setattr(server.user_data_client, "get_user", get_user)
+    server.user_index = server.UserIndex.build(USERS)
+
+    asyncio.run(server._refresh_indexed_user(1))
+    assert len(server.user_index) == 2
+    asyncio.run(server._refresh_indexed_user(1))
+    assert [user["id"] for user in server.user_index.search(gender="female")] == []
+
+
+class CountingUserClient:
+    """Answers get_user for USERS, tracks how many calls run at once"""
+
+    def __init__(self):
+        self.running = self.peak = self.calls = 0
+
+    async def get_user(self, user_id):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if user_id not in {user["id"] for user in USERS}:
+            raise RuntimeError(f"User {user_id} not found")
+        return f"user {user_id}"
+
+
+def test_batch_reports_every_item_and_bounds_concurrency(server, monkeypatch):
+    client = CountingUserClient()
+    monkeypatch.setattr(server, "user_client", client)
+    monkeypatch.setattr(server, "BATCH_CONCURRENCY", 2)
+
+    output = asyncio.run(server.get_users_by_ids([1, 2, 3, 1, 2, 1]))
+    assert output.splitlines()[0] == "## Batch results: 2 succeeded, 1 failed"
+    assert "### user_id=1: ok\nuser 1" in output and "### user_id=3: error\nUser 3 not found" in output
+    assert (client.calls, client.peak) == (3, 2)
+
+
+def test_batch_limits_items_and_output(server, monkeypatch):
+    monkeypatch.setattr(server, "user_client", CountingUserClient())
+    monkeypatch.setattr(server, "BATCH_MAX_ITEMS", 2)
+    assert asyncio.run(server.get_users_by_ids([1, 2, 3])).startswith("Error: batch of 3 items exceeds the limit of 2")
+
+    monkeypatch.setattr(server, "BATCH_MAX_OUTPUT_CHARS", 30)
+    output = asyncio.run(server.get_users_by_ids([1, 2]))
+    assert "### user_id=2: ok (output omitted)" in output
+    assert output.endswith("1 outputs omitted to keep the response under 30 characters.")
+
+
+def test_search_pages_and_projects_users(server, monkeypatch):
+    users = [
+        {"id": n, "name": f"user{n}", "email": f"user{n}@example.com", "address": {"city": "Oslo"}} for n in range(45)
+    ]
+
+    async def search_users(**criteria):
+        return users
+
+    monkeypatch.setattr(server.user_data_client, "search_users", search_users)
+    request = server.UserSearchRequest(name="user")
+
+    first = asyncio.run(server.search_user(request, limit=20)).splitlines()
+    assert first[0] == "## Search results: total=45, offset=0, returned=20, next_offset=20"
+    assert json.loads(first[1]) == {"id": 0, "name": "user0", "email": "user0@example.com"}
+
+    last = asyncio.run(server.search_user(request, fields=["id", "address.city"], limit=500, offset=40)).splitlines()
+    assert last[0] == "## Search results: total=45, offset=40, returned=5"
+    assert json.loads(last[1]) == {"id": 40, "address": {"city": "Oslo"}}
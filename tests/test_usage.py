@@ -0,0 +1,86 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fakeredis import aioredis
+
+from agent.clients.dial_client import DialClient
+from agent.conversation_manager import ConversationManager, TokenBudgetExceeded
+from agent.models.message import Message, Role, WireMessage
+from agent.models.turn import Turn
+from agent.storage.search_index import ConversationSearchIndex
+from agent.storage.usage_store import UsageStore
+
+
+class MeteredDialClient:
+    """Answers after one tool round, every round uses 100 prompt and 20 completion tokens"""
+
+    tool_result_store = None
+
+    async def response(self, messages, turn=None):
+        for _ in range(2):
+            turn.record_usage("model", 100, 20, estimated=False)
+        turn.record_tool_result("get_user_by_id", "Anna Berg")
+        return WireMessage(role=Role.ASSISTANT, content="Anna")
+
+
+def test_turn_usage_is_aggregated_and_the_budget_refuses_further_turns():
+    async def scenario():
+        redis_client = aioredis.FakeRedis()
+        usage_store = UsageStore(redis_client)
+        manager = ConversationManager(MeteredDialClient(), redis_client, usage_store=usage_store, token_budget=400)
+        conversation = await manager.create_conversation("metered")
+
+        for _ in range(2):
+            await manager.chat(Message(role=Role.USER, content="Who is user 1?"), conversation["id"])
+        usage = await usage_store.get(conversation["id"])
+        assert {field: usage[field] for field in ("total_tokens", "turns", "rounds", "last_prompt_tokens")} == \
+               {"total_tokens": 480, "turns": 2, "rounds": 4, "last_prompt_tokens": 100}
+        assert usage["recent_turns"][0]["tool_calls"] == {"get_user_by_id": 1}
+
+        with pytest.raises(TokenBudgetExceeded):
+            await manager.chat(Message(role=Role.USER, content="And user 2?"), conversation["id"])
+        assert manager.budget_refusals == 1
+
+        stats = await usage_store.stats()
+        assert (stats["prompt_tokens"], stats["turns"]) == (400, 2)
+        assert stats["tools"]["get_user_by_id"] == {"calls": 2, "result_chars": 18, "estimated_result_tokens": 5}
+
+    asyncio.run(scenario())
+
+
+def test_rounds_without_reported_usage_are_estimated_from_their_size():
+    client = DialClient("key", "http://localhost", "model", [], {})
+    turn = Turn("conversation")
+    client._record_usage(turn, "model", None, [{"role": "user", "content": "x" * 40}], output_chars=9)
+    client._record_usage(turn, "model", SimpleNamespace(prompt_tokens=50, completion_tokens=5), [], 0)
+
+    assert [(r["prompt_tokens"], r["completion_tokens"], r["estimated"]) for r in turn.usage_rounds] == \
+           [(10, 3, True), (50, 5, False)]
+    assert client.usage_by_model["model"]["estimated_rounds"] == 1
+
+
+def test_deleting_a_conversation_removes_its_messages_index_and_usage():
+    async def scenario():
+        redis_client = aioredis.FakeRedis()
+        manager = ConversationManager(
+            MeteredDialClient(),
+            redis_client,
+            search_index=ConversationSearchIndex(redis_client),
+            usage_store=UsageStore(redis_client)
+        )
+        kept = await manager.create_conversation("kept")
+        global_keys = set(await redis_client.keys("*"))
+        conversation = await manager.create_conversation("Berlin office")
+        await manager.chat(Message(role=Role.USER, content="Who works in Berlin?"), conversation["id"])
+        await manager.get_messages(conversation["id"], limit=10)
+        assert await manager.search_index.search("berlin", 10)
+
+        assert await manager.delete_conversation(conversation["id"])
+        remaining = set(await redis_client.keys("*"))
+        assert remaining - global_keys == {b"usage:totals", b"usage:tools"}
+        assert await manager.search_index.search("berlin", 10) == []
+        assert [c["id"] for c in await manager.list_conversations()] == [kept["id"]]
+        assert not await manager.delete_conversation(conversation["id"])
+
+    asyncio.run(scenario())
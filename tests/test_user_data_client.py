@@ -0,0 +1,37 @@
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docker", "ums-mcp-server")
+sys.path.insert(0, SERVER_DIR)
+
+from user_data_client import UserDataClient, project  # noqa: E402
+
+USER = {"id": 1, "name": "Anna", "email": "anna@example.com", "address": {"city": "Oslo", "street": "Main"}}
+
+
+def client_answering(payload) -> UserDataClient:
+    client = UserDataClient("http://users")
+    client._client = httpx.AsyncClient(
+        base_url="http://users",
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json=payload))
+    )
+    return client
+
+
+def test_user_lists_are_json_arrays():
+    assert asyncio.run(client_answering([USER]).search_users(name="ann")) == [USER]
+
+
+@pytest.mark.parametrize("payload", [{"users": [USER]}, {"detail": "error"}, [1, 2]])
+def test_unexpected_user_list_raises(payload):
+    with pytest.raises(ValueError):
+        asyncio.run(client_answering(payload).list_users())
+
+
+def test_projection_keeps_requested_nested_fields():
+    assert project(USER, ["name", "address.city", "missing"]) == {"name": "Anna", "address": {"city": "Oslo"}}
+    assert project(USER, ["*"]) is USER